@@ -1,306 +1,343 @@
-import os
-import pyodbc
+import logging
+
 import pandas as pd
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+from aggregate_cube import get_aggregate_cube
+from filter_hierarchy import get_filter_hierarchy
+from metrics import instrumented, query_phase
+from query_builder import row_window, tower_filters, where
+from result_cache import cached_result
+from synapse_pool import pooled_connection
+from tower_snapshot import get_tower_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------------------------------------------------------
+#  Roll up grouped TOWER_STRUCTURES counts (shared by live SQL and snapshot)
+# ------------------------------------------------------------------------------
+def format_percentage(part, total):
+    """Format a share of ``total`` as "12.34%" (thousands separated, like SQL Server's 'N2')."""
+    if not total:
+        return None
+    return f"{part * 100.0 / total:,.2f}%"
+
+
+def _rollup(groups, dimension, measure, count_column, percentage_column):
+    """Sum ``measure`` per ``dimension`` and add the percentage of the grand total."""
+    rolled = (
+        groups.groupby(dimension, dropna=False, sort=False)[measure]
+        .sum()
+        .reset_index()
+        .sort_values(measure, ascending=False, kind="stable")
+        .rename(columns={measure: count_column})
+    )
+    total = rolled[count_column].sum()
+    rolled[percentage_column] = [format_percentage(value, total) for value in rolled[count_column]]
+    rolled[dimension] = rolled[dimension].astype(object).where(rolled[dimension].notnull(), None)
+    return rolled.reset_index(drop=True)
+
+
+def summarize_groups(groups):
+    """Header KPIs (the /api/structure_summary row) from grouped counts."""
+    return pd.DataFrame([{
+        "TOTAL_OPERATOR": int(groups["OPERATOR"].nunique()),
+        "TOTAL_STRUCTURE_CATEGORY": int(groups["STRUCTURE_CATEGORY"].nunique()),
+        "TOTAL_STRUCTURES": int(groups["TOTAL_STRUCTURE"].sum()),
+        "TOTAL_PROJECTS": int(groups["PROJECTS"].nunique()),
+        "TOTAL_OWNER": int(groups["OWNER"].nunique()),
+    }])
+
+
+def build_rci_dashboard(groups, owners):
+    """
+    Derive every RCI dashboard breakdown from one grouped result.
+
+    ``groups`` holds one row per (STATE, STRUCTURE_CATEGORY, PROJECTS, OWNER,
+    OPERATOR) combination with TOTAL_STRUCTURE (row count); the summary and
+    the state, category and project breakdowns sum it. ``owners`` holds the
+    distinct STRUCTURE_IDs per OWNER as TOTAL_RCI. Distinct counts do not add
+    up across combinations, so they are never derived from ``groups``.
+    """
+    return {
+        "summary": summarize_groups(groups),
+        "state": _rollup(groups, "STATE", "TOTAL_STRUCTURE", "TOTAL_STRUCTURE", "TOTAL_PERCENTAGE"),
+        "category": _rollup(groups, "STRUCTURE_CATEGORY", "TOTAL_STRUCTURE",
+                            "TOTAL_STRUCTURE", "TOTAL_STRUCTURE_PERCENTAGE"),
+        "project": _rollup(groups, "PROJECTS", "TOTAL_STRUCTURE", "TOTAL_STRUCTURE", "TOTAL_PERCENTAGE"),
+        "owner": _rollup(owners, "OWNER", "TOTAL_RCI", "Total RCI", "Total RCI (%)"),
+    }
+
+
+def precomputed_groups(operator=None, state=None, district=None, mukim=None, dun=None):
+    """
+    Grouped counts (``TowerSnapshot.groups`` shape) from the aggregate cube,
+    else from the snapshot, else None so the caller runs live SQL. Only
+    TOTAL_STRUCTURE rolls up from these; use ``precomputed_distinct`` for
+    distinct STRUCTURE_ID counts.
+    """
+    cube = get_aggregate_cube()
+    if cube is not None:
+        return cube.groups(operator, state, district, mukim, dun)
+    snapshot = get_tower_snapshot()
+    if snapshot is not None:
+        return snapshot.groups(operator, state, district, mukim, dun)
+    return None
+
+
+def precomputed_distinct(dimension, operator=None, state=None, district=None, mukim=None, dun=None):
+    """
+    Distinct STRUCTURE_IDs per ``dimension`` (columns ``dimension`` and
+    TOTAL_RCI): rolled up from the aggregate cube when its distinct counts
+    are additive, else counted from the snapshot rows, else None so the
+    caller runs live SQL.
+    """
+    cube = get_aggregate_cube()
+    if cube is not None and cube.covers(distinct=True):
+        groups = cube.groups(operator, state, district, mukim, dun)
+        return groups.groupby(dimension, dropna=False, sort=False)["TOTAL_RCI"].sum().reset_index()
+    snapshot = get_tower_snapshot()
+    if snapshot is not None:
+        return snapshot.distinct_counts(dimension, operator, state, district, mukim, dun)
+    return None
 
-# Get Azure Synapse connection details from environment variables
-server = os.getenv('DB_SERVER')
-database = os.getenv('DB_DATABASE')
-username = os.getenv('DB_USERNAME')
-password = os.getenv('DB_PASSWORD')
-port = os.getenv('DB_PORT')
-driver = os.getenv('DB_DRIVER')
 
 # ------------------------------------------------------------
 #  API Endpoint for Total Structure by Owner (RCI Module)
 # ------------------------------------------------------------
+@instrumented
 def get_operator_structure_data(limit, offset):
     """Fetch distinct operator structure data with pagination from Azure Synapse."""
     try:
-        print("\n🔍 Debug: Connecting to Azure Synapse Database...")
-        conn_str = (
-            f"DRIVER={driver};"
-            f"SERVER={server},{port};"
-            f"DATABASE={database};"
-            f"UID={username};"
-            f"PWD={password}"
-        )
-        
-        connection = pyodbc.connect(conn_str)
-        print("✅ Database Connection Successful!")
+        counts = precomputed_distinct("OPERATOR")
+        if counts is not None:
+            owners = _rollup(counts, "OPERATOR", "TOTAL_RCI", "Total RCI", "Total RCI (%)")
+            owners = owners.rename(columns={"OPERATOR": "OWNER"})
+            return owners.iloc[int(offset):int(offset) + int(limit)].reset_index(drop=True)
+
+        with pooled_connection() as connection:
         
-        cursor = connection.cursor()
+            cursor = connection.cursor()
 
-        # Query to fetch distinct operator structure data with pagination
-        query = f"""
-        WITH cte AS (
-            SELECT 
-                OPERATOR AS OWNER,
-                COUNT(DISTINCT STRUCTURE_ID) AS [Total RCI],
-                FORMAT(ROUND((COUNT(DISTINCT STRUCTURE_ID) * 100.0 / SUM(COUNT(DISTINCT STRUCTURE_ID)) OVER()), 2), 'N2') + '%' AS [Total RCI (%)],
-                ROW_NUMBER() OVER (ORDER BY COUNT(DISTINCT STRUCTURE_ID) DESC) AS rn
-            FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES ts
-            WHERE STATUS != 'DISCONTINUE'
-            GROUP BY OPERATOR
-        )
-        SELECT OWNER, [Total RCI], [Total RCI (%)] 
-        FROM cte
-        WHERE rn > {offset} AND rn <= {offset} + {limit};
-        """
+            # Query to fetch distinct operator structure data with pagination
+            window, params = row_window(offset, limit)
+            query = f"""
+            WITH cte AS (
+                SELECT 
+                    OPERATOR AS OWNER,
+                    COUNT(DISTINCT STRUCTURE_ID) AS [Total RCI],
+                    SUM(COUNT(DISTINCT STRUCTURE_ID)) OVER() AS TOTAL_SUM,
+                    ROW_NUMBER() OVER (ORDER BY COUNT(DISTINCT STRUCTURE_ID) DESC) AS rn
+                FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES ts
+                WHERE STATUS != 'DISCONTINUE'
+                GROUP BY OPERATOR
+            )
+            SELECT OWNER, [Total RCI], TOTAL_SUM
+            FROM cte
+            WHERE {window};
+            """
         
-        cursor.execute(query)
+            cursor.execute(query, *params)
 
-        # Fetch column names and data
-        columns = [desc[0] for desc in cursor.description]
-        data = cursor.fetchall()
+            # Fetch column names and data
+            columns = [desc[0] for desc in cursor.description]
+            data = cursor.fetchall()
 
-        # Convert to pandas DataFrame
-        df = pd.DataFrame.from_records(data, columns=columns)
+            # Convert to pandas DataFrame
+            with query_phase("dataframe"):
+                df = pd.DataFrame.from_records(data, columns=columns)
 
-        cursor.close()
-        connection.close()
-        print("✅ Data retrieval successful!")
+            cursor.close()
+        # Percentages are formatted here, as on the precomputed path
+        df["Total RCI (%)"] = [format_percentage(part, total) for part, total in zip(df["Total RCI"], df["TOTAL_SUM"])]
+        df = df.drop(columns="TOTAL_SUM")
+        logger.debug("Data retrieval successful!")
         return df
 
     except Exception as e:
-        print(f"\n❌ Database Error: {e}")
+        logger.error("Database Error: %s", e)
+        return pd.DataFrame({"error": [str(e)]})
+
+
+# ------------------------------------------------------------------------------
+#  API Endpoint for Total Structure by Owner, with filters (RCI Module)
+# ------------------------------------------------------------------------------
+@instrumented
+@cached_result
+def get_owner_structure_data(operator=None, state=None, district=None, mukim=None, dun=None):
+    """Fetch total distinct structure count by OWNER from Azure Synapse, with filtering."""
+    try:
+        counts = precomputed_distinct("OWNER", operator, state, district, mukim, dun)
+        if counts is not None:
+            return _rollup(counts, "OWNER", "TOTAL_RCI", "Total RCI", "Total RCI (%)")
+
+        # --- Build parameterized WHERE clause for filters ---
+        predicates, params = tower_filters(operator, state, district, mukim, dun)
+
+        # --- Counts only; the percentage is added by _rollup ---
+        query = f"""
+        SELECT 
+            OWNER,
+            COUNT(DISTINCT STRUCTURE_ID) AS TOTAL_RCI
+        FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES
+        {where(predicates)}
+        GROUP BY OWNER;
+        """
+
+        with pooled_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query, *params)
+            columns = [desc[0] for desc in cursor.description]
+            data = cursor.fetchall()
+            with query_phase("dataframe"):
+                df = pd.DataFrame.from_records(data, columns=columns)
+            cursor.close()
+        logger.debug("Owner structure data retrieved successfully.")
+        return _rollup(df, "OWNER", "TOTAL_RCI", "Total RCI", "Total RCI (%)")
+
+    except Exception as e:
+        logger.error("Error retrieving owner structure data: %s", e)
         return pd.DataFrame({"error": [str(e)]})
 
 
 # ------------------------------------------------------------------------------
 #  API Endpoint for Total Structure by Structure Category Data (RCI Module)
 # ------------------------------------------------------------------------------
+@instrumented
+@cached_result
 def get_structure_category_data(operator=None, state=None, district=None, mukim=None, dun=None):
     """Fetch total structure count by structure category from Azure Synapse, including percentage, with filtering."""
     try:
-        print("\n🔍 Debug: Connecting to Azure Synapse Database for STRUCTURE_CATEGORY data...")
-
-        conn_str = (
-            f"DRIVER={driver};"
-            f"SERVER={server},{port};"
-            f"DATABASE={database};"
-            f"UID={username};"
-            f"PWD={password}"
-        )
+        groups = precomputed_groups(operator, state, district, mukim, dun)
+        if groups is not None:
+            return _rollup(groups, "STRUCTURE_CATEGORY", "TOTAL_STRUCTURE", "TOTAL_STRUCTURE", "TOTAL_STRUCTURE_PERCENTAGE")
 
-        connection = pyodbc.connect(conn_str)
-        cursor = connection.cursor()
+        with pooled_connection() as connection:
+            cursor = connection.cursor()
 
-        # Build dynamic WHERE clause for filters
-        conditions = ["STATUS != 'DISCONTINUE'"]
-        if operator and operator.lower() != "none":
-            conditions.append(f"OPERATOR = '{operator}'")
-        if state and state.lower() != "none":
-            conditions.append(f"STATE = '{state}'")
-        if district and district.lower() != "none":
-            conditions.append(f"DISTRICT = '{district}'")
-        if mukim and mukim.lower() != "none":
-            conditions.append(f"MUKIM = '{mukim}'")
-        if dun and dun.lower() != "none":
-            conditions.append(f"DUN = '{dun}'")
-
-        where_clause = " AND ".join(conditions)
+            # Build parameterized WHERE clause for filters
+            predicates, params = tower_filters(operator, state, district, mukim, dun)
 
-        query = f"""
-        WITH StructureCounts AS (
+            query = f"""
             SELECT 
                 STRUCTURE_CATEGORY,
                 COUNT(*) AS TOTAL_STRUCTURE
             FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES
-            WHERE {where_clause}
-            GROUP BY STRUCTURE_CATEGORY
-        ), Total AS (
-            SELECT SUM(TOTAL_STRUCTURE) AS TOTAL_SUM FROM StructureCounts
-        )
-        SELECT 
-            SC.STRUCTURE_CATEGORY,
-            SC.TOTAL_STRUCTURE,
-            FORMAT(ROUND((SC.TOTAL_STRUCTURE * 100.0 / T.TOTAL_SUM), 2), 'N2') + '%' AS TOTAL_STRUCTURE_PERCENTAGE
-        FROM StructureCounts SC, Total T
-        ORDER BY SC.TOTAL_STRUCTURE DESC;
-        """
+            {where(predicates)}
+            GROUP BY STRUCTURE_CATEGORY;
+            """
 
-        cursor.execute(query)
-        columns = [desc[0] for desc in cursor.description]
-        data = cursor.fetchall()
-        df = pd.DataFrame.from_records(data, columns=columns)
+            cursor.execute(query, *params)
+            columns = [desc[0] for desc in cursor.description]
+            data = cursor.fetchall()
+            with query_phase("dataframe"):
+                df = pd.DataFrame.from_records(data, columns=columns)
 
-        cursor.close()
-        connection.close()
-        print("✅ Category structure data retrieved successfully.")
-        return df
+            cursor.close()
+        logger.debug("Category structure data retrieved successfully.")
+        return _rollup(df, "STRUCTURE_CATEGORY", "TOTAL_STRUCTURE", "TOTAL_STRUCTURE", "TOTAL_STRUCTURE_PERCENTAGE")
 
     except Exception as e:
-        print(f"\n❌ Error retrieving structure category data: {e}")
+        logger.error("Error retrieving structure category data: %s", e)
         return pd.DataFrame({"error": [str(e)]})
 
 # ------------------------------------------------------------------------------
 #  API Endpoint for Total Owner by Projects Data (RCI Module)
 # ------------------------------------------------------------------------------
+@instrumented
+@cached_result
 def get_structure_project_data(operator=None, state=None, district=None, mukim=None, dun=None):
     """Fetch total structure count by PROJECTS from Azure Synapse, with dynamic filtering."""
     try:
-        print("\n🔍 Debug: Connecting to Azure Synapse Database for project data...")
-
-        conn_str = (
-            f"DRIVER={driver};"
-            f"SERVER={server},{port};"
-            f"DATABASE={database};"
-            f"UID={username};"
-            f"PWD={password}"
-        )
+        groups = precomputed_groups(operator, state, district, mukim, dun)
+        if groups is not None:
+            return _rollup(groups, "PROJECTS", "TOTAL_STRUCTURE", "TOTAL_STRUCTURE", "TOTAL_PERCENTAGE")
 
-        connection = pyodbc.connect(conn_str)
-        cursor = connection.cursor()
+        with pooled_connection() as connection:
+            cursor = connection.cursor()
 
-        # Build dynamic WHERE clause for filters
-        conditions = ["STATUS != 'DISCONTINUE'"]
-        if operator and operator.lower() != "none":
-            conditions.append(f"OPERATOR = '{operator}'")
-        if state and state.lower() != "none":
-            conditions.append(f"STATE = '{state}'")
-        if district and district.lower() != "none":
-            conditions.append(f"DISTRICT = '{district}'")
-        if mukim and mukim.lower() != "none":
-            conditions.append(f"MUKIM = '{mukim}'")
-        if dun and dun.lower() != "none":
-            conditions.append(f"DUN = '{dun}'")
-
-        where_clause = " AND ".join(conditions)
+            # Build parameterized WHERE clause for filters
+            predicates, params = tower_filters(operator, state, district, mukim, dun)
 
-        query = f"""
-        WITH ProjectCounts AS (
+            query = f"""
             SELECT 
                 PROJECTS,
                 COUNT(*) AS TOTAL_STRUCTURE
             FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES
-            WHERE {where_clause}
-            GROUP BY PROJECTS
-        ), Total AS (
-            SELECT SUM(TOTAL_STRUCTURE) AS TOTAL_SUM FROM ProjectCounts
-        )
-        SELECT 
-            PC.PROJECTS,
-            PC.TOTAL_STRUCTURE,
-            FORMAT(ROUND((PC.TOTAL_STRUCTURE * 100.0 / T.TOTAL_SUM), 2), 'N2') + '%' AS TOTAL_PERCENTAGE
-        FROM ProjectCounts PC, Total T
-        ORDER BY PC.TOTAL_STRUCTURE DESC;
-        """
+            {where(predicates)}
+            GROUP BY PROJECTS;
+            """
 
-        cursor.execute(query)
-        columns = [desc[0] for desc in cursor.description]
-        data = cursor.fetchall()
-        df = pd.DataFrame.from_records(data, columns=columns)
+            cursor.execute(query, *params)
+            columns = [desc[0] for desc in cursor.description]
+            data = cursor.fetchall()
+            with query_phase("dataframe"):
+                df = pd.DataFrame.from_records(data, columns=columns)
 
-        cursor.close()
-        connection.close()
-        print("✅ Project structure data retrieved successfully.")
-        return df
+            cursor.close()
+        logger.debug("Project structure data retrieved successfully.")
+        return _rollup(df, "PROJECTS", "TOTAL_STRUCTURE", "TOTAL_STRUCTURE", "TOTAL_PERCENTAGE")
 
     except Exception as e:
-        print(f"❌ Error retrieving project structure data: {e}")
+        logger.error("Error retrieving project structure data: %s", e)
         return pd.DataFrame({"error": [str(e)]})
 
 
 # ------------------------------------------------------------------------------
 #  API Endpoint for Total RCI by State Data (RCI Module)
 # ------------------------------------------------------------------------------
+@instrumented
+@cached_result
 def get_structure_state_data(operator=None, state=None, district=None, mukim=None, dun=None):
     """Fetch total structure count by STATE from Azure Synapse, with dynamic filtering."""
     try:
-        print("\n🔍 Debug: Connecting to Azure Synapse Database for state data...")
-
-        conn_str = (
-            f"DRIVER={driver};"
-            f"SERVER={server},{port};"
-            f"DATABASE={database};"
-            f"UID={username};"
-            f"PWD={password}"
-        )
+        groups = precomputed_groups(operator, state, district, mukim, dun)
+        if groups is not None:
+            return _rollup(groups, "STATE", "TOTAL_STRUCTURE", "TOTAL_STRUCTURE", "TOTAL_PERCENTAGE")
 
-        connection = pyodbc.connect(conn_str)
-        cursor = connection.cursor()
+        with pooled_connection() as connection:
+            cursor = connection.cursor()
 
-        # Build dynamic WHERE clause for filters
-        conditions = ["STATUS != 'DISCONTINUE'"]
-        if operator and operator.lower() != "none":
-            conditions.append(f"OPERATOR = '{operator}'")
-        if state and state.lower() != "none":
-            conditions.append(f"STATE = '{state}'")
-        if district and district.lower() != "none":
-            conditions.append(f"DISTRICT = '{district}'")
-        if mukim and mukim.lower() != "none":
-            conditions.append(f"MUKIM = '{mukim}'")
-        if dun and dun.lower() != "none":
-            conditions.append(f"DUN = '{dun}'")
-
-        where_clause = " AND ".join(conditions)
+            # Build parameterized WHERE clause for filters
+            predicates, params = tower_filters(operator, state, district, mukim, dun)
 
-        query = f"""
-        WITH StateCounts AS (
+            query = f"""
             SELECT 
                 STATE,
                 COUNT(*) AS TOTAL_STRUCTURE
             FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES
-            WHERE {where_clause}
-            GROUP BY STATE
-        ), Total AS (
-            SELECT SUM(TOTAL_STRUCTURE) AS TOTAL_SUM FROM StateCounts
-        )
-        SELECT 
-            SC.STATE,
-            SC.TOTAL_STRUCTURE,
-            FORMAT(ROUND((SC.TOTAL_STRUCTURE * 100.0 / T.TOTAL_SUM), 2), 'N2') + '%' AS TOTAL_PERCENTAGE
-        FROM StateCounts SC, Total T
-        ORDER BY SC.TOTAL_STRUCTURE DESC;
-        """
+            {where(predicates)}
+            GROUP BY STATE;
+            """
 
-        cursor.execute(query)
-        columns = [desc[0] for desc in cursor.description]
-        data = cursor.fetchall()
-        df = pd.DataFrame.from_records(data, columns=columns)
+            cursor.execute(query, *params)
+            columns = [desc[0] for desc in cursor.description]
+            data = cursor.fetchall()
+            with query_phase("dataframe"):
+                df = pd.DataFrame.from_records(data, columns=columns)
 
-        cursor.close()
-        connection.close()
-        print("✅ State structure data retrieved successfully.")
-        return df
+            cursor.close()
+        logger.debug("State structure data retrieved successfully.")
+        return _rollup(df, "STATE", "TOTAL_STRUCTURE", "TOTAL_STRUCTURE", "TOTAL_PERCENTAGE")
 
     except Exception as e:
-        print(f"❌ Error retrieving state structure data: {e}")
+        logger.error("Error retrieving state structure data: %s", e)
         return pd.DataFrame({"error": [str(e)]})
 
 
 # ------------------------------------------------
 #  API Endpoint for Headers Data (RCI Module)
 # ------------------------------------------------
+@instrumented
+@cached_result
 def get_structure_summary_data(operator=None, state=None, district=None, mukim=None, dun=None):
     try:
-        print("\n🔍 Debug: Connecting to Azure Synapse Database for summary data...")
-
-        conn_str = (
-            f"DRIVER={driver};"
-            f"SERVER={server},{port};"
-            f"DATABASE={database};"
-            f"UID={username};"
-            f"PWD={password}"
-        )
+        groups = precomputed_groups(operator, state, district, mukim, dun)
+        if groups is not None:
+            return summarize_groups(groups)
 
-        # Build WHERE conditions
-        conditions = ["STATUS != 'DISCONTINUE'"]
-        if operator:
-            conditions.append(f"OPERATOR = '{operator}'")
-        if state:
-            conditions.append(f"STATE = '{state}'")
-        if district:
-            conditions.append(f"DISTRICT = '{district}'")
-        if mukim:
-            conditions.append(f"MUKIM = '{mukim}'")
-        if dun:
-            conditions.append(f"DUN = '{dun}'")
-        where_clause = "WHERE " + " AND ".join(conditions)
+        # Build parameterized WHERE conditions
+        predicates, params = tower_filters(operator, state, district, mukim, dun)
 
         query = f"""
         SELECT
@@ -310,219 +347,115 @@ def get_structure_summary_data(operator=None, state=None, district=None, mukim=N
             COUNT(DISTINCT PROJECTS) AS TOTAL_PROJECTS,
             COUNT(DISTINCT OWNER) AS TOTAL_OWNER
         FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES
-        {where_clause}
+        {where(predicates)}
         """
 
-        connection = pyodbc.connect(conn_str)
-        cursor = connection.cursor()
-        cursor.execute(query)
-        columns = [desc[0] for desc in cursor.description]
-        data = cursor.fetchall()
-        df = pd.DataFrame.from_records(data, columns=columns)
-        cursor.close()
-        connection.close()
-        print("✅ Structure summary data retrieved successfully.")
+        with pooled_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query, *params)
+            columns = [desc[0] for desc in cursor.description]
+            data = cursor.fetchall()
+            with query_phase("dataframe"):
+                df = pd.DataFrame.from_records(data, columns=columns)
+            cursor.close()
+        logger.debug("Structure summary data retrieved successfully.")
         return df
 
     except Exception as e:
-        print(f"❌ Error retrieving structure summary data: {e}")
+        logger.error("Error retrieving structure summary data: %s", e)
         return pd.DataFrame({"error": [str(e)]})
 
 
 # ------------------------------------------------------------------------------
-#  Function to fetch Tower Structures Data for Map Display (RCI Module)
+#  API Endpoint for the whole RCI Dashboard in one round trip (RCI Module)
 # ------------------------------------------------------------------------------
-def get_tower_structures_data_map(offset=0, limit=10):
+@instrumented
+@cached_result
+def get_rci_dashboard_data(operator=None, state=None, district=None, mukim=None, dun=None):
     """
-    Fetch rows from TOWER_STRUCTURES using ROW_NUMBER() pagination for map display.
+    Fetch the summary, state, category, project and owner breakdowns for the
+    RCI dashboard in a single round trip to TOWER_STRUCTURES.
+
+    Dedicated SQL pools do not support GROUPING SETS, so one statement
+    returns two result shapes tagged by KIND: row counts grouped by all five
+    dimensions ('groups'), rolled up in pandas, and the distinct
+    STRUCTURE_IDs per OWNER ('owner'), which cannot be rolled up from the
+    first without counting a structure listed under two combinations twice.
     """
     try:
-        print("Connecting to Azure Synapse for TOWER_STRUCTURES map data...")
-
-        conn_str = (
-            f"DRIVER={driver};"
-            f"SERVER={server},{port};"
-            f"DATABASE={database};"
-            f"UID={username};"
-            f"PWD={password}"
-        )
+        owners = precomputed_distinct("OWNER", operator, state, district, mukim, dun)
+        groups = precomputed_groups(operator, state, district, mukim, dun) if owners is not None else None
+        if groups is not None:
+            return build_rci_dashboard(groups, owners)
 
-        conn = pyodbc.connect(conn_str)
-        cursor = conn.cursor()
-        print("✅ Connected to Azure Synapse successfully!")
+        predicates, params = tower_filters(operator, state, district, mukim, dun)
 
         query = f"""
-        WITH cte AS (
-            SELECT 
-                STRUCTURE_ID,
-                OPERATOR AS SERVICE_PROVIDER,
-                OWNER,
-                STRUCTURE_CATEGORY,
-                PROJECTS,
-                STATE,
-                DISTRICT,
-                MUKIM,
-                DUN,
-                PARLIAMENT,
-                X AS LONGITUDE,
-                Y AS LATITUDE,
-                ROW_NUMBER() OVER (ORDER BY STRUCTURE_ID) AS rn
-            FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES
-            WHERE STATUS != 'DISCONTINUE'
-        )
-        SELECT STRUCTURE_ID, SERVICE_PROVIDER, OWNER, STRUCTURE_CATEGORY, PROJECTS, 
-               STATE, DISTRICT, MUKIM, DUN, PARLIAMENT, LONGITUDE, LATITUDE
-        FROM cte
-        WHERE rn > {offset}
-          AND rn <= {offset} + {limit}
+        SELECT
+            'groups' AS KIND,
+            STATE,
+            STRUCTURE_CATEGORY,
+            PROJECTS,
+            OWNER,
+            OPERATOR,
+            COUNT(*) AS TOTAL_STRUCTURE,
+            NULL AS TOTAL_RCI
+        FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES
+        {where(predicates)}
+        GROUP BY STATE, STRUCTURE_CATEGORY, PROJECTS, OWNER, OPERATOR
+        UNION ALL
+        SELECT
+            'owner' AS KIND,
+            NULL,
+            NULL,
+            NULL,
+            OWNER,
+            NULL,
+            NULL,
+            COUNT(DISTINCT STRUCTURE_ID)
+        FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES
+        {where(predicates)}
+        GROUP BY OWNER
         """
 
-        cursor.execute(query)
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        df = pd.DataFrame.from_records(rows, columns=columns)
-
-        cursor.close()
-        conn.close()
-        print("✅ Map data fetched successfully!")
-        return df
-
-    except Exception as e:
-        print(f"❌ Error fetching TOWER_STRUCTURES map data: {e}")
-        return pd.DataFrame({"error": [str(e)]})
-    
-
-# ------------------------------------------------------------------------------
-#  Function to Get Filter Options for Tower Structures
-# ------------------------------------------------------------------------------
-def get_tower_structures_filter_options():
-    """Fetch distinct values for filter dropdowns (operator, state, district, mukim, dun)."""
-    try:
-        print("\n🔍 Debug: Connecting to Azure Synapse Database for filter options...")
-        conn_str = (
-            f"DRIVER={driver};"
-            f"SERVER={server},{port};"
-            f"DATABASE={database};"
-            f"UID={username};"
-            f"PWD={password}"
-        )
-        
-        connection = pyodbc.connect(conn_str)
-        print("✅ Database Connection Successful!")
-        
-        cursor = connection.cursor()
-
-        # Query to fetch distinct values for each filter option
-        queries = {
-            "operators": "SELECT DISTINCT OPERATOR FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES WHERE OPERATOR IS NOT NULL AND STATUS != 'DISCONTINUE' ORDER BY OPERATOR",
-            "states": "SELECT DISTINCT STATE FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES WHERE STATE IS NOT NULL AND STATUS != 'DISCONTINUE' ORDER BY STATE",
-            "districts": "SELECT DISTINCT DISTRICT FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES WHERE DISTRICT IS NOT NULL AND STATUS != 'DISCONTINUE' ORDER BY DISTRICT",
-            "mukims": "SELECT DISTINCT MUKIM FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES WHERE MUKIM IS NOT NULL AND STATUS != 'DISCONTINUE' ORDER BY MUKIM",
-            "duns": "SELECT DISTINCT DUN FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES WHERE DUN IS NOT NULL AND STATUS != 'DISCONTINUE' ORDER BY DUN",
-        }
-        
-        results = {}
-        
-        for key, query in queries.items():
-            cursor.execute(query)
-            # Convert each row's first element to a list
-            results[key] = [row[0] for row in cursor.fetchall()]
-        
-        cursor.close()
-        connection.close()
-        print("✅ Filter options retrieved successfully!")
-        return results
+        with pooled_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query, *params, *params)
+            columns = [desc[0] for desc in cursor.description]
+            data = cursor.fetchall()
+            with query_phase("dataframe"):
+                rows = pd.DataFrame.from_records(data, columns=columns)
+            cursor.close()
+
+        kind = rows.pop("KIND")
+        groups = rows[kind == "groups"].drop(columns="TOTAL_RCI").astype({"TOTAL_STRUCTURE": int})
+        owners = rows.loc[kind == "owner", ["OWNER", "TOTAL_RCI"]].astype({"TOTAL_RCI": int})
+        logger.debug("RCI dashboard data retrieved successfully.")
+        return build_rci_dashboard(groups, owners)
 
     except Exception as e:
-        print(f"\n❌ Error retrieving filter options: {e}")
+        logger.error("Error retrieving RCI dashboard data: %s", e)
         return {"error": str(e)}
 
+
 # ------------------------------------------------------------------------------
-#  **ENHANCED** Function to Get Filtered Tower Structures Data - MAIN FIX
+#  Function to fetch Tower Structures Data for Map Display (RCI Module)
 # ------------------------------------------------------------------------------
-def get_tower_structures_filtered(operator=None, state=None, district=None, mukim=None, dun=None, offset=0, limit=1000):
+@instrumented
+def get_tower_structures_data_map(offset=0, limit=10):
     """
-    Fetch data from TOWER_STRUCTURES with filter conditions.
-    **CRITICAL FIX: Handle empty/None filters properly**
+    Fetch rows from TOWER_STRUCTURES using ROW_NUMBER() pagination for map display.
     """
     try:
-        print(f"\n🔍 Debug: Connecting to Azure Synapse for filtered TOWER_STRUCTURES data...")
-        print(f"📋 Raw filters received: operator='{operator}', state='{state}', district='{district}', mukim='{mukim}', dun='{dun}'")
-        
-        conn_str = (
-            f"DRIVER={driver};"
-            f"SERVER={server},{port};"
-            f"DATABASE={database};"
-            f"UID={username};"
-            f"PWD={password}"
-        )
+        snapshot = get_tower_snapshot()
+        if snapshot is not None:
+            return snapshot.map_rows(offset=offset, limit=limit)
 
-        connection = pyodbc.connect(conn_str)
-        cursor = connection.cursor()
-        print("✅ Connected to Azure Synapse successfully!")
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
 
-        # **CRITICAL FIX: Check if any filters are actually provided**
-        # Clean up filter values and check for meaningful content
-        cleaned_filters = {}
-        
-        def is_meaningful_filter(value):
-            """Check if a filter value is meaningful (not empty, null, or 'All...')"""
-            if not value:
-                return False
-            str_value = str(value).strip().lower()
-            if str_value in ['', 'none', 'null', 'undefined']:
-                return False
-            if str_value.startswith('all '):  # 'all operators', 'all states', etc.
-                return False
-            return True
-        
-        if is_meaningful_filter(operator):
-            cleaned_filters['operator'] = str(operator).strip()
-        if is_meaningful_filter(state):
-            cleaned_filters['state'] = str(state).strip()
-        if is_meaningful_filter(district):
-            cleaned_filters['district'] = str(district).strip()
-        if is_meaningful_filter(mukim):
-            cleaned_filters['mukim'] = str(mukim).strip()
-        if is_meaningful_filter(dun):
-            cleaned_filters['dun'] = str(dun).strip()
-        
-        has_filters = len(cleaned_filters) > 0
-        print(f"📊 Cleaned filters: {cleaned_filters}")
-        print(f"🏷️ Has active filters: {has_filters}")
-        
-        if not has_filters:
-            # **NO FILTERS PROVIDED - Return all data (same as map endpoint)**
-            print("📊 No filters provided, returning all data...")
-            base_query = f"""
-            WITH cte AS (
-                SELECT 
-                    STRUCTURE_ID,
-                    OPERATOR AS SERVICE_PROVIDER,
-                    OWNER,
-                    STRUCTURE_CATEGORY,
-                    PROJECTS,
-                    STATE,
-                    DISTRICT,
-                    MUKIM,
-                    DUN,
-                    PARLIAMENT,
-                    X AS LONGITUDE,
-                    Y AS LATITUDE,
-                    ROW_NUMBER() OVER (ORDER BY STRUCTURE_ID) AS rn
-                FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES
-                WHERE STATUS != 'DISCONTINUE'
-            )
-            SELECT STRUCTURE_ID, SERVICE_PROVIDER, OWNER, STRUCTURE_CATEGORY, PROJECTS, 
-                   STATE, DISTRICT, MUKIM, DUN, PARLIAMENT, LONGITUDE, LATITUDE
-            FROM cte
-            WHERE rn > {offset}
-              AND rn <= {offset} + {limit}
-            """
-        else:
-            # **FILTERS PROVIDED - Apply them**
-            print("🔍 Filters provided, applying conditions...")
-            base_query = """
+            window, params = row_window(offset, limit)
+            query = f"""
             WITH cte AS (
                 SELECT 
                     STRUCTURE_ID,
@@ -540,118 +473,189 @@ def get_tower_structures_filtered(operator=None, state=None, district=None, muki
                     ROW_NUMBER() OVER (ORDER BY STRUCTURE_ID) AS rn
                 FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES
                 WHERE STATUS != 'DISCONTINUE'
-            """
-            
-            # Add filter conditions using cleaned filters
-            conditions = []
-            if 'operator' in cleaned_filters:
-                conditions.append(f"OPERATOR = '{cleaned_filters['operator']}'")
-            if 'state' in cleaned_filters:
-                conditions.append(f"STATE = '{cleaned_filters['state']}'")
-            if 'district' in cleaned_filters:
-                conditions.append(f"DISTRICT = '{cleaned_filters['district']}'")
-            if 'mukim' in cleaned_filters:
-                conditions.append(f"MUKIM = '{cleaned_filters['mukim']}'")
-            if 'dun' in cleaned_filters:
-                conditions.append(f"DUN = '{cleaned_filters['dun']}'")
-            
-            # Add conditions to the query
-            if conditions:
-                base_query += " AND " + " AND ".join(conditions)
-                print(f"📋 Applied conditions: {conditions}")
-            
-            # Complete the query
-            base_query += f"""
             )
             SELECT STRUCTURE_ID, SERVICE_PROVIDER, OWNER, STRUCTURE_CATEGORY, PROJECTS, 
                    STATE, DISTRICT, MUKIM, DUN, PARLIAMENT, LONGITUDE, LATITUDE
             FROM cte
-            WHERE rn > {offset}
-              AND rn <= {offset} + {limit}
+            WHERE {window}
             """
 
-        print("🔍 Executing query...")
-        cursor.execute(base_query)
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        df = pd.DataFrame.from_records(rows, columns=columns)
+            cursor.execute(query, *params)
+            columns = [desc[0] for desc in cursor.description]
+            rows = cursor.fetchall()
+            with query_phase("dataframe"):
+                df = pd.DataFrame.from_records(rows, columns=columns)
+
+            cursor.close()
+        logger.debug("Map data fetched successfully!")
+        return df
+
+    except Exception as e:
+        logger.error("Error fetching TOWER_STRUCTURES map data: %s", e)
+        return pd.DataFrame({"error": [str(e)]})
+    
+
+# ------------------------------------------------------------------------------
+#  Stream Tower Structures rows for map display in fetchmany() batches
+# ------------------------------------------------------------------------------
+def stream_tower_structures_map(operator=None, state=None, district=None, mukim=None, dun=None,
+                                after=None, limit=None, batch_size=5000):
+    """
+    Yield ``(description, rows)`` batches of map rows ordered by
+    STRUCTURE_ID, starting after the key ``after`` and stopping after
+    ``limit`` rows (all matching rows when None). ``description`` is the
+    pyodbc ``cursor.description``; an empty result yields one empty batch.
+
+    Rows are pulled with ``fetchmany(batch_size)``, so only one batch is in
+    memory at a time. The pooled connection is held until the generator is
+    exhausted or closed. Errors are raised, not returned as a DataFrame.
+    """
+    snapshot = get_tower_snapshot()
+    if snapshot is not None:
+        yield from snapshot.map_batches(operator, state, district, mukim, dun,
+                                        after=after, limit=limit, batch_size=batch_size)
+        return
+
+    predicates, params = tower_filters(operator, state, district, mukim, dun)
+    if after is not None:
+        predicates.append("STRUCTURE_ID > ?")
+        params.append(after)
+    top = ""
+    if limit is not None:
+        top = "TOP (?) "
+        params.insert(0, int(limit))
+
+    query = f"""
+    SELECT {top}
+        STRUCTURE_ID,
+        OPERATOR AS SERVICE_PROVIDER,
+        OWNER,
+        STRUCTURE_CATEGORY,
+        PROJECTS,
+        STATE,
+        DISTRICT,
+        MUKIM,
+        DUN,
+        PARLIAMENT,
+        X AS LONGITUDE,
+        Y AS LATITUDE
+    FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES
+    {where(predicates)}
+    ORDER BY STRUCTURE_ID
+    """
+
+    logger.debug("Streaming TOWER_STRUCTURES map data from Azure Synapse...")
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(query, *params)
+            rows = cursor.fetchmany(batch_size)
+            yield cursor.description, rows
+            while rows:
+                rows = cursor.fetchmany(batch_size)
+                if rows:
+                    yield cursor.description, rows
+        finally:
+            cursor.close()
+
+
+# ------------------------------------------------------------------------------
+#  Function to Get Filter Options for Tower Structures
+# ------------------------------------------------------------------------------
+@instrumented
+def get_tower_structures_filter_options():
+    """
+    Distinct values for filter dropdowns (operator, state, district, mukim, dun),
+    served from the in-memory filter hierarchy.
+    """
+    try:
+        return get_filter_hierarchy().filter_options()
+
+    except Exception as e:
+        logger.error("Error retrieving filter options: %s", e)
+        return {"error": str(e)}
+
+# ------------------------------------------------------------------------------
+#  **ENHANCED** Function to Get Filtered Tower Structures Data - MAIN FIX
+# ------------------------------------------------------------------------------
+@instrumented
+def get_tower_structures_filtered(operator=None, state=None, district=None, mukim=None, dun=None, offset=0, limit=1000):
+    """
+    Fetch data from TOWER_STRUCTURES with filter conditions.
+    **CRITICAL FIX: Handle empty/None filters properly**
+    """
+    try:
+        snapshot = get_tower_snapshot()
+        if snapshot is not None:
+            return snapshot.map_rows(operator, state, district, mukim, dun, offset=offset, limit=limit)
+
+        logger.debug("Raw filters received: operator=%r, state=%r, district=%r, mukim=%r, dun=%r", operator, state, district, mukim, dun)
+
+        # Unset, empty and 'All ...' filters are dropped (see normalize_filter); the
+        # rest are bound as parameters, so each filter combination has one SQL text.
+        predicates, params = tower_filters(operator, state, district, mukim, dun)
+        window, window_params = row_window(offset, limit)
+        logger.debug("Active filter predicates: %s", predicates[1:])
+
+        query = f"""
+        WITH cte AS (
+            SELECT 
+                STRUCTURE_ID,
+                OPERATOR AS SERVICE_PROVIDER,
+                OWNER,
+                STRUCTURE_CATEGORY,
+                PROJECTS,
+                STATE,
+                DISTRICT,
+                MUKIM,
+                DUN,
+                PARLIAMENT,
+                X AS LONGITUDE,
+                Y AS LATITUDE,
+                ROW_NUMBER() OVER (ORDER BY STRUCTURE_ID) AS rn
+            FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES
+            {where(predicates)}
+        )
+        SELECT STRUCTURE_ID, SERVICE_PROVIDER, OWNER, STRUCTURE_CATEGORY, PROJECTS, 
+               STATE, DISTRICT, MUKIM, DUN, PARLIAMENT, LONGITUDE, LATITUDE
+        FROM cte
+        WHERE {window}
+        """
+
+        with pooled_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query, *params, *window_params)
+            columns = [desc[0] for desc in cursor.description]
+            rows = cursor.fetchall()
+            with query_phase("dataframe"):
+                df = pd.DataFrame.from_records(rows, columns=columns)
 
-        cursor.close()
-        connection.close()
+            cursor.close()
         
         result_count = len(df)
-        print(f"✅ Filtered data fetched successfully! Returned {result_count} records")
+        logger.debug("Filtered data fetched successfully! Returned %s records", result_count)
         
         if result_count == 0:
-            print("⚠️ Warning: No records found with the applied filters")
+            logger.warning("No records found with the applied filters")
         
         return df
 
     except Exception as e:
-        print(f"❌ Error fetching filtered TOWER_STRUCTURES data: {e}")
+        logger.error("Error fetching filtered TOWER_STRUCTURES data: %s", e)
         return pd.DataFrame({"error": [str(e)]})
 
 # ------------------------------------------------------------------------------
 #  Function to Get Dependent Filter Options
 # ------------------------------------------------------------------------------
-def get_dependent_filter_options(state=None):
-    """Fetch dependent filter options based on selected parent filters."""
+@instrumented
+def get_dependent_filter_options(state=None, district=None):
+    """
+    Dependent filter options based on selected parent filters, served from the
+    in-memory filter hierarchy (state → districts/mukims/duns, district → mukims/duns).
+    """
     try:
-        print(f"\n🔍 Debug: Connecting to Azure Synapse Database for dependent filter options (state={state})...")
-        conn_str = (
-            f"DRIVER={driver};"
-            f"SERVER={server},{port};"
-            f"DATABASE={database};"
-            f"UID={username};"
-            f"PWD={password}"
-        )
-        
-        connection = pyodbc.connect(conn_str)
-        print("✅ Database Connection Successful!")
-        
-        cursor = connection.cursor()
-
-        results = {}
-        
-        # Get districts for selected state
-        if state:
-            cursor.execute(f"""
-                SELECT DISTINCT DISTRICT 
-                FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES 
-                WHERE STATE = '{state}' 
-                    AND DISTRICT IS NOT NULL
-                    AND STATUS != 'DISCONTINUE' 
-                ORDER BY DISTRICT
-            """)
-            results["districts"] = [row[0] for row in cursor.fetchall()]
-            
-            # Get mukims for selected state
-            cursor.execute(f"""
-                SELECT DISTINCT MUKIM 
-                FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES 
-                WHERE STATE = '{state}' 
-                    AND MUKIM IS NOT NULL
-                    AND STATUS != 'DISCONTINUE'
-                ORDER BY MUKIM
-            """)
-            results["mukims"] = [row[0] for row in cursor.fetchall()]
-            
-            # Get DUNs for selected state
-            cursor.execute(f"""
-                SELECT DISTINCT DUN 
-                FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES 
-                WHERE STATE = '{state}' 
-                    AND DUN IS NOT NULL
-                    AND STATUS != 'DISCONTINUE'
-                ORDER BY DUN
-            """)
-            results["duns"] = [row[0] for row in cursor.fetchall()]
-        
-        cursor.close()
-        connection.close()
-        print("✅ Dependent filter options retrieved successfully!")
-        return results
+        return get_filter_hierarchy().dependent_options(state=state, district=district)
 
     except Exception as e:
-        print(f"\n❌ Error retrieving dependent filter options: {e}")
-        return {"error": str(e)}
\ No newline at end of file
+        logger.error("Error retrieving dependent filter options: %s", e)
+        return {"error": str(e)}
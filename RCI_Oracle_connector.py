@@ -92,11 +92,14 @@
 #     print(df_result)  # Print DataFrame
 
 import cx_Oracle
+import logging
 import os
 from dotenv import load_dotenv
 import pandas as pd
 from flask import request, jsonify
 
+logger = logging.getLogger(__name__)
+
 # Load environment variables
 load_dotenv()
 
@@ -110,14 +113,13 @@ oracle_service = "mcmccims"
 # Initialize Oracle Client
 try:
     cx_Oracle.init_oracle_client(lib_dir=r"C:\Oracle\instantclient_23_7")
-    print("✅ Oracle Client Initialized Successfully!")
+    logger.debug("Oracle Client Initialized Successfully!")
 except Exception as e:
-    print(f"❌ Failed to initialize Oracle client: {e}")
+    logger.error("Failed to initialize Oracle client: %s", e)
 
 def get_operator_structure_data(limit, offset):
     """Fetch distinct operator structure data with pagination."""
     try:
-        print("\n🔍 Debug: Connecting to Oracle Database...")
         dsn = cx_Oracle.makedsn(
             host=oracle_host,
             port=oracle_port,
@@ -129,7 +131,6 @@ def get_operator_structure_data(limit, offset):
             password=password,
             dsn=dsn
         )
-        print("✅ Database Connection Successful!")
 
         cursor = connection.cursor()
 
@@ -166,40 +167,38 @@ def get_operator_structure_data(limit, offset):
 
         cursor.close()
         connection.close()
-        print("✅ Data retrieval successful!")
+        logger.debug("Data retrieval successful!")
         return df
 
     except cx_Oracle.DatabaseError as error:
-        print(f"\n❌ Database Error: {error}")
+        logger.error("Database Error: %s", error)
         return pd.DataFrame({"error": [str(error)]})
 
     except Exception as e:
-        print(f"\n❌ Unexpected Error: {e}")
+        logger.error("Unexpected Error: %s", e)
         return pd.DataFrame({"error": [str(e)]})
 
 def fetch_operator_structure():
     """Fetch operator structure data from the Oracle database with pagination."""
     try:
-        print("\n🔍 Debug: Received request to fetch operator structure data.")
-
         # Get pagination parameters
         limit = request.args.get("limit", default=10, type=int)  # Default limit: 10 rows
         offset = request.args.get("offset", default=0, type=int)  # Default offset: 0
 
-        print(f"📌 Fetching data with limit={limit}, offset={offset}")
+        logger.debug("Fetching data with limit=%s, offset=%s", limit, offset)
 
         # Fetch paginated data
         data = get_operator_structure_data(limit, offset)
 
         if isinstance(data, dict) and "error" in data:
-            print(f"❌ Error fetching data: {data['error']}")
+            logger.error("Error fetching data: %s", data["error"])
             return jsonify(data), 500  # Return error with status code 500
 
-        print("✅ Data fetch successful!")
+        logger.debug("Data fetch successful!")
         return jsonify({"data": data.to_dict(orient="records"), "limit": limit, "offset": offset})
 
     except Exception as e:
-        print(f"❌ Exception occurred: {str(e)}")
+        logger.exception("Exception occurred: %s", e)
         return jsonify({"error": f"Failed to fetch data: {str(e)}"}), 500
 
 # Example usage (for debugging purposes)
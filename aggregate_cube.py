@@ -0,0 +1,203 @@
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from result_cache import normalize_filter, result_cache
+from synapse_pool import pooled_connection
+from tower_snapshot import FILTER_COLUMNS, GROUP_COLUMNS, get_tower_snapshot
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+#  Precomputed TOWER_STRUCTURES counts over every filter and group-by dimension
+# ------------------------------------------------------------------------------
+CUBE_ENABLED = os.getenv("AGGREGATE_CUBE_ENABLED", "true").lower() in ("1", "true", "yes")
+REFRESH_SECONDS = float(os.getenv("AGGREGATE_CUBE_REFRESH_SECONDS", "3600"))
+# A cube with more cells than this is not worth keeping; callers use live SQL
+MAX_CELLS = int(os.getenv("AGGREGATE_CUBE_MAX_CELLS", "2000000"))
+RETRY_SECONDS = 60
+
+CUBE_DIMENSIONS = ["OPERATOR", "STATE", "DISTRICT", "MUKIM", "DUN", "STRUCTURE_CATEGORY", "PROJECTS", "OWNER"]
+
+CUBE_QUERY = f"""
+SELECT
+    {", ".join(CUBE_DIMENSIONS)},
+    COUNT(*) AS TOTAL_STRUCTURE,
+    COUNT(DISTINCT STRUCTURE_ID) AS TOTAL_RCI
+FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES
+WHERE STATUS != 'DISCONTINUE'
+GROUP BY {", ".join(CUBE_DIMENSIONS)}
+"""
+
+DISTINCT_QUERY = """
+SELECT COUNT(DISTINCT STRUCTURE_ID) AS TOTAL_RCI
+FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES
+WHERE STATUS != 'DISCONTINUE'
+"""
+
+
+def _filter_key(value):
+    """Match Synapse's case-insensitive, trailing-space-insensitive comparison."""
+    return str(value).strip().casefold()
+
+
+class AggregateCube:
+    """
+    Immutable TOWER_STRUCTURES counts, one cell per combination of
+    CUBE_DIMENSIONS, with TOTAL_STRUCTURE (rows) and TOTAL_RCI (distinct
+    STRUCTURE_IDs).
+
+    Row counts roll up exactly by summing cells. Distinct counts only do
+    when no STRUCTURE_ID spans two cells, which is checked at build time
+    against the table-wide distinct count (``distinct_additive``).
+    """
+
+    def __init__(self, cells, total_distinct, source=None, loaded_at=None):
+        cells = cells.reset_index(drop=True)
+        self.cells = cells
+        self.total_distinct = int(total_distinct)
+        self.distinct_additive = int(cells["TOTAL_RCI"].sum()) == self.total_distinct
+        self.source = source
+        self.loaded_at = loaded_at or time.time()
+        self._keys = {
+            column: cells[column].map(_filter_key, na_action="ignore").astype("category")
+            for column in FILTER_COLUMNS.values()
+        }
+
+    def __len__(self):
+        return len(self.cells)
+
+    def covers(self, distinct=False):
+        """Whether the cube can answer a rollup (of distinct counts when ``distinct``)."""
+        return self.distinct_additive or not distinct
+
+    def groups(self, operator=None, state=None, district=None, mukim=None, dun=None):
+        """Same shape as ``TowerSnapshot.groups``, rolled up from the matching cells."""
+        mask = pd.Series(True, index=self.cells.index)
+        for name, value in (("operator", operator), ("state", state), ("district", district),
+                            ("mukim", mukim), ("dun", dun)):
+            value = normalize_filter(value)
+            if value is not None:
+                mask &= self._keys[FILTER_COLUMNS[name]] == _filter_key(value)
+        cells = self.cells[mask]
+        return cells.groupby(GROUP_COLUMNS, dropna=False, sort=False)[["TOTAL_STRUCTURE", "TOTAL_RCI"]].sum().reset_index()
+
+
+def build_cube_from_snapshot(snapshot):
+    df = snapshot.df
+    grouped = df.groupby(CUBE_DIMENSIONS, dropna=False, sort=False)["STRUCTURE_ID"]
+    cells = pd.DataFrame({
+        "TOTAL_STRUCTURE": grouped.size(),
+        "TOTAL_RCI": grouped.nunique(),
+    }).reset_index()
+    return AggregateCube(cells, df["STRUCTURE_ID"].nunique(), source=snapshot)
+
+
+def load_aggregate_cube():
+    """
+    Build the cube from the TOWER_STRUCTURES snapshot when there is one,
+    otherwise from one grouped scan in Synapse.
+    """
+    snapshot = get_tower_snapshot()
+    if snapshot is not None:
+        return build_cube_from_snapshot(snapshot)
+
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(CUBE_QUERY)
+        columns = [desc[0] for desc in cursor.description]
+        cells = pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+        cursor.execute(DISTINCT_QUERY)
+        total_distinct = cursor.fetchone()[0]
+        cursor.close()
+    return AggregateCube(cells, total_distinct)
+
+
+# ------------------------------------------------------------------------------
+#  Process-wide cube, rebuilt in the background and whenever the snapshot changes
+# ------------------------------------------------------------------------------
+_cube = None
+_lock = threading.Lock()
+_rebuild = threading.Event()  # set when a request finds the cube missing or stale
+_refresher_pid = None
+
+
+def refresh_aggregate_cube():
+    """Rebuild the cube and swap it in; the old one keeps serving on failure."""
+    global _cube
+    cube = load_aggregate_cube()
+    if len(cube) > MAX_CELLS:
+        raise ValueError(f"aggregate cube has {len(cube)} cells (AGGREGATE_CUBE_MAX_CELLS={MAX_CELLS})")
+    with _lock:
+        _cube = cube
+    # Aggregates cached from the previous cube are now stale.
+    result_cache.invalidate()
+    logger.info("Aggregate cube rebuilt (%s cells, distinct counts %s)",
+                len(cube), "additive" if cube.distinct_additive else "not additive")
+    return cube
+
+
+def _refresh_loop():
+    """
+    Build the cube straight away, then again whenever a request finds it
+    stale and every REFRESH_SECONDS (unless that is off); a failed build is
+    retried after RETRY_SECONDS.
+    """
+    while True:
+        cube = _cube
+        if cube is not None and not _stale(cube):
+            _rebuild.wait(REFRESH_SECONDS if REFRESH_SECONDS > 0 else None)
+            _rebuild.clear()
+        try:
+            refresh_aggregate_cube()
+        except Exception as e:
+            logger.warning("Aggregate cube unavailable, using live SQL: %s", e)
+            time.sleep(RETRY_SECONDS)
+
+
+def _ensure_refresher():
+    global _refresher_pid
+    if _refresher_pid == os.getpid():
+        return
+    with _lock:
+        if _refresher_pid == os.getpid():
+            return
+        _refresher_pid = os.getpid()
+    threading.Thread(target=_refresh_loop, name="aggregate-cube-refresh", daemon=True).start()
+
+
+def _stale(cube):
+    """A cube built from a snapshot that has since been replaced, or before one was loaded."""
+    snapshot = get_tower_snapshot()
+    return snapshot is not None and cube.source is not snapshot
+
+
+def get_aggregate_cube():
+    """
+    Return the current cube, or None when the cube is disabled, not built
+    yet or stale (callers then fall back to the snapshot or live SQL).
+
+    Building never happens on the request thread: a missing or stale cube
+    wakes the refresher thread, which swaps the new one in when it is done.
+    """
+    if not CUBE_ENABLED:
+        return None
+    _ensure_refresher()
+    cube = _cube
+    if cube is None or _stale(cube):
+        _rebuild.set()
+        return None
+    return cube
+
+
+def cube_status():
+    return {
+        "enabled": CUBE_ENABLED,
+        "cells": len(_cube) if _cube is not None else 0,
+        "distinct_additive": _cube.distinct_additive if _cube is not None else None,
+        "loaded_at": _cube.loaded_at if _cube is not None else None,
+        "refresh_seconds": REFRESH_SECONDS,
+    }
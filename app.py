@@ -1,6 +1,11 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
+import functools
+import hmac
+import logging
 import os
+import threading
+import time
 import pandas as pd
 import supabase
 from dotenv import load_dotenv
@@ -13,29 +18,147 @@ from index_AzureSynapse_connector import (
     get_fiber_optic_site_data,  # new function
     get_pudo_data,
     get_pedi_data,
-    get_mb_moran_mocn_data
+    get_mb_moran_mocn_data,
+    stream_table,
+    EXPORT_TABLES,
+    UNFILTERED_EXPORTS
 )
 
 # This is your Azure connector for operator structure
 # from RCI_Azure_connector import get_operator_structure_data
 from RCI_AzureSynapse_connector import (
     get_operator_structure_data,
+    get_owner_structure_data,
     get_structure_category_data,
     get_structure_project_data,
     get_structure_state_data,
     get_structure_summary_data,
+    get_rci_dashboard_data,
     get_tower_structures_data_map,
-    get_tower_structures_filtered          # ADD THIS - CRITICAL MISSING IMPORT
+    get_tower_structures_filtered,          # ADD THIS - CRITICAL MISSING IMPORT
+    stream_tower_structures_map
 )
+from coordinates import clean_coordinates
+from arrow_encoder import ARROW_MIMETYPE, dataframe_to_ipc, ipc_stream
+from json_encoder import OrjsonProvider, dataframe_records, ndjson_lines
+from table_export import (
+    BATCH_ROWS as EXPORT_BATCH_ROWS, EXPORT_FORMATS, GZIP_MIMETYPE, csv_chunks, gzip_chunks, parquet_chunks
+)
+from fanout import TIMEOUT_SECONDS as FANOUT_TIMEOUT_SECONDS, fan_out
+from pagination import InvalidCursor, decode_cursor, next_cursor
+from result_cache import result_cache
+from filter_hierarchy import hierarchy_status, refresh_filter_hierarchy
+import aggregate_cube
+import spatial_index
+import tower_snapshot
+from tiles import MVT_MIMETYPE, render_tile, tile_cache
+from coverage_gaps import SITE_LAYERS, SORT_COLUMNS, coverage_cache, coverage_page
+from app_logging import REQUEST_ID_HEADER, configure_logging, logging_status, new_request_id, request_id
+from metrics import HTTP_DURATION, HTTP_REQUESTS, HTTP_RESPONSE_BYTES, encoding, render_metrics, timed_body
 
 # Load environment variables
 load_dotenv()
 
-def clean_dataframe(df):
-    """Replace NaN/NaT with None for JSON serialization."""
-    if df is None or df.empty:
-        return pd.DataFrame()
-    return df.astype(object).where(pd.notnull(df), None)
+configure_logging()
+logger = logging.getLogger(__name__)
+
+def fetch_page(fetch, key_column, limit, offset):
+    """
+    Call a paged connector function in offset or keyset mode.
+
+    Passing ?after= (empty for the first page, then the previous response's
+    next_cursor) switches to keyset pagination on ``key_column``. Returns the
+    DataFrame and the paging fields for the JSON response.
+    """
+    token = request.args.get("after")
+    if token is None:
+        return fetch(offset=offset, limit=limit), {"limit": limit, "offset": offset}
+    if limit <= 0:
+        raise InvalidCursor("limit must be a positive integer when paging with ?after=")
+    df = fetch(limit=limit, after=decode_cursor(token), seek=True)
+    return df, {"limit": limit, "next_cursor": next_cursor(df, key_column, limit)}
+
+def wants_arrow():
+    """?format=arrow, or an Accept header that names the Arrow stream type."""
+    if request.args.get("format", "").lower() == "arrow":
+        return True
+    return any(mimetype == ARROW_MIMETYPE and quality > 0 for mimetype, quality in request.accept_mimetypes)
+
+def data_response(df, **fields):
+    """
+    ``{"data": df, **fields}`` as JSON, or ``df`` as an Arrow IPC stream with
+    ``fields`` JSON-encoded in the schema metadata when the client asks for Arrow.
+    """
+    if wants_arrow():
+        with encoding("arrow") as sizes:
+            body = dataframe_to_ipc(df, fields)
+            sizes.append(len(body))
+        return Response(body, mimetype=ARROW_MIMETYPE)
+    return jsonify({"data": df, **fields})
+
+def wants_stream():
+    return request.args.get("stream", "").lower() in ("ndjson", "arrow")
+
+def stream_map_rows(**filters):
+    """
+    Stream TOWER_STRUCTURES map rows as newline-delimited JSON
+    (?stream=ndjson) or as Arrow record batches (?stream=arrow, or any
+    stream request that negotiates Arrow), converted batch by batch from
+    the cursor.
+
+    ?limit= caps the row count (all rows when omitted) and ?after= resumes
+    after a STRUCTURE_ID cursor; ?offset= is not supported. The query runs
+    before the response starts, so it can still fail with a 500. An error
+    after that ends an NDJSON stream with an {"error": ...} line and cuts
+    an Arrow stream short.
+    """
+    if request.args.get("offset", default=0, type=int):
+        raise InvalidCursor("offset is not supported when streaming; use after=")
+    limit = request.args.get("limit", type=int)
+    if limit is not None and limit <= 0:
+        raise InvalidCursor("limit must be a positive integer")
+    after = decode_cursor(request.args.get("after"))
+    arrow = request.args.get("stream", "").lower() == "arrow" or wants_arrow()
+    batches = stream_tower_structures_map(**filters, after=after, limit=limit)
+    first = next(batches)
+
+    def all_batches():
+        yield first
+        yield from batches
+
+    def generate():
+        try:
+            if arrow:
+                yield from ipc_stream(all_batches())
+            else:
+                for description, rows in all_batches():
+                    yield ndjson_lines([desc[0] for desc in description], rows)
+        except Exception as e:
+            logger.error("Error while streaming TOWER_STRUCTURES map data: %s", e)
+            if not arrow:
+                yield ndjson_lines(["error"], [(str(e),)])
+        finally:
+            batches.close()
+
+    return Response(generate(), mimetype=ARROW_MIMETYPE if arrow else "application/x-ndjson")
+
+class InvalidBBox(ValueError):
+    """Raised when ?bbox= is not four comma-separated numbers."""
+
+def parse_bbox(text):
+    """
+    Parse ?bbox=min_lon,min_lat,max_lon,max_lat into a tuple of floats,
+    or None when the parameter is absent.
+    """
+    if not text:
+        return None
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in text.split(","))
+    except ValueError:
+        raise InvalidBBox("bbox must be min_lon,min_lat,max_lon,max_lat")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise InvalidBBox("bbox minimums must not exceed its maximums")
+    return min_lon, min_lat, max_lon, max_lat
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
@@ -48,8 +171,54 @@ supabase_client = supabase.create_client(SUPABASE_URL, SUPABASE_KEY)
 
 # Flask app initialization
 app = Flask(__name__)
+app.json = OrjsonProvider(app)  # jsonify() writes DataFrames directly via orjson
 CORS(app)
 
+
+# ----------------------------------------
+#  Request metrics (see metrics.py)
+# ----------------------------------------
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.request_id = new_request_id(request.headers.get(REQUEST_ID_HEADER))
+
+
+@app.after_request
+def record_request_metrics(response):
+    """
+    Count the request and time it per route. Streamed bodies are timed and
+    measured once the last chunk has been sent.
+    """
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    started = g.get("request_started", time.perf_counter())
+    HTTP_REQUESTS.inc(1, endpoint, request.method, str(response.status_code))
+    if response.is_streamed:
+        response.response = timed_body(response.response, endpoint, request.method, started)
+    else:
+        HTTP_RESPONSE_BYTES.inc(response.content_length or 0, endpoint)
+        HTTP_DURATION.observe(time.perf_counter() - started, endpoint, request.method)
+    if "request_id" in g:
+        response.headers[REQUEST_ID_HEADER] = g.request_id
+    return response
+
+
+@app.teardown_request
+def clear_request_id(exc=None):
+    # Server threads are reused; do not let the id leak into the next request's logs.
+    request_id.set("-")
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """
+    Prometheus metrics for this worker process: request latency and bytes
+    per route, connector latency and rows per function, and Synapse query
+    time per table and phase (connect, execute, fetch, dataframe).
+    Endpoint: GET /metrics
+    """
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
 # ----------------------------------------
 #  Home route
 # ----------------------------------------
@@ -146,34 +315,34 @@ def fetch_mb_network():
     """
     Fetch data from MB_NETWORK (in Azure Synapse) with pagination.
     Endpoint: GET /api/mb_network?limit=10&offset=0
+    Keyset paging: GET /api/mb_network?after=<next_cursor>&limit=1000
+    Arrow IPC: GET /api/mb_network?format=arrow (or Accept: application/vnd.apache.arrow.stream)
     """
     try:
-        print("\n🔍 Debug: Received request to fetch MB_NETWORK data.")
+        logger.debug("Received request to fetch MB_NETWORK data.")
 
         # Get pagination parameters
         limit = request.args.get("limit", default=0, type=int)   # default limit = 10
         offset = request.args.get("offset", default=0, type=int)    # default offset = 0
 
-        print(f"📌 Fetching MB_NETWORK data with limit={limit}, offset={offset}")
+        logger.debug("Fetching MB_NETWORK data with limit=%s, offset=%s", limit, offset)
 
         # Retrieve data from Synapse
-        df = get_mb_network_data(offset=offset, limit=limit)
+        df, page = fetch_page(get_mb_network_data, "MB_NETWORK_ID", limit, offset)
 
         if "error" in df.columns:
             error_message = df["error"].iloc[0]
-            print(f"❌ Error returned from query: {error_message}")
+            logger.error("Error returned from query: %s", error_message)
             return jsonify({"error": error_message}), 500
 
-        print("✅ MB_NETWORK data fetch successful!")
-        df = clean_dataframe(df)
-        return jsonify({
-            "data": df.to_dict(orient="records"),
-            "limit": limit,
-            "offset": offset
-        })
+        logger.debug("MB_NETWORK data fetch successful!")
+        return data_response(df, **page)
+
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
 
     except Exception as e:
-        print(f"❌ Exception in fetch_mb_network: {str(e)}")
+        logger.exception("Exception in fetch_mb_network")
         return jsonify({"error": str(e)}), 500
     
 
@@ -190,69 +359,109 @@ def get_mb_network_count():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
+# Spatial index layer behind each /api/data_sources_filtered source
+INDEXED_SOURCES = {
+    'Mobile Network': 'mb_network',
+    'RCI': 'tower_structures',
+    'Fiber Network': 'fiber_optic_site',
+    'NADI': 'pedi',
+    'PUDO': 'pudo',
+}
+
 # -------------------------------------
 #  NEW ROUTE: Fetch DATA_SOURCES Data 
 # -------------------------------------
 @app.route("/api/data_sources_filtered", methods=["GET"])
 def get_data_sources_filtered():
+    """
+    Combined map points from every source, or just ``source``.
+    Endpoint: GET /api/data_sources_filtered?source=All&state=&district=&limit=1000&offset=0
+    Optional: &bbox=min_lon,min_lat,max_lon,max_lat, &format=arrow for Arrow IPC
+
+    state and district are filtered in Synapse, so each source returns up
+    to ``limit`` matching rows. Rows whose coordinates do not parse or fall
+    outside Malaysia are then dropped. With a bbox every source is answered
+    from its in-memory spatial index instead, without touching Synapse
+    (RCI then only holds live, non-DISCONTINUE structures, as on the map).
+
+    Sources are fetched in parallel, each bounded by FANOUT_TIMEOUT_SECONDS
+    (or a shorter ?timeout=). Sources that fail or time out are left out of
+    ``data`` and reported under ``sources``, with ``partial`` set to true.
+    """
     try:
-        # Helper to clean floats
-        def safe_float(val):
-            try:
-                return float(str(val).replace('>', '').replace('<', '').strip())
-            except (ValueError, TypeError):
-                return None
-
         def clean_df(df, source_name):
             """Add source column and clean coordinates."""
             if df is None or df.empty:
                 return pd.DataFrame()
             df['SOURCE'] = source_name
-            if 'LATITUDE' in df.columns and 'LONGITUDE' in df.columns:
-                df['LATITUDE'] = df['LATITUDE'].apply(safe_float)
-                df['LONGITUDE'] = df['LONGITUDE'].apply(safe_float)
-                df = df.dropna(subset=['LATITUDE', 'LONGITUDE'])
-            return df
+            return clean_coordinates(df)
 
         # --- Query parameters ---
         source = request.args.get("source", "All")
         state = request.args.get("state")
         district = request.args.get("district")
+        bbox = parse_bbox(request.args.get("bbox"))
         limit = request.args.get("limit", default=1000, type=int)
         offset = request.args.get("offset", default=0, type=int)
 
-        # --- Collect dataframes ---
+        # --- Collect dataframes (sources are fetched concurrently) ---
+        fetchers = {
+            'Mobile Network': get_mb_network_data,
+            'RCI': get_tower_structures_data,
+            'Fiber Network': get_fiber_optic_site_data,
+            'NADI': get_pedi_data,
+            'PUDO': get_pudo_data,
+        }
+        if bbox is not None:
+            fetchers = {
+                name: functools.partial(spatial_index.layer_rows, layer, bbox,
+                                        {"STATE": state, "DISTRICT": district})
+                for name, layer in INDEXED_SOURCES.items()
+            }
+        else:
+            fetchers = {
+                name: functools.partial(fetch, state=state, district=district)
+                for name, fetch in fetchers.items()
+            }
+        tasks = {
+            name: functools.partial(fetch, offset=offset, limit=limit)
+            for name, fetch in fetchers.items()
+            if source in ("All", name)
+        }
+        timeout = request.args.get("timeout", type=float)
+        if timeout is not None:
+            timeout = min(max(timeout, 0.0), FANOUT_TIMEOUT_SECONDS)
+        results, sources = fan_out(tasks, timeout=timeout)
+
         data_frames = []
-        if source in ("All", "Mobile Network"):
-            data_frames.append(clean_df(get_mb_network_data(offset=offset, limit=limit), 'Mobile Network'))
-        if source in ("All", "RCI"):
-            data_frames.append(clean_df(get_tower_structures_data(offset=offset, limit=limit), 'RCI'))
-        if source in ("All", "Fiber Network"):
-            data_frames.append(clean_df(get_fiber_optic_site_data(offset=offset, limit=limit), 'Fiber Network'))
-        if source in ("All", "NADI"):
-            data_frames.append(clean_df(get_pedi_data(offset=offset, limit=limit), 'NADI'))
-        if source in ("All", "PUDO"):
-            data_frames.append(clean_df(get_pudo_data(offset=offset, limit=limit), 'PUDO'))
+        for name in tasks:
+            if name not in results:
+                logger.warning("%s %s: %s", name, sources[name]['status'], sources[name]['error'])
+                continue
+            df = results[name]
+            if df is not None and "error" in df.columns:
+                sources[name].update(status="error", error=str(df["error"].iloc[0]))
+                logger.warning("%s error: %s", name, sources[name]['error'])
+                continue
+            data_frames.append(clean_df(df, name))
+            sources[name]["rows"] = int(len(data_frames[-1]))
 
         # --- Combine into one dataframe ---
-        combined_df = pd.concat([df for df in data_frames if not df.empty], ignore_index=True) if data_frames else pd.DataFrame(columns=['LATITUDE', 'LONGITUDE', 'STATE', 'DISTRICT', 'SOURCE'])
-
-        # --- Apply filters ---
-        if state and state.lower() != "all":
-            combined_df = combined_df[combined_df['STATE'].str.strip().str.lower() == state.strip().lower()]
-        if district and district.lower() != "all":
-            combined_df = combined_df[combined_df['DISTRICT'].str.strip().str.lower() == district.strip().lower()]
-
-        # --- Final cleaning for JSON ---
-        combined_df = clean_dataframe(combined_df)
+        data_frames = [df for df in data_frames if not df.empty]
+        combined_df = pd.concat(data_frames, ignore_index=True) if data_frames else pd.DataFrame(columns=['LATITUDE', 'LONGITUDE', 'STATE', 'DISTRICT', 'SOURCE'])
+
+        return data_response(
+            combined_df,
+            count=int(len(combined_df)),
+            sources=sources,
+            partial=any(info["status"] != "ok" for info in sources.values())
+        )
 
-        return jsonify({
-            "data": combined_df.to_dict(orient="records"),
-            "count": int(len(combined_df))
-        })
+    except InvalidBBox as e:
+        return jsonify({"error": str(e)}), 400
 
     except Exception as e:
-        print(f"❌ Error in get_data_sources_filtered: {e}")
+        logger.error("Error in get_data_sources_filtered: %s", e)
         return jsonify({"error": str(e)}), 500
 
 # ----------------------------------------
@@ -263,34 +472,34 @@ def fetch_tower_structures():
     """
     Fetch data from TOWER_STRUCTURES (in Azure Synapse) with pagination.
     Endpoint: GET /api/tower_structures?limit=10&offset=0
+    Keyset paging: GET /api/tower_structures?after=<next_cursor>&limit=1000
+    Arrow IPC: GET /api/tower_structures?format=arrow (or Accept: application/vnd.apache.arrow.stream)
     """
     try:
-        print("\n🔍 Debug: Received request to fetch TOWER_STRUCTURES data.")
+        logger.debug("Received request to fetch TOWER_STRUCTURES data.")
 
         # Get pagination parameters
         limit = request.args.get("limit", default=10, type=int)
         offset = request.args.get("offset", default=0, type=int)
 
-        print(f"📌 Fetching TOWER_STRUCTURES data with limit={limit}, offset={offset}")
+        logger.debug("Fetching TOWER_STRUCTURES data with limit=%s, offset=%s", limit, offset)
 
         # Retrieve data from Synapse using the new function
-        df = get_tower_structures_data(offset=offset, limit=limit)
+        df, page = fetch_page(get_tower_structures_data, "STRUCTURE_ID", limit, offset)
 
         if "error" in df.columns:
             error_message = df["error"].iloc[0]
-            print(f"❌ Error returned from query: {error_message}")
+            logger.error("Error returned from query: %s", error_message)
             return jsonify({"error": error_message}), 500
 
-        print("✅ TOWER_STRUCTURES data fetch successful!")
-        df = clean_dataframe(df)
-        return jsonify({
-            "data": df.to_dict(orient="records"),
-            "limit": limit,
-            "offset": offset
-        })
+        logger.debug("TOWER_STRUCTURES data fetch successful!")
+        return data_response(df, **page)
+
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
 
     except Exception as e:
-        print(f"❌ Exception in fetch_tower_structures: {str(e)}")
+        logger.exception("Exception in fetch_tower_structures")
         return jsonify({"error": str(e)}), 500
 
 # ----------------------------------------
@@ -305,34 +514,34 @@ def fetch_fiber_optic_sites():
       STRUCTURE_TYPE (from STRUCTURE_TYPE_CODE), DISTRICT, MUKIM, DUN,
       PARLIAMENT, LONGITUDE, LATITUDE.
     Endpoint: GET /api/fiber_optic_sites?limit=10&offset=0
+    Keyset paging: GET /api/fiber_optic_sites?after=<next_cursor>&limit=1000
+    Arrow IPC: GET /api/fiber_optic_sites?format=arrow (or Accept: application/vnd.apache.arrow.stream)
     """
     try:
-        print("\n🔍 Debug: Received request to fetch FIBER_OPTIC_SITE data.")
+        logger.debug("Received request to fetch FIBER_OPTIC_SITE data.")
 
         # Get pagination parameters
         limit = request.args.get("limit", default=10, type=int)
         offset = request.args.get("offset", default=0, type=int)
 
-        print(f"📌 Fetching FIBER_OPTIC_SITE data with limit={limit}, offset={offset}")
+        logger.debug("Fetching FIBER_OPTIC_SITE data with limit=%s, offset=%s", limit, offset)
 
         # Retrieve data from Synapse using the new function
-        df = get_fiber_optic_site_data(offset=offset, limit=limit)
+        df, page = fetch_page(get_fiber_optic_site_data, "REFID", limit, offset)
 
         if "error" in df.columns:
             error_message = df["error"].iloc[0]
-            print(f"❌ Error returned from query: {error_message}")
+            logger.error("Error returned from query: %s", error_message)
             return jsonify({"error": error_message}), 500
 
-        print("✅ FIBER_OPTIC_SITE data fetch successful!")
-        df = clean_dataframe(df)
-        return jsonify({
-            "data": df.to_dict(orient="records"),
-            "limit": limit,
-            "offset": offset
-        })
+        logger.debug("FIBER_OPTIC_SITE data fetch successful!")
+        return data_response(df, **page)
+
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
 
     except Exception as e:
-        print(f"❌ Exception in fetch_fiber_optic_sites: {str(e)}")
+        logger.exception("Exception in fetch_fiber_optic_sites")
         return jsonify({"error": str(e)}), 500
 
 
@@ -344,40 +553,36 @@ def fetch_pudo():
     """
     Fetch data from PUDO (in Azure Synapse) with pagination.
     Endpoint: GET /api/pudo?limit=10&offset=0
+    Keyset paging: GET /api/pudo?after=<next_cursor>&limit=1000
+    Arrow IPC: GET /api/pudo?format=arrow (or Accept: application/vnd.apache.arrow.stream)
     """
     try:
-        print("\n🔍 Debug: Received request to fetch PUDO data.")
+        logger.debug("Received request to fetch PUDO data.")
 
         # Get pagination parameters
         limit = request.args.get("limit", default=10, type=int)
         offset = request.args.get("offset", default=0, type=int)
 
-        print(f"📌 Fetching PUDO data with limit={limit}, offset={offset}")
+        logger.debug("Fetching PUDO data with limit=%s, offset=%s", limit, offset)
 
         # Retrieve data from Synapse
-        df = get_pudo_data(offset=offset, limit=limit)
+        df, page = fetch_page(get_pudo_data, "REFID", limit, offset)
 
         # If there's an error column in the DataFrame, handle it
         if "error" in df.columns:
             error_message = df["error"].iloc[0]
-            print(f"❌ Error returned from query: {error_message}")
+            logger.error("Error returned from query: %s", error_message)
             return jsonify({"error": error_message}), 500
 
-        df = clean_dataframe(df)
-        
-        # Convert to list of dicts
-        data_records = df.to_dict(orient="records")
-
         # Return JSON
-        print("✅ PUDO data fetch successful!")
-        return jsonify({
-            "data": data_records,
-            "limit": limit,
-            "offset": offset
-        })
+        logger.debug("PUDO data fetch successful!")
+        return data_response(df, **page)
+
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
 
     except Exception as e:
-        print(f"❌ Exception in fetch_pudo: {str(e)}")
+        logger.exception("Exception in fetch_pudo")
         return jsonify({"error": str(e)}), 500
     
 
@@ -389,39 +594,36 @@ def fetch_pedi():
     """
     Fetch data from PEDI (in Azure Synapse) with pagination.
     Endpoint: GET /api/pedi?limit=10&offset=0
+    Keyset paging: GET /api/pedi?after=<next_cursor>&limit=1000
+    Arrow IPC: GET /api/pedi?format=arrow (or Accept: application/vnd.apache.arrow.stream)
     """
     try:
-        print("\n🔍 Debug: Received request to fetch PEDI data.")
+        logger.debug("Received request to fetch PEDI data.")
 
         # Get pagination parameters
         limit = request.args.get("limit", default=10, type=int)
         offset = request.args.get("offset", default=0, type=int)
 
-        print(f"📌 Fetching PEDI data with limit={limit}, offset={offset}")
+        logger.debug("Fetching PEDI data with limit=%s, offset=%s", limit, offset)
 
         # Retrieve data from Synapse
-        df = get_pedi_data(offset=offset, limit=limit)
+        df, page = fetch_page(get_pedi_data, "MASKED_ID", limit, offset)
 
         # If there's an error column in the DataFrame, handle it
         if "error" in df.columns:
             error_message = df["error"].iloc[0]
-            print(f"❌ Error returned from query: {error_message}")
+            logger.error("Error returned from query: %s", error_message)
             return jsonify({"error": error_message}), 500
 
-        df = clean_dataframe(df)
-        # Convert DataFrame to list of dicts
-        data_records = df.to_dict(orient="records")
-
         # Return JSON
-        print("✅ PEDI data fetch successful!")
-        return jsonify({
-            "data": data_records,
-            "limit": limit,
-            "offset": offset
-        })
+        logger.debug("PEDI data fetch successful!")
+        return data_response(df, **page)
+
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
 
     except Exception as e:
-        print(f"❌ Exception in fetch_pedi: {str(e)}")
+        logger.exception("Exception in fetch_pedi")
         return jsonify({"error": str(e)}), 500
 
 
@@ -433,37 +635,103 @@ def fetch_mb_moran_mocn():
     """
     Fetch data from MB_MORAN_MOCN_FULL (in Azure Synapse) with pagination.
     Endpoint: GET /api/mb_moran_mocn?limit=10&offset=0
+    Keyset paging: GET /api/mb_moran_mocn?after=<next_cursor>&limit=1000
+    Arrow IPC: GET /api/mb_moran_mocn?format=arrow (or Accept: application/vnd.apache.arrow.stream)
     """
     try:
-        print("\n🔍 Debug: Received request to fetch MB_MORAN_MOCN data.")
+        logger.debug("Received request to fetch MB_MORAN_MOCN data.")
 
         # Get pagination parameters
         limit = request.args.get("limit", default=10, type=int)
         offset = request.args.get("offset", default=0, type=int)
 
-        print(f"📌 Fetching MB_MORAN_MOCN data with limit={limit}, offset={offset}")
+        logger.debug("Fetching MB_MORAN_MOCN data with limit=%s, offset=%s", limit, offset)
 
         # Retrieve data from Synapse using the updated connector function
-        df = get_mb_moran_mocn_data(offset=offset, limit=limit)
+        df, page = fetch_page(get_mb_moran_mocn_data, "MB_NETWORK_ID", limit, offset)
 
         if "error" in df.columns:
             error_message = df["error"].iloc[0]
-            print(f"❌ Error returned from query: {error_message}")
+            logger.error("Error returned from query: %s", error_message)
             return jsonify({"error": error_message}), 500
 
-        print("✅ MB_MORAN_MOCN data fetch successful!")
-        df = clean_dataframe(df)
-        return jsonify({
-            "data": df.to_dict(orient="records"),
-            "limit": limit,
-            "offset": offset
-        })
+        logger.debug("MB_MORAN_MOCN data fetch successful!")
+        return data_response(df, **page)
+
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
 
     except Exception as e:
-        print(f"❌ Exception in fetch_mb_moran_mocn: {str(e)}")
+        logger.exception("Exception in fetch_mb_moran_mocn")
         return jsonify({"error": str(e)}), 500
 
 
+# ----------------------------------------
+#  NEW ROUTE: Bulk export of a whole cims_geo table (Synapse)
+# ----------------------------------------
+@app.route("/api/export/<table>", methods=["GET"])
+def export_table(table):
+    """
+    Stream every row of a cims_geo table as one CSV or Parquet download.
+    Endpoint: GET /api/export/{mb_network|tower_structures|fiber_optic_site|pudo|pedi|mb_moran_mocn}?format=csv
+    Optional: &format=parquet, &gzip=true, &state=, &district=, &bbox=min_lon,min_lat,max_lon,max_lat
+
+    Rows are fetched, encoded and sent EXPORT_BATCH_ROWS at a time (one
+    Parquet row group per batch), so memory does not grow with the table.
+    gzip compresses a CSV download as .csv.gz and switches Parquet to its
+    internal gzip codec. The query runs before the response starts; an error
+    after that cuts the file short.
+    """
+    if table not in EXPORT_TABLES:
+        return jsonify({"error": f"Unknown table '{table}'"}), 404
+    export_format = request.args.get("format", "csv").lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    gzip = request.args.get("gzip", "").lower() in ("1", "true", "yes")
+
+    try:
+        state = request.args.get("state")
+        district = request.args.get("district")
+        bbox = parse_bbox(request.args.get("bbox"))
+        if table in UNFILTERED_EXPORTS and (state or district or bbox):
+            return jsonify({"error": f"{table} cannot be filtered by state, district or bbox"}), 400
+
+        batches = stream_table(table, state=state, district=district, bbox=bbox, batch_size=EXPORT_BATCH_ROWS)
+        first = next(batches)
+
+    except InvalidBBox as e:
+        return jsonify({"error": str(e)}), 400
+
+    except Exception as e:
+        logger.exception("Exception in export_table")
+        return jsonify({"error": str(e)}), 500
+
+    def all_batches():
+        yield first
+        yield from batches
+
+    def generate():
+        try:
+            if export_format == "parquet":
+                yield from parquet_chunks(all_batches(), compression="gzip" if gzip else "snappy")
+            elif gzip:
+                yield from gzip_chunks(csv_chunks(all_batches()))
+            else:
+                yield from csv_chunks(all_batches())
+        except Exception as e:
+            logger.error("Error while exporting %s: %s", table, e)
+        finally:
+            batches.close()
+
+    filename = f"{table}.{export_format}"
+    mimetype = EXPORT_FORMATS[export_format]
+    if gzip and export_format == "csv":
+        filename, mimetype = f"{filename}.gz", GZIP_MIMETYPE
+    response = Response(generate(), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
 # ----------------------------------------------------
 #  Fetch Operator Structure Data (RCI Module - Azure)
 # ----------------------------------------------------
@@ -473,18 +741,6 @@ def fetch_operator_structure():
     Fetch total structure count by OWNER (operator) from Azure Synapse.
     Supports filters: operator, state, district, mukim, dun (all optional).
     """
-    import os
-    import pyodbc
-    import pandas as pd
-
-    # --- Database connection config ---
-    server = os.getenv('DB_SERVER')
-    database = os.getenv('DB_DATABASE')
-    username = os.getenv('DB_USERNAME')
-    password = os.getenv('DB_PASSWORD')
-    port = os.getenv('DB_PORT')
-    driver = os.getenv('DB_DRIVER')
-
     try:
         # --- Fetch filter params from request ---
         operator = request.args.get("operator", default=None)
@@ -493,58 +749,21 @@ def fetch_operator_structure():
         mukim = request.args.get("mukim", default=None)
         dun = request.args.get("dun", default=None)
 
-        conn_str = (
-            f"DRIVER={driver};"
-            f"SERVER={server},{port};"
-            f"DATABASE={database};"
-            f"UID={username};"
-            f"PWD={password}"
-        )
-        connection = pyodbc.connect(conn_str)
-        cursor = connection.cursor()
-
-        # --- Build dynamic WHERE clause for filters ---
-        filters = ["STATUS != 'DISCONTINUE'"]
-        if operator: filters.append(f"OPERATOR = '{operator}'")
-        if state: filters.append(f"STATE = '{state}'")
-        if district: filters.append(f"DISTRICT = '{district}'")
-        if mukim: filters.append(f"MUKIM = '{mukim}'")
-        if dun: filters.append(f"DUN = '{dun}'")
-        where_clause = " AND ".join(filters)
-
-        # --- Query with calculated percentage ---
-        query = f"""
-        WITH cte AS (
-            SELECT 
-                OWNER,
-                COUNT(DISTINCT STRUCTURE_ID) AS [Total RCI]
-            FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES
-            WHERE {where_clause}
-            GROUP BY OWNER
-        ),
-        total_sum AS (
-            SELECT SUM([Total RCI]) AS grand_total FROM cte
+        df = get_owner_structure_data(
+            operator=operator,
+            state=state,
+            district=district,
+            mukim=mukim,
+            dun=dun
         )
-        SELECT 
-            cte.OWNER,
-            cte.[Total RCI],
-            FORMAT(ROUND((cte.[Total RCI] * 100.0 / NULLIF(total_sum.grand_total,0)), 2), 'N2') + '%' AS [Total RCI (%)]
-        FROM cte
-        CROSS JOIN total_sum
-        ORDER BY cte.[Total RCI] DESC;
-        """
-
-        cursor.execute(query)
-        columns = [desc[0] for desc in cursor.description]
-        data = cursor.fetchall()
-        df = pd.DataFrame.from_records(data, columns=columns)
-
-        cursor.close()
-        connection.close()
-        return jsonify({"data": df.to_dict(orient="records")})
+
+        if "error" in df.columns:
+            return jsonify({"error": df["error"].iloc[0]}), 500
+
+        return jsonify({"data": df})
 
     except Exception as e:
-        print(f"❌ Error in fetch_operator_structure: {e}")
+        logger.error("Error in fetch_operator_structure: %s", e)
         return jsonify({"error": str(e)}), 500
 
 # ------------------------------------------------------------------
@@ -559,7 +778,7 @@ def fetch_structure_category():
     Supports filtering via query parameters.
     """
     try:
-        print("\n🔍 Debug: Fetching structure count by STRUCTURE_CATEGORY...")
+        logger.debug("Fetching structure count by STRUCTURE_CATEGORY...")
 
         # Get filters from query string
         operator = request.args.get("operator")
@@ -578,14 +797,14 @@ def fetch_structure_category():
 
         if "error" in df.columns:
             error_message = df["error"].iloc[0]
-            print(f"❌ Error returned from query: {error_message}")
+            logger.error("Error returned from query: %s", error_message)
             return jsonify({"error": error_message}), 500
 
-        print("✅ Structure by STRUCTURE_CATEGORY fetch successful.")
-        return jsonify({"data": df.to_dict(orient="records")})
+        logger.debug("Structure by STRUCTURE_CATEGORY fetch successful.")
+        return jsonify({"data": df})
 
     except Exception as e:
-        print(f"❌ Exception in fetch_structure_category: {str(e)}")
+        logger.exception("Exception in fetch_structure_category")
         return jsonify({"error": str(e)}), 500
 # ------------------------------------------------------------------
 #  New API Endpoint for Total Owner by Projects Data (RCI Module - Azure)
@@ -618,7 +837,7 @@ def fetch_structure_project():
             error_message = df["error"].iloc[0]
             return jsonify({"error": error_message}), 500
 
-        return jsonify({"data": df.to_dict(orient="records")})
+        return jsonify({"data": df})
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -635,7 +854,7 @@ def fetch_structure_state():
     Supports filtering via query parameters.
     """
     try:
-        print("\n🔍 Debug: Fetching structure count by STATE...")
+        logger.debug("Fetching structure count by STATE...")
 
         # Get filters from query string
         operator = request.args.get("operator")
@@ -655,14 +874,14 @@ def fetch_structure_state():
 
         if "error" in df.columns:
             error_message = df["error"].iloc[0]
-            print(f"❌ Error returned from query: {error_message}")
+            logger.error("Error returned from query: %s", error_message)
             return jsonify({"error": error_message}), 500
 
-        print("✅ Structure by STATE fetch successful.")
-        return jsonify({"data": df.to_dict(orient="records")})
+        logger.debug("Structure by STATE fetch successful.")
+        return jsonify({"data": df})
 
     except Exception as e:
-        print(f"❌ Exception in fetch_structure_state: {str(e)}")
+        logger.exception("Exception in fetch_structure_state")
         return jsonify({"error": str(e)}), 500
 
 # ------------------------------------------------------------------
@@ -683,7 +902,7 @@ def fetch_structure_summary():
         mukim = request.args.get("mukim")
         dun = request.args.get("dun")
 
-        print("\n🔍 Debug: Fetching structure summary KPIs...")
+        logger.debug("Fetching structure summary KPIs...")
 
         df = get_structure_summary_data(
             operator=operator,
@@ -697,14 +916,59 @@ def fetch_structure_summary():
             error_message = df["error"].iloc[0]
             return jsonify({"error": error_message}), 500
 
-        print("✅ Structure summary fetch successful.")
-        return jsonify({"data": df.to_dict(orient="records")[0]})  # return single row as object
+        logger.debug("Structure summary fetch successful.")
+        return jsonify({"data": dataframe_records(df)[0]})  # return single row as object
 
     except Exception as e:
-        print(f"❌ Exception in fetch_structure_summary: {str(e)}")
+        logger.exception("Exception in fetch_structure_summary")
         return jsonify({"error": str(e)}), 500
     
 
+# ------------------------------------------------------------------
+#  RCI Dashboard in one round trip (RCI Module - Azure)
+# ------------------------------------------------------------------
+
+@app.route("/api/rci/dashboard", methods=["GET"])
+def fetch_rci_dashboard():
+    """
+    Fetch the data behind /api/structure_summary, /api/structure_state,
+    /api/structure_category, /api/structure_project and /api/operator_structure
+    in one round trip: from the aggregate cube or snapshot when available,
+    otherwise from one statement that scans TOWER_STRUCTURES twice (grouped
+    row counts, and distinct structures per owner, joined by UNION ALL).
+    Endpoint: GET /api/rci/dashboard?operator=&state=&district=&mukim=&dun=
+    """
+    try:
+        operator = request.args.get("operator")
+        state = request.args.get("state")
+        district = request.args.get("district")
+        mukim = request.args.get("mukim")
+        dun = request.args.get("dun")
+
+        result = get_rci_dashboard_data(
+            operator=operator,
+            state=state,
+            district=district,
+            mukim=mukim,
+            dun=dun
+        )
+
+        if "error" in result:
+            return jsonify({"error": result["error"]}), 500
+
+        return jsonify({
+            "summary": dataframe_records(result["summary"])[0],
+            "state": result["state"],
+            "category": result["category"],
+            "project": result["project"],
+            "owner": result["owner"]
+        })
+
+    except Exception as e:
+        logger.exception("Exception in fetch_rci_dashboard")
+        return jsonify({"error": str(e)}), 500
+
+
 # -------------------------------------------------------------------
 #  NEW ROUTE: Fetch TOWER_STRUCTURES Data for Map (RCI Module - Azure)
 # -------------------------------------------------------------------
@@ -713,33 +977,45 @@ def fetch_tower_structures_map():
     """
     Fetch data from TOWER_STRUCTURES (in Azure Synapse) for map display with pagination.
     Endpoint: GET /api/tower_structures_map?limit=10&offset=0
+    Arrow IPC: GET /api/tower_structures_map?format=arrow&limit=10&offset=0
+    Streaming: GET /api/tower_structures_map?stream=ndjson (one JSON row per line)
+    or ?stream=arrow (Arrow record batches)
+    Viewport: GET /api/tower_structures_map?bbox=min_lon,min_lat,max_lon,max_lat&limit=1000
+    (answered from the in-memory spatial index; not streamed)
     """
     try:
-        print("\n🔍 Debug: Received request to fetch TOWER_STRUCTURES map data.")
+        logger.debug("Received request to fetch TOWER_STRUCTURES map data.")
+
+        bbox = parse_bbox(request.args.get("bbox"))
+        if bbox is None and wants_stream():
+            return stream_map_rows()
 
         # Get pagination parameters
         limit = request.args.get("limit", default=1000, type=int)  # Higher default for map
         offset = request.args.get("offset", default=0, type=int)
 
-        print(f"📌 Fetching TOWER_STRUCTURES map data with limit={limit}, offset={offset}")
+        logger.debug("Fetching TOWER_STRUCTURES map data with limit=%s, offset=%s", limit, offset)
+
+        if bbox is not None:
+            df = spatial_index.layer_rows("tower_structures", bbox, offset=offset, limit=limit)
+            return data_response(df, limit=limit, offset=offset, bbox=list(bbox))
 
         # Retrieve data from Synapse using the map function
         df = get_tower_structures_data_map(offset=offset, limit=limit)
 
         if "error" in df.columns:
             error_message = df["error"].iloc[0]
-            print(f"❌ Error returned from query: {error_message}")
+            logger.error("Error returned from query: %s", error_message)
             return jsonify({"error": error_message}), 500
 
-        print("✅ TOWER_STRUCTURES map data fetch successful!")
-        return jsonify({
-            "data": df.to_dict(orient="records"),
-            "limit": limit,
-            "offset": offset
-        })
+        logger.debug("TOWER_STRUCTURES map data fetch successful!")
+        return data_response(df, limit=limit, offset=offset)
+
+    except (InvalidCursor, InvalidBBox) as e:
+        return jsonify({"error": str(e)}), 400
 
     except Exception as e:
-        print(f"❌ Exception in fetch_tower_structures_map: {str(e)}")
+        logger.exception("Exception in fetch_tower_structures_map")
         return jsonify({"error": str(e)}), 500
     
 
@@ -753,27 +1029,186 @@ def get_tower_structures_filter_options():
     Endpoint: GET /api/tower_structures/filter_options
     """
     try:
-        print("\n🔍 Debug: Received request to fetch filter options for TOWER_STRUCTURES.")
+        logger.debug("Received request to fetch filter options for TOWER_STRUCTURES.")
         
-        # Import the function that will query the database
+        # Import the function that answers from the cached filter hierarchy
         from RCI_AzureSynapse_connector import get_tower_structures_filter_options
         
-        # Retrieve filter options from Synapse
         filter_options = get_tower_structures_filter_options()
         
         if isinstance(filter_options, dict) and "error" in filter_options:
             error_message = filter_options["error"]
-            print(f"❌ Error returned from query: {error_message}")
+            logger.error("Error returned from query: %s", error_message)
             return jsonify({"error": error_message}), 500
         
-        print("✅ Filter options fetch successful!")
+        logger.debug("Filter options fetch successful!")
         return jsonify(filter_options)
         
     except Exception as e:
-        print(f"❌ Exception in get_tower_structures_filter_options: {str(e)}")
+        logger.exception("Exception in get_tower_structures_filter_options")
         return jsonify({"error": str(e)}), 500
 
 
+# ----------------------------------------
+#  NEW ROUTE: Clustered Tower Structures points for the map
+# ----------------------------------------
+@app.route("/api/tower_structures/clusters", methods=["GET"])
+def get_tower_structure_clusters():
+    """
+    Grid clusters of TOWER_STRUCTURES points, with counts and operator breakdowns.
+    Endpoint: GET /api/tower_structures/clusters?bbox=min_lon,min_lat,max_lon,max_lat&zoom=6
+
+    Computed from the in-memory spatial index; bbox defaults to all of Malaysia.
+    Cells that hold a single point come back as that point with its STRUCTURE_ID.
+    """
+    try:
+        bbox = parse_bbox(request.args.get("bbox"))
+        zoom = request.args.get("zoom", type=int)
+        if zoom is None or not 0 <= zoom <= spatial_index.MAX_ZOOM:
+            return jsonify({"error": f"zoom must be an integer from 0 to {spatial_index.MAX_ZOOM}"}), 400
+
+        index = spatial_index.get_point_index("tower_structures")
+        clusters = index.clusters(bbox, zoom)
+        return jsonify({
+            "clusters": clusters,
+            "count": len(clusters),
+            "points": sum(cluster["count"] for cluster in clusters),
+            "zoom": zoom
+        })
+
+    except InvalidBBox as e:
+        return jsonify({"error": str(e)}), 400
+
+    except Exception as e:
+        logger.exception("Exception in get_tower_structure_clusters")
+        return jsonify({"error": str(e)}), 500
+
+
+# ----------------------------------------
+#  NEW ROUTE: Nearest / within-radius search across the point layers
+# ----------------------------------------
+@app.route("/api/nearby", methods=["GET"])
+def get_nearby_points():
+    """
+    Infrastructure points near a location, nearest first, with LAYER and DISTANCE_KM (haversine).
+    Endpoint: GET /api/nearby?lat=3.14&lon=101.69&radius_km=5&layers=tower_structures,pedi
+    k-nearest: GET /api/nearby?lat=3.14&lon=101.69&k=10 (radius_km then caps the distance)
+
+    layers defaults to every point layer; radius_km defaults to 5 without k.
+    Answered from the in-memory spatial indexes; &format=arrow for Arrow IPC.
+    """
+    lat = request.args.get("lat", type=float)
+    lon = request.args.get("lon", type=float)
+    radius_km = request.args.get("radius_km", type=float)
+    k = request.args.get("k", type=int)
+    layers = [layer.strip() for layer in request.args.get("layers", "").split(",") if layer.strip()]
+
+    if lat is None or lon is None or not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        return jsonify({"error": "lat and lon must be valid coordinates"}), 400
+    if not spatial_index.near_extent(lon, lat):
+        return jsonify({"error": f"lat and lon must be within {spatial_index.NEARBY_MARGIN_DEGREES:g} "
+                                 f"degrees of Malaysia"}), 400
+    unknown = [layer for layer in layers if layer not in spatial_index.POINT_LAYERS]
+    if unknown:
+        return jsonify({"error": f"Unknown layers: {', '.join(unknown)}"}), 400
+    if k is not None and not 1 <= k <= spatial_index.MAX_NEARBY_K:
+        return jsonify({"error": f"k must be an integer from 1 to {spatial_index.MAX_NEARBY_K}"}), 400
+    if radius_km is None and k is None:
+        radius_km = 5.0
+    if radius_km is not None and not 0 < radius_km <= spatial_index.MAX_NEARBY_KM:
+        return jsonify({"error": f"radius_km must be above 0 and at most {spatial_index.MAX_NEARBY_KM:g}"}), 400
+
+    try:
+        df = spatial_index.nearby(lon, lat, layers or None, radius_km=radius_km, k=k)
+        return data_response(
+            df,
+            count=int(len(df)),
+            counts={layer: int(n) for layer, n in df["LAYER"].value_counts().items()},
+            lat=lat,
+            lon=lon,
+            radius_km=radius_km,
+            k=k
+        )
+
+    except Exception as e:
+        logger.exception("Exception in get_nearby_points")
+        return jsonify({"error": str(e)}), 500
+
+
+# ----------------------------------------
+#  NEW ROUTE: Coverage gaps for NADI (PEDI) and PUDO sites
+# ----------------------------------------
+@app.route("/api/coverage_gaps", methods=["GET"])
+def get_coverage_gaps_page():
+    """
+    Distance from each NADI / PUDO site to its nearest tower structure and fibre site.
+    Endpoint: GET /api/coverage_gaps?sites=pedi&sort=tower&min_km=5&limit=100&offset=0
+
+    sites is pedi (default) or pudo; rows are ordered by the sort distance
+    (tower or fiber), farthest first. Computed for every site from the spatial
+    indexes and cached until they are rebuilt; &format=arrow for Arrow IPC.
+    """
+    site_layer = request.args.get("sites", "pedi")
+    sort = request.args.get("sort", "tower")
+    min_km = request.args.get("min_km", type=float)
+    limit = request.args.get("limit", default=100, type=int)
+    offset = request.args.get("offset", default=0, type=int)
+
+    if site_layer not in SITE_LAYERS:
+        return jsonify({"error": f"sites must be one of: {', '.join(SITE_LAYERS)}"}), 400
+    if sort not in SORT_COLUMNS:
+        return jsonify({"error": f"sort must be one of: {', '.join(SORT_COLUMNS)}"}), 400
+    if limit <= 0 or offset < 0:
+        return jsonify({"error": "limit must be positive and offset non-negative"}), 400
+
+    try:
+        page, total, computed_at = coverage_page(site_layer, sort=sort, min_km=min_km, offset=offset, limit=limit)
+        return data_response(
+            page,
+            count=int(len(page)),
+            total=total,
+            sites=site_layer,
+            sort=sort,
+            limit=limit,
+            offset=offset,
+            computed_at=computed_at
+        )
+
+    except Exception as e:
+        logger.exception("Exception in get_coverage_gaps_page")
+        return jsonify({"error": str(e)}), 500
+
+
+# ----------------------------------------
+#  NEW ROUTE: Mapbox Vector Tiles for the cims_geo point layers
+# ----------------------------------------
+@app.route("/tiles/<layer>/<int:z>/<int:x>/<int:y>.mvt", methods=["GET"])
+def get_vector_tile(layer, z, x, y):
+    """
+    One Mapbox Vector Tile of a point layer, served from its in-memory spatial index.
+    Endpoint: GET /tiles/{tower_structures|mb_network|fiber_optic_site|pudo|pedi}/{z}/{x}/{y}.mvt
+
+    Tiles carry each point's id, category and a few attributes; dense tiles are
+    thinned to counted cells. Responses have an ETag and honour If-None-Match.
+    """
+    if layer not in spatial_index.POINT_LAYERS:
+        return jsonify({"error": f"Unknown layer '{layer}'"}), 404
+    if z > spatial_index.MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+        return jsonify({"error": "Tile coordinates out of range"}), 400
+
+    try:
+        tile, etag = render_tile(layer, z, x, y)
+    except Exception as e:
+        logger.exception("Exception in get_vector_tile")
+        return jsonify({"error": str(e)}), 500
+
+    response = Response(tile, mimetype=MVT_MIMETYPE)
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    return response.make_conditional(request)
+
+
 # ----------------------------------------
 #  NEW ROUTE: Get Filtered Tower Structures Data
 # ----------------------------------------
@@ -782,9 +1217,12 @@ def get_filtered_tower_structures():
     """
     Fetch filtered tower structures data based on selected filters.
     **ENHANCED with better empty filter handling**
+    Streaming: add &stream=ndjson for one JSON row per line, or &stream=arrow.
+    Viewport: add &bbox=min_lon,min_lat,max_lon,max_lat to answer from the
+    in-memory spatial index (not streamed).
     """
     try:
-        print("\n🔍 Debug: Received request to fetch filtered TOWER_STRUCTURES data.")
+        logger.debug("Received request to fetch filtered TOWER_STRUCTURES data.")
         
         # Get filter parameters
         operator = request.args.get("operator")
@@ -793,16 +1231,14 @@ def get_filtered_tower_structures():
         mukim = request.args.get("mukim")
         dun = request.args.get("dun")
         
+        bbox = parse_bbox(request.args.get("bbox"))
+
         # Get pagination parameters
         limit = request.args.get("limit", default=1000, type=int)
         offset = request.args.get("offset", default=0, type=int)
         
-        print(f"📌 Raw parameters received:")
-        print(f"   operator: '{operator}' (type: {type(operator)})")
-        print(f"   state: '{state}' (type: {type(state)})")
-        print(f"   district: '{district}' (type: {type(district)})")
-        print(f"   mukim: '{mukim}' (type: {type(mukim)})")
-        print(f"   dun: '{dun}' (type: {type(dun)})")
+        logger.debug("Raw parameters received: operator=%r, state=%r, district=%r, mukim=%r, dun=%r",
+                     operator, state, district, mukim, dun)
         
         # **CRITICAL FIX: Don't pass empty string parameters**
         # Only pass parameters that have meaningful values
@@ -830,32 +1266,42 @@ def get_filtered_tower_structures():
         if is_meaningful_param(dun):
             filter_params['dun'] = dun.strip()
         
-        print(f"📋 Cleaned parameters: {filter_params}")
-        print(f"🏷️ Has meaningful filters: {len(filter_params) > 0}")
+        logger.debug("Cleaned parameters: %s", filter_params)
+
+        if bbox is None and wants_stream():
+            return stream_map_rows(**filter_params)
         
-        # Call the connector function with cleaned parameters
-        df = get_tower_structures_filtered(
-            operator=filter_params.get('operator'),
-            state=filter_params.get('state'),
-            district=filter_params.get('district'),
-            mukim=filter_params.get('mukim'),
-            dun=filter_params.get('dun'),
-            offset=offset,
-            limit=limit
-        )
+        if bbox is not None:
+            df = spatial_index.layer_rows(
+                "tower_structures",
+                bbox,
+                {tower_snapshot.FILTER_COLUMNS[name]: value for name, value in filter_params.items()},
+                offset=offset,
+                limit=limit
+            )
+        else:
+            # Call the connector function with cleaned parameters
+            df = get_tower_structures_filtered(
+                operator=filter_params.get('operator'),
+                state=filter_params.get('state'),
+                district=filter_params.get('district'),
+                mukim=filter_params.get('mukim'),
+                dun=filter_params.get('dun'),
+                offset=offset,
+                limit=limit
+            )
         
         # Check for errors in the DataFrame
         if "error" in df.columns:
             error_message = df["error"].iloc[0]
-            print(f"❌ Error returned from query: {error_message}")
+            logger.error("Error returned from query: %s", error_message)
             return jsonify({"error": error_message}), 500
         
         result_count = len(df)
-        print(f"✅ Data fetch successful! Returned {result_count} records")
+        logger.debug("Data fetch successful! Returned %s records", result_count)
         
         # Prepare response with detailed information
         response_data = {
-            "data": df.to_dict(orient="records"),
             "count": result_count,
             "has_filters": len(filter_params) > 0,
             "filters_applied": filter_params,
@@ -870,11 +1316,16 @@ def get_filtered_tower_structures():
             "offset": offset,
             "status": "success"
         }
+        if bbox is not None:
+            response_data["bbox"] = list(bbox)
         
-        return jsonify(response_data)
+        return data_response(df, **response_data)
         
+    except (InvalidCursor, InvalidBBox) as e:
+        return jsonify({"error": str(e), "status": "error", "count": 0, "data": []}), 400
+
     except Exception as e:
-        print(f"❌ Exception in get_filtered_tower_structures: {str(e)}")
+        logger.exception("Exception in get_filtered_tower_structures")
         return jsonify({
             "error": str(e),
             "status": "error",
@@ -889,30 +1340,30 @@ def get_filtered_tower_structures():
 def get_dependent_filter_options():
     """
     Get dependent filter options based on parent selections.
-    Endpoint: GET /api/tower_structures/dependent_filters?state=
+    Endpoint: GET /api/tower_structures/dependent_filters?state=&district=
     """
     try:
-        print("\n🔍 Debug: Received request to fetch dependent filter options.")
+        logger.debug("Received request to fetch dependent filter options.")
         
         # Get parent filter values
         state = request.args.get("state")
+        district = request.args.get("district")
         
-        # Import the function that will query the database
+        # Import the function that answers from the cached filter hierarchy
         from RCI_AzureSynapse_connector import get_dependent_filter_options
         
-        # Retrieve dependent filter options from Synapse
-        filter_options = get_dependent_filter_options(state=state)
+        filter_options = get_dependent_filter_options(state=state, district=district)
         
         if isinstance(filter_options, dict) and "error" in filter_options:
             error_message = filter_options["error"]
-            print(f"❌ Error returned from query: {error_message}")
+            logger.error("Error returned from query: %s", error_message)
             return jsonify({"error": error_message}), 500
         
-        print("✅ Dependent filter options fetch successful!")
+        logger.debug("Dependent filter options fetch successful!")
         return jsonify(filter_options)
         
     except Exception as e:
-        print(f"❌ Exception in get_dependent_filter_options: {str(e)}")
+        logger.exception("Exception in get_dependent_filter_options")
         return jsonify({"error": str(e)}), 500
     
 # ============================================================================
@@ -1004,7 +1455,7 @@ def test_all_endpoints():
         
         for endpoint in endpoints_to_test:
             try:
-                print(f"🧪 Testing {endpoint['name']}...")
+                logger.debug("Testing %s...", endpoint['name'])
                 
                 # Import the function dynamically
                 from RCI_AzureSynapse_connector import (
@@ -1077,14 +1528,108 @@ def test_all_data():
             "message": "Test successful",
             "total_structures": summary_data.get('TOTAL_STRUCTURES', 0) if hasattr(summary_data, 'get') else 0,
             "sample_count": len(sample_data),
-            "sample_data": sample_data.to_dict(orient="records") if not sample_data.empty else []
+            "sample_data": sample_data
         })
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# ----------------------------------------
+#  Admin: Result Cache (RCI aggregates)
+# ----------------------------------------
+def is_admin_request():
+    """Admin routes require X-Admin-Token to match ADMIN_API_TOKEN; without one configured they are closed."""
+    token = os.getenv("ADMIN_API_TOKEN")
+    return bool(token) and hmac.compare_digest(request.headers.get("X-Admin-Token", ""), token)
+
+@app.route("/api/admin/cache", methods=["GET"])
+def get_cache_stats():
+    """
+    Report result cache size and hit/miss counters, plus the age of the
+    filter hierarchy, aggregate cube, TOWER_STRUCTURES snapshot and spatial
+    indexes, the tile and coverage-gap cache counters, and the log queue.
+    Endpoint: GET /api/admin/cache
+    """
+    if not is_admin_request():
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify({
+        **result_cache.stats(),
+        "filter_hierarchy": hierarchy_status(),
+        "aggregate_cube": aggregate_cube.cube_status(),
+        "tower_snapshot": tower_snapshot.snapshot_status(),
+        "spatial_index": spatial_index.index_status(),
+        "tiles": tile_cache.stats(),
+        "coverage_gaps": coverage_cache.stats(),
+        "logging": logging_status()
+    })
+
+# Held while rebuild_point_data runs, so repeated invalidations start one rebuild
+_rebuild_lock = threading.Lock()
+
+def rebuild_point_data():
+    """
+    Re-export the snapshot (when enabled), then rebuild the aggregate cube
+    and the loaded spatial indexes. Results cached while this ran were
+    computed from the old data, so the caches are cleared again at the end,
+    whether or not the rebuild succeeded. Releases _rebuild_lock, which the
+    caller acquired.
+    """
+    try:
+        try:
+            if tower_snapshot.SNAPSHOT_ENABLED:
+                tower_snapshot.refresh_snapshot(force=True)
+        except Exception as e:
+            logger.error("Error refreshing TOWER_STRUCTURES snapshot: %s", e)
+        try:
+            if aggregate_cube.CUBE_ENABLED:
+                aggregate_cube.refresh_aggregate_cube()
+        except Exception as e:
+            logger.error("Error rebuilding aggregate cube: %s", e)
+        spatial_index.refresh_loaded_indexes()
+    finally:
+        try:
+            removed = result_cache.invalidate()
+            tile_cache.invalidate()
+            coverage_cache.invalidate()
+            logger.info("Point data rebuilt; result cache invalidated again (%s entries removed)", removed)
+        finally:
+            _rebuild_lock.release()
+
+@app.route("/api/admin/cache/invalidate", methods=["POST"])
+def invalidate_cache():
+    """
+    Drop every cached aggregate, tile and coverage-gap result, reload the
+    filter hierarchy and rebuild the TOWER_STRUCTURES snapshot, aggregate
+    cube and spatial indexes in the background; call this after each EDW load.
+    Endpoint: POST /api/admin/cache/invalidate
+    """
+    if not is_admin_request():
+        return jsonify({"error": "Unauthorized"}), 401
+    removed = result_cache.invalidate()
+    logger.info("Result cache invalidated (%s entries removed)", removed)
+
+    try:
+        refresh_filter_hierarchy()
+        hierarchy = hierarchy_status()
+    except Exception as e:
+        hierarchy = {"error": str(e)}
+
+    tile_cache.invalidate()
+    coverage_cache.invalidate()
+
+    # Re-exporting the snapshot and indexes scans whole tables, so do it off the request thread,
+    # and not again while a rebuild is still running (its caches are cleared when it ends).
+    rebuild_started = _rebuild_lock.acquire(blocking=False)
+    if rebuild_started:
+        threading.Thread(target=rebuild_point_data, daemon=True).start()
+
+    return jsonify({"message": "Cache invalidated", "removed": removed, "filter_hierarchy": hierarchy,
+                    "rebuild": "started" if rebuild_started else "already running"})
+
 # ----------------------------------------
 #  Run the Flask server
 # ----------------------------------------
+# Development only; production runs under gunicorn (see gunicorn.conf.py).
 if __name__ == "__main__":
-    app.run(host='0.0.0.0', debug=True, port=5000)
\ No newline at end of file
+    debug = os.getenv("FLASK_DEBUG", "true").lower() in ("1", "true", "yes")
+    app.run(host='0.0.0.0', debug=debug, port=int(os.getenv("PORT", "5000")))
\ No newline at end of file
@@ -0,0 +1,142 @@
+import atexit
+import contextvars
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import uuid
+
+# ------------------------------------------------------------------------------
+#  Logging: levelled, formatted off the request thread, tagged per request
+# ------------------------------------------------------------------------------
+# Modules log through ``logging.getLogger(__name__)`` with %-style arguments,
+# so a message below LOG_LEVEL costs one level check and is never formatted.
+# Records that pass go onto a bounded in-memory queue; a listener thread does
+# the formatting and the write to stdout, so a slow container log pipe never
+# blocks a request. When the queue is full new records are dropped and counted.
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Repeated DEBUG messages: the first of each is logged, then one in every N
+DEBUG_SAMPLE_EVERY = max(1, int(os.getenv("LOG_DEBUG_SAMPLE_EVERY", "100")))
+
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"
+REQUEST_ID_HEADER = "X-Request-ID"
+
+request_id = contextvars.ContextVar("request_id", default="-")
+
+
+def new_request_id(incoming=None):
+    """
+    Use the caller's X-Request-ID when it is a sane token, else make one.
+    Returns the id and sets it for log records on this context.
+    """
+    if incoming and len(incoming) <= 64 and incoming.replace("-", "").isalnum():
+        value = incoming
+    else:
+        value = uuid.uuid4().hex[:16]
+    request_id.set(value)
+    return value
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp each record with the current request's correlation id."""
+
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """
+    Let through the first occurrence of each DEBUG message template, then
+    one in every ``every``. Records at INFO and above always pass.
+    """
+
+    def __init__(self, every):
+        super().__init__()
+        self.every = every
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.every <= 1:
+            return True
+        key = (record.name, record.msg)
+        with self._lock:
+            count = self._seen.get(key, 0)
+            self._seen[key] = count + 1
+        return count % self.every == 0
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never waits: the record is queued as-is (formatting
+    happens in the listener thread) and dropped when the queue is full.
+    Logged arguments must therefore not be mutated after the call.
+    """
+
+    dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+_listener = None
+_listener_pid = None
+_lock = threading.Lock()
+
+
+def configure_logging():
+    """
+    Route the root logger through the queue for this process. Safe to call
+    more than once; after a fork the child starts its own listener thread.
+    """
+    global _listener, _listener_pid
+    with _lock:
+        if _listener_pid == os.getpid():
+            return
+        log_queue = queue.Queue(maxsize=QUEUE_SIZE)
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(logging.Formatter(LOG_FORMAT))
+        handler = NonBlockingQueueHandler(log_queue)
+        handler.addFilter(RequestIdFilter())
+        handler.addFilter(DebugSampler(DEBUG_SAMPLE_EVERY))
+
+        root = logging.getLogger()
+        for existing in [h for h in root.handlers if isinstance(h, NonBlockingQueueHandler)]:
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+
+        # A listener inherited across fork() has no thread in this process.
+        _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=False)
+        _listener.start()
+        _listener_pid = os.getpid()
+
+
+@atexit.register
+def _flush_at_exit():
+    """Write out whatever is still queued when the process exits."""
+    if _listener is not None and _listener_pid == os.getpid():
+        try:
+            _listener.stop()
+        except queue.Full:
+            pass
+
+
+def logging_status():
+    return {
+        "level": LOG_LEVEL,
+        "debug_sample_every": DEBUG_SAMPLE_EVERY,
+        "queue_size": QUEUE_SIZE,
+        "dropped": NonBlockingQueueHandler.dropped,
+    }
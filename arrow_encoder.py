@@ -0,0 +1,127 @@
+import datetime
+import decimal
+import io
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+
+from json_encoder import encode
+
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+# pyodbc reports each column's Python type in cursor.description[i][1]
+_PYODBC_TYPES = {
+    str: pa.string(),
+    int: pa.int64(),
+    float: pa.float64(),
+    bool: pa.bool_(),
+    datetime.datetime: pa.timestamp("us"),
+    datetime.date: pa.date32(),
+    datetime.time: pa.time64("us"),
+    bytes: pa.binary(),
+    bytearray: pa.binary(),
+    uuid.UUID: pa.string(),
+}
+
+
+def arrow_safe(df):
+    """Copy of ``df`` with mixed-type object columns stringified so Arrow can store them."""
+    mixed = {}
+    for column in df.columns:
+        if df[column].dtype == object:
+            kind = pd.api.types.infer_dtype(df[column], skipna=True)
+            if kind.startswith("mixed"):
+                mixed[column] = df[column].map(str, na_action="ignore")
+    return df.assign(**mixed) if mixed else df
+
+
+def _metadata(metadata):
+    """Schema metadata: every value JSON-encoded under its key."""
+    return {str(key): encode(value) for key, value in (metadata or {}).items()}
+
+
+def dataframe_to_ipc(df, metadata=None):
+    """
+    ``df`` as an Arrow IPC stream. ``metadata`` values (paging fields and
+    the like) are JSON-encoded into the schema metadata.
+    """
+    table = pa.Table.from_pandas(arrow_safe(df), preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **_metadata(metadata)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def schema_from_description(description, rows, metadata=None):
+    """
+    Arrow schema for a pyodbc result set.
+
+    Column types come from ``cursor.description``; DECIMAL columns keep
+    their precision and scale. Columns whose driver type is unknown are
+    inferred from ``rows`` (the first batch), and all-NULL ones become
+    strings.
+    """
+    fields = []
+    values = list(zip(*rows)) if rows else [()] * len(description)
+    for (name, type_code, _, _, precision, scale, _), column in zip(description, values):
+        if type_code is decimal.Decimal and precision:
+            arrow_type = pa.decimal128(min(int(precision), 38), int(scale or 0))
+        elif type_code in _PYODBC_TYPES:
+            arrow_type = _PYODBC_TYPES[type_code]
+        else:
+            arrow_type = pa.array(column, from_pandas=True).type
+            if pa.types.is_null(arrow_type):
+                arrow_type = pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields, metadata=_metadata(metadata))
+
+
+def rows_to_batch(schema, rows):
+    """One RecordBatch from a list of cursor rows, converted column by column."""
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    arrays = [pa.array(column, type=field.type, from_pandas=True) for field, column in zip(schema, columns)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class ChunkSink(io.RawIOBase):
+    """Write target that hands back whatever the IPC writer produced since the last take()."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def ipc_stream(batches, metadata=None):
+    """
+    Yield an Arrow IPC stream, chunk by chunk, for ``(description, rows)``
+    batches straight from ``cursor.fetchmany()``. The schema is fixed by
+    the first batch; only one batch is held in memory at a time.
+    """
+    sink = ChunkSink()
+    writer = None
+    schema = None
+    for description, rows in batches:
+        if writer is None:
+            schema = schema_from_description(description, rows, metadata)
+            writer = pa.ipc.new_stream(sink, schema)
+        if rows:
+            writer.write_batch(rows_to_batch(schema, rows))
+            yield sink.take()
+    if writer is None:
+        return
+    writer.close()
+    yield sink.take()
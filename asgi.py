@@ -0,0 +1,257 @@
+"""
+ASGI entry point: the routes and connectors of app.py, served from an event
+loop so a slow Synapse query no longer ties up a server thread per client.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+
+Each worker needs one Synapse connection per executor thread, i.e. the sum
+of the ASGI_*_CONCURRENCY limits (30 by default). The lifespan hook raises
+the pool (DB_POOL_SIZE) to that, under either launch command. When
+DB_POOL_MAX_TOTAL caps the deployment instead, it is left alone and a
+warning is logged if it leaves a worker fewer connections than threads.
+
+Every request is put in a route class by path (ROUTE_CLASSES) and needs a
+slot from that class's limit before it runs. The Flask view, and with it
+the pyodbc calls, then runs on a dedicated thread pool sized to the sum of
+the limits. Aggregates and exports queue only behind each other, while
+login and filter options keep their own slots. A request that waits longer
+than ASGI_QUEUE_TIMEOUT_SECONDS for a slot gets a 503.
+
+Queries run inside a ``synapse_pool.CancelScope``. If the client
+disconnects before the response is complete, its running statements are
+cancelled on the server and no further ones are started.
+"""
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from app import app as flask_app
+from synapse_pool import CancelScope, default_pool_size, get_pool, init_worker_pool, run_in_scope
+
+logger = logging.getLogger(__name__)
+
+# Route class -> path prefixes, checked in order; anything else is "data"
+ROUTE_CLASSES = (
+    ("light", ("/api/login", "/api/register", "/api/tower_structures/filter_options",
+               "/api/tower_structures/dependent_filters", "/api/admin/")),
+    ("export", ("/api/export/",)),
+    ("aggregate", ("/api/operator_structure", "/api/structure_", "/api/rci/", "/api/coverage_gaps",
+                   "/api/debug/", "/api/test/")),
+)
+
+# Requests of each class allowed to run at once per process
+CONCURRENCY = {
+    "light": int(os.getenv("ASGI_LIGHT_CONCURRENCY", "8")),
+    "data": int(os.getenv("ASGI_DATA_CONCURRENCY", "16")),
+    "aggregate": int(os.getenv("ASGI_AGGREGATE_CONCURRENCY", "4")),
+    "export": int(os.getenv("ASGI_EXPORT_CONCURRENCY", "2")),
+}
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("ASGI_QUEUE_TIMEOUT_SECONDS", "10"))
+
+_executor = None
+_limiters = {}
+
+
+def route_class(path):
+    if path == "/":
+        return "light"
+    for name, prefixes in ROUTE_CLASSES:
+        if path.startswith(prefixes):
+            return name
+    return "data"
+
+
+# ------------------------------------------------------------------------------
+#  Calling the Flask app
+# ------------------------------------------------------------------------------
+def wsgi_environ(request, body):
+    scope = request.scope
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": request.method,
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        name = name.decode("latin-1")
+        if name == "content-length":
+            continue
+        key = "CONTENT_TYPE" if name == "content-type" else "HTTP_" + name.upper().replace("-", "_")
+        value = value.decode("latin-1")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def call_flask(environ):
+    """
+    Run the Flask app. Returns ``(status, headers, body)``, where ``body`` is
+    bytes for a complete response, or the WSGI iterable when the view
+    streams (no Content-Length).
+    """
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = headers
+
+    body = flask_app(environ, start_response)
+    if not any(name.lower() == "content-length" for name, _ in started["headers"]):
+        return started["status"], started["headers"], body
+    try:
+        return started["status"], started["headers"], b"".join(body)
+    finally:
+        if hasattr(body, "close"):
+            body.close()
+
+
+def _in_executor(scope, func, *args):
+    return asyncio.get_running_loop().run_in_executor(_executor, run_in_scope, scope, func, *args)
+
+
+async def _client_gone(request):
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+def _with_headers(response, headers):
+    response.raw_headers = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+    return response
+
+
+async def _stream(scope, body, limiter):
+    """
+    Send a streamed Flask response chunk by chunk, pulling each chunk on the
+    executor. When the client disconnects mid-stream the task is cancelled:
+    the scope is cancelled and the body closed once the in-flight chunk returns.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = iter(body)
+    pending = None
+    finished = False
+    try:
+        while True:
+            pending = _in_executor(scope, next, iterator, None)
+            chunk = await pending
+            if chunk is None:
+                finished = True
+                break
+            if chunk:
+                yield chunk
+    finally:
+        if not finished:
+            scope.cancel()
+
+        def close(_=None):
+            future = _executor.submit(getattr(body, "close", lambda: None))
+            future.add_done_callback(lambda f: loop.call_soon_threadsafe(limiter.release))
+
+        if pending is not None and not pending.done():
+            pending.add_done_callback(close)
+        else:
+            close()
+
+
+async def dispatch(request):
+    name = route_class(request.url.path)
+    limiter = _limiters[name]
+    try:
+        await asyncio.wait_for(limiter.acquire(), QUEUE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        return JSONResponse({"error": f"Server busy ({name} requests), try again shortly"},
+                            status_code=503, headers={"Retry-After": "5"})
+
+    scope = CancelScope()
+    streaming = False
+    try:
+        body = await request.body()
+        call = asyncio.ensure_future(_in_executor(scope, call_flask, wsgi_environ(request, body)))
+        watcher = asyncio.ensure_future(_client_gone(request))
+        try:
+            await asyncio.wait({call, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            watcher.cancel()
+        if not call.done():
+            logger.warning("Client disconnected, cancelling %s %s", request.method, request.url.path)
+            scope.cancel()
+            with contextlib.suppress(Exception):
+                status, headers, content = await call
+                if not isinstance(content, bytes) and hasattr(content, "close"):
+                    await _in_executor(scope, content.close)
+            return Response(status_code=499)
+
+        status, headers, content = call.result()
+        if isinstance(content, bytes):
+            return _with_headers(Response(content, status_code=status), headers)
+        streaming = True
+        return _with_headers(StreamingResponse(_stream(scope, content, limiter), status_code=status), headers)
+    finally:
+        if not streaming:
+            limiter.release()
+
+
+def size_pool(threads):
+    """
+    Let this worker's Synapse pool hold a connection for each of ``threads``
+    executor threads, so one route class saturating its limit cannot leave
+    the others waiting on a checkout.
+    """
+    if os.getenv("DB_POOL_MAX_TOTAL"):
+        size = default_pool_size()
+        if size < threads:
+            logger.warning("Synapse pool of %s for %s ASGI threads (DB_POOL_MAX_TOTAL); "
+                           "route classes will wait on each other for connections", size, threads)
+        return
+    size = max(default_pool_size(), threads)
+    os.environ["DB_POOL_SIZE"] = str(size)
+    pool = get_pool()  # may already exist if a background loader ran during import
+    pool.max_size = max(pool.max_size, size)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global _executor, _limiters
+    threads = sum(CONCURRENCY.values())
+    _limiters = {name: asyncio.Semaphore(limit) for name, limit in CONCURRENCY.items()}
+    _executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="asgi-db")
+    size_pool(threads)
+    await asyncio.get_running_loop().run_in_executor(_executor, init_worker_pool)
+    try:
+        yield
+    finally:
+        _executor.shutdown(wait=False)
+
+
+METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"]
+
+app = Starlette(
+    routes=[Route("/{path:path}", dispatch, methods=METHODS)],
+    lifespan=lifespan,
+)
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("asgi:app", host="0.0.0.0", port=int(os.getenv("PORT", "5000")))
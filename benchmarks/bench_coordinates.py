@@ -0,0 +1,90 @@
+"""
+Microbenchmark: coordinate cleaning for /api/data_sources_filtered.
+
+Compares the old row-by-row ``safe_float`` + ``.apply`` cleaning with the
+vectorized ``coordinates.clean_coordinates`` on synthetic coordinates
+shaped like the Synapse output: float columns, clean text, text with '<' /
+'>' qualifiers, and text with unparsable junk.
+
+Usage: python benchmarks/bench_coordinates.py [rows] [repeats]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from coordinates import clean_coordinates  # noqa: E402
+
+
+def safe_float(val):
+    try:
+        return float(str(val).replace('>', '').replace('<', '').strip())
+    except (ValueError, TypeError):
+        return None
+
+
+def clean_rowwise(df):
+    """The pre-vectorization implementation, kept here as the baseline."""
+    df = df.copy()
+    df['LATITUDE'] = df['LATITUDE'].apply(safe_float)
+    df['LONGITUDE'] = df['LONGITUDE'].apply(safe_float)
+    return df.dropna(subset=['LATITUDE', 'LONGITUDE'])
+
+
+def synthetic_frame(rows, qualified=0.0, junk=0.0, numeric=False, seed=0):
+    """
+    Text coordinates inside Malaysia; ``qualified`` / ``junk`` are the
+    fractions prefixed with '>' or replaced by 'N/A'. ``numeric`` returns
+    float columns, as when X / Y are typed FLOAT in Synapse.
+    """
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(1.0, 7.0, rows).round(6)
+    lon = rng.uniform(100.0, 119.0, rows).round(6)
+    if numeric:
+        return pd.DataFrame({"STATE": "Selangor", "LATITUDE": lat, "LONGITUDE": lon})
+    lat = lat.astype(str).astype(object)
+    lon = lon.astype(str).astype(object)
+    marked = rng.random(rows) < qualified
+    lat[marked] = ">" + lat[marked]
+    marked = rng.random(rows) < junk
+    lon[marked] = "N/A"
+    lat[rng.random(rows) < 0.01] = None
+    return pd.DataFrame({"STATE": "Selangor", "LATITUDE": lat, "LONGITUDE": lon})
+
+
+SCENARIOS = [
+    ("float columns", dict(numeric=True)),
+    ("numeric text", dict()),
+    ("5% '>' qualified", dict(qualified=0.05)),
+    ("5% qualified + 1% junk", dict(qualified=0.05, junk=0.01)),
+]
+
+
+def best_of(func, df, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func(df)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    print(f"rows={rows} repeats={repeats} (best run, rows/s)")
+    print(f"  {'scenario':<24}{'row-wise apply':>16}{'vectorized':>16}{'speedup':>10}")
+    for name, options in SCENARIOS:
+        df = synthetic_frame(rows, **options)
+        before = best_of(clean_rowwise, df, repeats)
+        after = best_of(clean_coordinates, df, repeats)
+        print(f"  {name:<24}{rows / before:>16,.0f}{rows / after:>16,.0f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
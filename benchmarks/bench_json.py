@@ -0,0 +1,97 @@
+"""
+Microbenchmark: JSON responses for the /api/* data routes.
+
+Compares the old path (``clean_dataframe`` -> ``to_dict(orient="records")``
+-> Flask's default ``jsonify``) with ``jsonify`` on the orjson provider,
+which takes the DataFrame as-is. Reports the best wall time and the
+tracemalloc peak of each on a synthetic TOWER_STRUCTURES-shaped page.
+
+Usage: python benchmarks/bench_json.py [rows] [repeats]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from flask import Flask, jsonify
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_encoder import OrjsonProvider  # noqa: E402
+
+
+def clean_dataframe(df):
+    """The pre-orjson cleaning step, kept here as the baseline."""
+    if df is None or df.empty:
+        return pd.DataFrame()
+    return df.astype(object).where(pd.notnull(df), None)
+
+
+def synthetic_page(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "STRUCTURE_ID": [f"STR{i:08d}" for i in range(rows)],
+        "SERVICE_PROVIDER": rng.choice(["Maxis", "CelcomDigi", "U Mobile", "Unifi"], rows),
+        "OWNER": rng.choice(["edotco", "TM", "Maxis", "Other"], rows),
+        "STRUCTURE_CATEGORY": rng.choice(["Tower", "Pole", "Rooftop"], rows),
+        "PROJECTS": rng.choice(["JENDELA", "PPAK", None], rows),
+        "STATE": rng.choice(["Selangor", "Johor", "Sabah", "Sarawak"], rows),
+        "DISTRICT": rng.choice(["Petaling", "Johor Bahru", "Kota Kinabalu"], rows),
+        "MUKIM": "Mukim",
+        "DUN": "DUN",
+        "PARLIAMENT": "Parliament",
+        "LONGITUDE": rng.uniform(100.0, 119.0, rows),
+        "LATITUDE": rng.uniform(1.0, 7.0, rows),
+    })
+    df.loc[df.sample(frac=0.02, random_state=seed).index, "LATITUDE"] = np.nan
+    return df
+
+
+def old_path(df):
+    return jsonify({"data": clean_dataframe(df).to_dict(orient="records"), "limit": len(df)}).get_data()
+
+
+def new_path(df):
+    return jsonify({"data": df, "limit": len(df)}).get_data()
+
+
+def measure(app, func, df, repeats):
+    with app.app_context():
+        best = min(_timed(func, df) for _ in range(repeats))
+        tracemalloc.start()
+        body = func(df)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return best, peak, len(body)
+
+
+def _timed(func, df):
+    started = time.perf_counter()
+    func(df)
+    return time.perf_counter() - started
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    df = synthetic_page(rows)
+
+    default_app = Flask("default")
+    orjson_app = Flask("orjson")
+    orjson_app.json = OrjsonProvider(orjson_app)
+
+    print(f"rows={rows} repeats={repeats} (best run; peak traced allocation)")
+    results = [
+        ("default jsonify", measure(default_app, old_path, df, repeats)),
+        ("orjson provider", measure(orjson_app, new_path, df, repeats)),
+    ]
+    for name, (seconds, peak, size) in results:
+        print(f"  {name:<16}{seconds * 1000:9.2f} ms{peak / 2**20:9.1f} MiB peak{size / 2**20:8.2f} MiB body")
+    (old_s, old_peak, _), (new_s, new_peak, _) = (r for _, r in results)
+    print(f"  speedup {old_s / new_s:.1f}x, peak memory {old_peak / new_peak:.1f}x lower")
+
+
+if __name__ == "__main__":
+    main()
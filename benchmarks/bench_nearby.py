@@ -0,0 +1,91 @@
+"""
+Microbenchmark: /api/nearby radius and k-nearest searches.
+
+Builds a ``PointIndex`` over synthetic points spread across Malaysia, half
+of them clustered around a few cities like the real towers, and compares
+a brute-force haversine over every point with the grid index lookups
+(``within`` for a radius, ``nearest`` for k-NN) at random query locations.
+
+Usage: python benchmarks/bench_nearby.py [points] [queries]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spatial_index import PointIndex, haversine_km  # noqa: E402
+
+CITIES = [(101.69, 3.14), (100.33, 5.41), (103.76, 1.49), (116.07, 5.98), (110.35, 1.55)]
+
+
+def synthetic_points(points, seed=0):
+    rng = np.random.default_rng(seed)
+    spread = points // 2
+    lon = rng.uniform(100.0, 119.0, points)
+    lat = rng.uniform(1.0, 7.0, points)
+    centres = rng.integers(len(CITIES), size=spread)
+    lon[:spread] = np.array([c[0] for c in CITIES])[centres] + rng.normal(0, 0.15, spread)
+    lat[:spread] = np.array([c[1] for c in CITIES])[centres] + rng.normal(0, 0.15, spread)
+    return pd.DataFrame({
+        "MASKED_ID": np.arange(points),
+        "SITE_NAME": "Site",
+        "STATE": "Selangor",
+        "X": lon,
+        "Y": lat,
+    })
+
+
+def brute_within(index, lon, lat, radius_km):
+    distances = haversine_km(lon, lat, index.lon, index.lat)
+    positions = np.flatnonzero(distances <= radius_km)
+    return positions[np.argsort(distances[positions], kind="stable")]
+
+
+def brute_nearest(index, lon, lat, k):
+    distances = haversine_km(lon, lat, index.lon, index.lat)
+    return np.argsort(distances, kind="stable")[:k]
+
+
+def per_query(func, queries):
+    started = time.perf_counter()
+    for lon, lat in queries:
+        func(lon, lat)
+    return (time.perf_counter() - started) / len(queries)
+
+
+def main():
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    started = time.perf_counter()
+    index = PointIndex("pedi", synthetic_points(points))
+    build = time.perf_counter() - started
+
+    rng = np.random.default_rng(1)
+    picks = rng.integers(len(index), size=n_queries)
+    queries = list(zip(index.lon[picks] + 0.01, index.lat[picks] + 0.01))
+
+    print(f"points={len(index)} queries={n_queries} (index built in {build:.2f} s; mean per query)")
+    print(f"  {'search':<16}{'brute force':>14}{'grid index':>14}{'speedup':>10}")
+    scenarios = [
+        ("radius 5 km", lambda lon, lat: brute_within(index, lon, lat, 5.0),
+         lambda lon, lat: index.within(lon, lat, 5.0)),
+        ("radius 25 km", lambda lon, lat: brute_within(index, lon, lat, 25.0),
+         lambda lon, lat: index.within(lon, lat, 25.0)),
+        ("k=1", lambda lon, lat: brute_nearest(index, lon, lat, 1),
+         lambda lon, lat: index.nearest(lon, lat, 1)),
+        ("k=50", lambda lon, lat: brute_nearest(index, lon, lat, 50),
+         lambda lon, lat: index.nearest(lon, lat, 50)),
+    ]
+    for name, brute, indexed in scenarios:
+        before = per_query(brute, queries)
+        after = per_query(indexed, queries)
+        print(f"  {name:<16}{before * 1000:>11.2f} ms{after * 1000:>11.3f} ms{before / after:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
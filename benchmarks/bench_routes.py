@@ -0,0 +1,252 @@
+"""
+Route benchmark: every /api/* route of app.py, driven through the Flask test
+client against ``fake_synapse`` (SQLite tables of configurable size standing
+in for cims_geo on Synapse), so the connectors run their real SQL.
+
+For each case the first request is timed on its own (it builds the spatial
+indexes and filter hierarchy it needs, and starts the aggregate cube building
+in the background), then ``requests`` more are sent from ``clients`` threads; p50 / p95 latency and throughput
+come from those. Peak memory is the tracemalloc peak during one further
+request, i.e. Python-side allocations (pandas and numpy included, pyarrow
+buffers not). Caches are on, as in production; ``--cold`` turns off the
+result, tile and coverage-gap caches and the aggregate cube, so every request
+reaches SQLite.
+
+Save a run with ``--save results.json`` and check a later one against it
+with ``--baseline results.json`` (same --scale and --cold): the exit status
+is 1 when any case fails, or its p95 latency or peak memory exceeds the
+baseline by more than both ``--tolerance`` and NOISE_FLOOR. A new /api/*
+route with no case here (or in SKIPPED) also fails the run. Needs the
+usual .env (Supabase credentials are read at import; nothing connects to them).
+
+Usage: python benchmarks/bench_routes.py [--scale 1.0] [--requests 50] [--clients 1]
+                                         [--latency-ms 0] [--cold] [--only mb_network,pudo]
+                                         [--save FILE | --baseline FILE [--tolerance 0.25]]
+"""
+import argparse
+import gc
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ADMIN_TOKEN = "bench-admin-token"
+
+# (case name, path); a route may appear more than once with different parameters
+CASES = [
+    ("mb_network", "/api/mb_network?limit=100&offset=0"),
+    ("mb_network keyset", "/api/mb_network?limit=1000&after="),
+    ("mb_network arrow", "/api/mb_network?limit=1000&offset=0&format=arrow"),
+    ("mb_network/count", "/api/mb_network/count"),
+    ("data_sources_filtered", "/api/data_sources_filtered?source=All&state=Selangor&limit=1000"),
+    ("data_sources_filtered bbox", "/api/data_sources_filtered?source=All&bbox=101.0,2.8,102.0,3.6"),
+    ("tower_structures", "/api/tower_structures?limit=100&offset=0"),
+    ("fiber_optic_sites", "/api/fiber_optic_sites?limit=100&offset=0"),
+    ("pudo", "/api/pudo?limit=100&offset=0"),
+    ("pedi", "/api/pedi?limit=100&offset=0"),
+    ("mb_moran_mocn", "/api/mb_moran_mocn?limit=100&offset=0"),
+    ("export csv", "/api/export/pudo?format=csv"),
+    ("export parquet", "/api/export/tower_structures?format=parquet"),
+    ("operator_structure", "/api/operator_structure"),
+    ("structure_category", "/api/structure_category?state=Johor"),
+    ("structure_project", "/api/structure_project"),
+    ("structure_state", "/api/structure_state"),
+    ("structure_summary", "/api/structure_summary?operator=MAXIS"),
+    ("rci/dashboard", "/api/rci/dashboard"),
+    ("tower_structures_map", "/api/tower_structures_map?limit=1000&offset=0"),
+    ("tower_structures_map ndjson", "/api/tower_structures_map?stream=ndjson&state=Perak"),
+    ("filter_options", "/api/tower_structures/filter_options"),
+    ("clusters", "/api/tower_structures/clusters?bbox=99.6,0.8,119.3,7.4&zoom=6"),
+    ("nearby", "/api/nearby?lat=3.14&lon=101.69&radius_km=5&layers=tower_structures,pedi"),
+    ("coverage_gaps", "/api/coverage_gaps?sites=pedi&sort=tower&limit=100"),
+    ("tower_structures/filtered", "/api/tower_structures/filtered?state=Selangor&limit=1000"),
+    ("dependent_filters", "/api/tower_structures/dependent_filters?state=Selangor"),
+    ("debug/filters", "/api/debug/filters?state=Selangor"),
+    ("test/all_endpoints", "/api/test/all_endpoints"),
+    ("test/all_data", "/api/test/all_data"),
+    ("admin/cache", "/api/admin/cache"),
+    ("tile", "/tiles/tower_structures/8/203/126.mvt"),
+]
+
+# /api/* routes deliberately not benchmarked
+SKIPPED = {
+    "/api/login": "calls Supabase",
+    "/api/register": "calls Supabase",
+    "/api/admin/cache/invalidate": "drops the caches the other cases measure",
+}
+
+# Growth below these is noise, whatever the tolerance
+NOISE_FLOOR = {"p95_ms": 2.0, "peak_mib": 1.0}
+
+
+def create_app(scale, latency_ms, cold):
+    """The real app on a fresh fake_synapse database; returns ``(app, database path)``."""
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("ADMIN_API_TOKEN", ADMIN_TOKEN)
+    if cold:
+        for name in ("RESULT_CACHE_TTL_SECONDS", "TILE_CACHE_TTL_SECONDS", "COVERAGE_CACHE_TTL_SECONDS"):
+            os.environ[name] = "0"
+        os.environ["AGGREGATE_CUBE_ENABLED"] = "false"
+
+    import fake_synapse
+    import synapse_pool
+
+    database = fake_synapse.build_database(fake_synapse.scaled_rows(scale))
+    driver = fake_synapse.SynapseLite(database, latency_ms=latency_ms)
+    synapse_pool.configure_pool(connect=driver.connect)
+    import app
+
+    return app.app, database
+
+
+def uncovered_routes(app):
+    """/api/* rules that no case exercises and SKIPPED does not list."""
+    adapter = app.url_map.bind("localhost")
+    covered = {adapter.match(path.split("?")[0], return_rule=True)[0].rule for _, path in CASES}
+    return sorted(
+        rule.rule for rule in app.url_map.iter_rules()
+        if rule.rule.startswith("/api/") and rule.rule not in covered and rule.rule not in SKIPPED
+    )
+
+
+def get(client, path):
+    """One GET with the body fully read; returns (seconds, status)."""
+    started = time.perf_counter()
+    response = client.get(path, headers={"X-Admin-Token": os.environ.get("ADMIN_API_TOKEN", "")})
+    response.get_data()
+    elapsed = time.perf_counter() - started
+    response.close()
+    return elapsed, response.status_code
+
+
+def run_case(app, path, requests, clients):
+    first, status = get(app.test_client(), path)
+    latencies = []
+    errors = [int(status >= 400)]
+    lock = threading.Lock()
+
+    def client(count):
+        test_client = app.test_client()
+        mine, failed = [], 0
+        for _ in range(count):
+            elapsed, code = get(test_client, path)
+            mine.append(elapsed)
+            failed += code >= 400
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    shares = [requests // clients + (i < requests % clients) for i in range(clients)]
+    threads = [threading.Thread(target=client, args=(share,)) for share in shares if share]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    gc.collect()
+    tracemalloc.start()
+    get(app.test_client(), path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50, p95 = np.percentile(latencies, [50, 95]) if latencies else (float("nan"),) * 2
+    return {
+        "path": path,
+        "status": status,
+        "errors": errors[0],
+        "first_ms": first * 1000,
+        "p50_ms": p50 * 1000,
+        "p95_ms": p95 * 1000,
+        "rps": len(latencies) / wall if wall else float("nan"),
+        "peak_mib": peak / 2 ** 20,
+    }
+
+
+def regressions(results, baseline, tolerance):
+    """Messages for each case slower or larger than ``baseline`` by more than ``tolerance``."""
+    found = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for metric, floor in NOISE_FLOOR.items():
+            if result[metric] > max(before[metric] * (1 + tolerance), before[metric] + floor):
+                found.append(f"{name}: {metric} {before[metric]:.1f} -> {result[metric]:.1f}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", type=float, default=float(os.getenv("BENCH_SCALE", "1.0")),
+                        help="multiplier on fake_synapse.DEFAULT_ROWS")
+    parser.add_argument("--requests", type=int, default=50, help="timed requests per case")
+    parser.add_argument("--clients", type=int, default=1, help="threads sending the timed requests")
+    parser.add_argument("--latency-ms", type=float, default=float(os.getenv("BENCH_QUERY_MS", "0")),
+                        help="simulated Synapse round trip per statement")
+    parser.add_argument("--cold", action="store_true", help="disable result caches and the aggregate cube")
+    parser.add_argument("--only", help="comma-separated case names to run")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed growth over the baseline")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    app, database = create_app(args.scale, args.latency_ms, args.cold)
+    import fake_synapse
+
+    try:
+        missing = uncovered_routes(app)
+        if missing:
+            print(f"No benchmark case for: {', '.join(missing)}")
+            return 1
+        rows = fake_synapse.scaled_rows(args.scale)
+        print(f"{sum(rows.values()):,} rows ({rows['TOWER_STRUCTURES']:,} towers) built in "
+              f"{time.perf_counter() - started:.1f} s; {args.requests} requests x {args.clients} clients, "
+              f"{args.latency_ms:.0f} ms per query, caches {'off' if args.cold else 'on'}")
+        print(f"  {'case':<30}{'status':>7}{'first':>11}{'p50':>11}{'p95':>11}{'req/s':>9}{'peak':>11}")
+
+        only = set(args.only.split(",")) if args.only else None
+        results = {}
+        for name, path in CASES:
+            if only and name not in only:
+                continue
+            result = results[name] = run_case(app, path, args.requests, args.clients)
+            print(f"  {name:<30}{result['status']:>7}{result['first_ms']:>8.1f} ms{result['p50_ms']:>8.1f} ms"
+                  f"{result['p95_ms']:>8.1f} ms{result['rps']:>9.1f}{result['peak_mib']:>7.1f} MiB")
+        print(f"  skipped: {', '.join(f'{route} ({reason})' for route, reason in SKIPPED.items())}")
+        print(f"  max RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
+    finally:
+        os.remove(database)
+
+    failed = [name for name, result in results.items() if result["errors"]]
+    for name in failed:
+        print(f"FAILED {name}: {results[name]['errors']} error responses (first status {results[name]['status']})")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"scale": args.scale, "cold": args.cold, "results": results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if (baseline["scale"], baseline["cold"]) != (args.scale, args.cold):
+            print(f"Baseline was run with --scale {baseline['scale']}{' --cold' if baseline['cold'] else ''}; "
+                  f"compare runs with the same settings")
+            return 1
+        found = regressions(results, baseline["results"], args.tolerance)
+        for message in found:
+            print(f"REGRESSION {message}")
+        failed += found
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
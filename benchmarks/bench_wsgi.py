@@ -0,0 +1,151 @@
+"""
+Load test: Flask's development server (the old ``python app.py`` CMD) vs
+gunicorn with gunicorn.conf.py, both serving the real app against
+``fake_pyodbc`` with a fixed per-query latency standing in for Synapse.
+
+Each server is started in a subprocess, then ``clients`` threads send
+keep-alive GET requests to ``BENCH_PATH`` for ``seconds``; throughput and
+latency percentiles are reported per server. Needs gunicorn and the usual
+.env (Supabase credentials are read at import; nothing connects to them).
+
+Usage: python benchmarks/bench_wsgi.py [clients] [seconds]
+Environment: BENCH_QUERY_MS (default 50), BENCH_ROWS (100),
+BENCH_PATH (/api/mb_network?limit=100&offset=0), plus any GUNICORN_* setting.
+"""
+import http.client
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+QUERY_SECONDS = float(os.getenv("BENCH_QUERY_MS", "50")) / 1000
+ROWS = int(os.getenv("BENCH_ROWS", "100"))
+PATH = os.getenv("BENCH_PATH", "/api/mb_network?limit=100&offset=0")
+PORT = 5077
+
+COLUMNS = ["MB_NETWORK_ID", "SERVICE_PROVIDER", "NETWORK_TYPE", "LONGITUDE", "LATITUDE", "STATE", "DISTRICT"]
+
+
+def responder(sql, params):
+    if sql.strip() == "SELECT 1":
+        return ["VALUE"], [(1,)]
+    time.sleep(QUERY_SECONDS)  # waiting on Synapse; releases the GIL like pyodbc
+    rows = [(f"MB{i:07d}", "Operator", "4G", 101.69 + i * 1e-4, 3.14, "Selangor", "Petaling") for i in range(ROWS)]
+    return COLUMNS, rows
+
+
+def create_app():
+    """WSGI app factory for gunicorn: the real app on a fake Synapse pool."""
+    import fake_pyodbc
+    import synapse_pool
+
+    driver = fake_pyodbc.FakeDriver(responder=responder)
+    synapse_pool.configure_pool(connect=driver.connect)
+    import app
+
+    return app.app
+
+
+def start_server(mode):
+    env = dict(os.environ, PORT=str(PORT), DB_POOL_WARM_CONNECTIONS="0", GUNICORN_ACCESS_LOG="")
+    if mode == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+                   "--pythonpath", os.path.join(ROOT, "benchmarks"), "bench_wsgi:create_app()"]
+    else:
+        command = [sys.executable, os.path.abspath(__file__), "serve-dev"]
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=5)
+            connection.request("GET", "/")
+            connection.getresponse().read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start on port {PORT}")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def load(clients, seconds):
+    """
+    Return (latencies in seconds, error count) from ``clients`` keep-alive
+    clients. A keep-alive connection closed by the server (a worker recycled
+    by max_requests) is reopened and the request retried, as browsers do.
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + seconds
+
+    def client():
+        connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=60)
+        mine, failed, reused = [], 0, False
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            try:
+                connection.request("GET", PATH)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException) as e:
+                if not (reused and isinstance(e, http.client.RemoteDisconnected)):
+                    failed += 1
+                connection.close()
+                connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=60)
+                reused = False
+                continue
+            reused = True
+            if response.status != 200:
+                failed += 1
+                continue
+            mine.append(time.perf_counter() - started)
+        connection.close()
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.array(latencies), errors[0]
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 15
+
+    print(f"GET {PATH}: {clients} clients for {seconds:.0f} s, {QUERY_SECONDS * 1000:.0f} ms per query, {ROWS} rows")
+    print(f"  {'server':<12}{'req/s':>10}{'p50':>11}{'p99':>11}{'errors':>8}")
+    for mode in ("dev", "gunicorn"):
+        process = start_server(mode)
+        try:
+            latencies, errors = load(clients, seconds)
+        finally:
+            stop_server(process)
+        p50, p99 = (np.percentile(latencies, [50, 99]) * 1000) if len(latencies) else (float("nan"),) * 2
+        print(f"  {mode:<12}{len(latencies) / seconds:>10.1f}{p50:>8.1f} ms{p99:>8.1f} ms{errors:>8}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["serve-dev"]:
+        # As the Dockerfile used to run it: `python app.py` with debug on (reloader off
+        # so the measured process is the one serving).
+        create_app().run(host="0.0.0.0", port=int(os.environ["PORT"]), debug=True, use_reloader=False)
+    else:
+        main()
@@ -0,0 +1,279 @@
+"""
+SQLite stand-in for the cims_geo schema on Synapse, with a pyodbc-style
+driver, so the connectors run their real SQL against tables of any size.
+
+    import fake_synapse, synapse_pool
+    database = fake_synapse.build_database(fake_synapse.scaled_rows(0.5))
+    driver = fake_synapse.SynapseLite(database, latency_ms=20)
+    synapse_pool.configure_pool(connect=driver.connect)
+
+``build_database`` fills TOWER_STRUCTURES, MB_NETWORK, FIBER_OPTIC_SITE,
+PUDO, PEDI and MB_MORAN_MOCN_FULL with deterministic synthetic rows spread
+over Malaysia (state / district / mukim / DUN hierarchy, operators,
+categories), keeping X and Y as text like the source tables. Text columns
+use NOCASE collation to match the pool's case-insensitive comparisons.
+
+Each statement is rewritten from the T-SQL the connectors emit (three-part
+table names, TOP (?), TRY_CAST, FORMAT(..., 'N2') + '%') to SQLite before it
+runs; anything else is passed through unchanged. ``latency_ms`` adds a fixed
+round-trip delay per statement, as waiting on Synapse would.
+"""
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Rows per table at scale 1.0
+DEFAULT_ROWS = {
+    "TOWER_STRUCTURES": 40000,
+    "MB_NETWORK": 60000,
+    "FIBER_OPTIC_SITE": 20000,
+    "PUDO": 10000,
+    "PEDI": 1000,
+    "MB_MORAN_MOCN_FULL": 30000,
+}
+
+REGION_COLUMNS = ["STATE", "DISTRICT", "MUKIM", "DUN", "PARLIAMENT"]
+
+SCHEMA = {
+    "TOWER_STRUCTURES": ["STRUCTURE_ID", "OPERATOR", "OWNER", "STRUCTURE_CATEGORY", "PROJECTS", "STATUS",
+                         *REGION_COLUMNS, "X", "Y"],
+    "MB_NETWORK": ["MB_NETWORK_ID", "SERVICE_PROVIDER", "HOST", "SHARER", "BACKHAUL", "NETWORK_TYPE",
+                   *REGION_COLUMNS, "X", "Y"],
+    "FIBER_OPTIC_SITE": ["ID", "REFID", "SERVICE_PROVIDER", "CATEGORY", "PROJECT", "STRUCTURE_TYPE_CODE",
+                         *REGION_COLUMNS, "X", "Y"],
+    "PUDO": ["REFID", "SERVICE_PROVIDER", "PUDO_SERVICE_TYPE", "BUILDING_CATEGORY", "TYPE_INFRASTRUCTURE",
+             *REGION_COLUMNS, "X", "Y"],
+    "PEDI": ["MASKED_ID", "SITE_NAME", "STATE", "X", "Y"],
+    "MB_MORAN_MOCN_FULL": ["MB_NETWORK_ID", "HOST", "SHARER", "ATN_AZIMUTH"],
+}
+
+NUMERIC_COLUMNS = {"ID", "ATN_AZIMUTH"}
+# Columns the connectors sort and page on get an index; the first column always does
+INDEXED_COLUMNS = {"FIBER_OPTIC_SITE": ["REFID"]}
+
+# State -> approximate centre (lon, lat); points are scattered around it
+STATES = {
+    "Johor": (103.5, 1.9), "Kedah": (100.6, 6.0), "Kelantan": (102.0, 5.3), "Melaka": (102.3, 2.3),
+    "Negeri Sembilan": (102.1, 2.8), "Pahang": (102.8, 3.8), "Perak": (101.0, 4.6), "Perlis": (100.2, 6.5),
+    "Pulau Pinang": (100.3, 5.4), "Sabah": (116.8, 5.4), "Sarawak": (113.0, 2.5), "Selangor": (101.5, 3.2),
+    "Terengganu": (103.0, 4.9), "W.P. Kuala Lumpur": (101.7, 3.14),
+}
+DISTRICTS_PER_STATE = 8
+MUKIMS_PER_DISTRICT = 6
+OPERATORS = ["CELCOM", "DIGI", "MAXIS", "UMOBILE", "TM", "YTL", "REDTONE", "TIME"]
+OWNERS = ["EDOTCO", "TOWERCO A", "TOWERCO B", "SACOFA", "MELATI", "COMMON TOWER"]
+STRUCTURE_CATEGORIES = ["GREENFIELD", "ROOFTOP", "STREET FURNITURE", "MONOPOLE", "LAMP POLE"]
+PROJECTS = ["JENDELA 1", "JENDELA 2", "PPR", "TPM", "COMMERCIAL"]
+NETWORK_TYPES = ["2G", "3G", "4G", "5G"]
+BACKHAULS = ["FIBER", "MICROWAVE", "SATELLITE"]
+
+
+def scaled_rows(scale=1.0):
+    """DEFAULT_ROWS multiplied by ``scale`` (at least one row per table)."""
+    return {table: max(1, int(count * scale)) for table, count in DEFAULT_ROWS.items()}
+
+
+def _regions(rng):
+    """Every (state, district, mukim, dun, parliament, centre) in the synthetic hierarchy."""
+    regions = []
+    for state, (lon, lat) in STATES.items():
+        for d in range(DISTRICTS_PER_STATE):
+            district = f"{state} District {d + 1}"
+            for m in range(MUKIMS_PER_DISTRICT):
+                centre = (lon + rng.uniform(-0.6, 0.6), lat + rng.uniform(-0.4, 0.4))
+                regions.append((state, district, f"{district} Mukim {m + 1}", f"N{d * 3 + m // 2 + 1:02d} {state}",
+                                f"P{d + 1:03d} {state}", centre))
+    return regions
+
+
+def _rows(table, count, rng, regions):
+    for i in range(count):
+        state, district, mukim, dun, parliament, (lon, lat) = rng.choice(regions)
+        x, y = f"{lon + rng.gauss(0, 0.08):.6f}", f"{lat + rng.gauss(0, 0.06):.6f}"
+        region = (state, district, mukim, dun, parliament)
+        operator = rng.choice(OPERATORS)
+        if table == "TOWER_STRUCTURES":
+            status = "DISCONTINUE" if rng.random() < 0.05 else "ACTIVE"
+            yield (f"TS{i:07d}", operator, rng.choice(OWNERS), rng.choice(STRUCTURE_CATEGORIES),
+                   rng.choice(PROJECTS), status, *region, x, y)
+        elif table == "MB_NETWORK":
+            # A few network ids repeat, as in the source table the connector de-duplicates
+            network_id = f"MB{(i if rng.random() > 0.02 else max(0, i - 1)):07d}"
+            yield (network_id, operator, operator, rng.choice(OPERATORS), rng.choice(BACKHAULS),
+                   rng.choice(NETWORK_TYPES), *region, x, y)
+        elif table == "FIBER_OPTIC_SITE":
+            yield (i + 1, f"FO{i:07d}", operator, rng.choice(["BUSINESS", "RESIDENTIAL", "GOVERNMENT"]),
+                   rng.choice(PROJECTS), rng.choice(["FTTH", "FTTP", "FTTC"]), *region, x, y)
+        elif table == "PUDO":
+            yield (f"PD{i:07d}", rng.choice(["POS MALAYSIA", "J&T", "DHL", "NINJA VAN"]),
+                   rng.choice(["LOCKER", "COUNTER"]), rng.choice(["SHOP", "PETROL STATION", "OFFICE"]),
+                   rng.choice(["INDOOR", "OUTDOOR"]), *region, x, y)
+        elif table == "PEDI":
+            yield (f"PEDI{i:05d}", f"PEDI {mukim}", state, x, y)
+        elif table == "MB_MORAN_MOCN_FULL":
+            yield (f"MB{i:07d}", operator, rng.choice(OPERATORS), rng.randrange(0, 360, 10))
+
+
+def build_database(rows=None, path=None, seed=42):
+    """
+    Create a SQLite file holding every cims_geo table with ``rows``
+    ({table: count}, default DEFAULT_ROWS) synthetic rows. Returns its path;
+    without ``path`` the file goes in the temp directory and the caller removes it.
+    """
+    rows = {**DEFAULT_ROWS, **(rows or {})}
+    if path is None:
+        handle, path = tempfile.mkstemp(prefix="cims_geo_", suffix=".sqlite")
+        os.close(handle)
+    rng = random.Random(seed)
+    regions = _regions(rng)
+    connection = sqlite3.connect(path)
+    try:
+        for table, columns in SCHEMA.items():
+            definitions = ", ".join(
+                f"{name} INTEGER" if name in NUMERIC_COLUMNS else f"{name} TEXT COLLATE NOCASE" for name in columns
+            )
+            connection.execute(f"DROP TABLE IF EXISTS {table}")
+            connection.execute(f"CREATE TABLE {table} ({definitions})")
+            placeholders = ", ".join("?" for _ in columns)
+            connection.executemany(f"INSERT INTO {table} VALUES ({placeholders})",
+                                   _rows(table, rows[table], rng, regions))
+            for column in [columns[0], *INDEXED_COLUMNS.get(table, [])]:
+                connection.execute(f"CREATE INDEX {table}_{column} ON {table} ({column})")
+        connection.commit()
+    finally:
+        connection.close()
+    return path
+
+
+# ------------------------------------------------------------------------------
+#  T-SQL -> SQLite
+# ------------------------------------------------------------------------------
+_THREE_PART_NAME = re.compile(r"\[Dedicated SQL Pool\]\.cims_geo\.", re.IGNORECASE)
+_TRY_CAST_FLOAT = re.compile(r"TRY_CAST\(([^()]+?) AS FLOAT\)", re.IGNORECASE)
+_FORMAT = re.compile(r"\bFORMAT\(", re.IGNORECASE)
+_STRING_CONCAT = re.compile(r"\)\s*\+\s*'")
+_TOP = re.compile(r"\bTOP \(\?\)\s*", re.IGNORECASE)
+
+
+def _try_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _format(value, style):
+    """FORMAT(value, 'N2'): thousands separators and two decimals."""
+    if value is None:
+        return None
+    digits = int(style[1:]) if style and style[0] in "Nn" and style[1:].isdigit() else 2
+    return f"{float(value):,.{digits}f}"
+
+
+def translate(sql):
+    """
+    Rewrite one statement for SQLite. Returns ``(sql, top_param)`` where
+    ``top_param`` is the index of the TOP (?) parameter, which moves to a
+    trailing LIMIT ?, or None.
+    """
+    sql = _THREE_PART_NAME.sub("", sql)
+    sql = _TRY_CAST_FLOAT.sub(r"try_float(\1)", sql)
+    sql = _FORMAT.sub("tsql_format(", sql)
+    sql = _STRING_CONCAT.sub(") || '", sql)
+    top = _TOP.search(sql)
+    if top is None:
+        return sql, None
+    top_param = sql.count("?", 0, top.start())
+    sql = sql[:top.start()] + sql[top.end():]
+    return sql.rstrip().rstrip(";") + "\nLIMIT ?", top_param
+
+
+# ------------------------------------------------------------------------------
+#  pyodbc-style driver
+# ------------------------------------------------------------------------------
+class Cursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection._db.cursor()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = tuple(params[0])
+        statement, top_param = self.connection.driver.translated(sql)
+        if top_param is not None:
+            params = params[:top_param] + params[top_param + 1:] + params[top_param:top_param + 1]
+        if self.connection.driver.latency:
+            time.sleep(self.connection.driver.latency)
+        self._cursor.execute(statement, params)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def cancel(self):
+        self.connection._db.interrupt()
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    def __init__(self, driver):
+        self.driver = driver
+        # The pool hands a connection to one thread at a time, but not always the same one
+        self._db = sqlite3.connect(f"file:{driver.path}?mode=ro", uri=True, check_same_thread=False)
+        self._db.create_function("try_float", 1, _try_float, deterministic=True)
+        self._db.create_function("tsql_format", 2, _format, deterministic=True)
+
+    def cursor(self):
+        return Cursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self._db.close()
+
+
+class SynapseLite:
+    """``connect`` factory for ``synapse_pool.configure_pool`` over a ``build_database`` file."""
+
+    def __init__(self, path, latency_ms=0):
+        self.path = path
+        self.latency = latency_ms / 1000
+        self.connects = 0
+        self._translated = {}
+        self._lock = threading.Lock()
+
+    def translated(self, sql):
+        result = self._translated.get(sql)
+        if result is None:
+            result = translate(sql)
+            with self._lock:
+                self._translated[sql] = result
+        return result
+
+    def connect(self, *args, **kwargs):
+        with self._lock:
+            self.connects += 1
+        return Connection(self)
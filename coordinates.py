@@ -0,0 +1,56 @@
+import pandas as pd
+
+# Generous envelope around Peninsular Malaysia, Sabah and Sarawak
+MALAYSIA_BOUNDS = {
+    "min_lat": 0.8,
+    "max_lat": 7.5,
+    "min_lon": 99.5,
+    "max_lon": 119.5,
+}
+
+
+def _as_float(series):
+    """``series`` as float64, or None when some value is not a plain number."""
+    try:
+        return series.astype("float64")
+    except (TypeError, ValueError):
+        return None
+
+
+def to_coordinate(series):
+    """
+    Convert a column of coordinates to float64 with whole-column operations.
+
+    Numbers, Decimals and numeric text take one C-level cast. Otherwise
+    '<' / '>' qualifiers and whitespace are stripped and the cast retried;
+    only a column that still holds non-numeric text pays for the slower
+    element-wise ``pd.to_numeric(errors="coerce")``, which maps it to NaN.
+    """
+    values = _as_float(series)
+    if values is not None:
+        return values
+    text = series.astype(str).str.replace("<", "", regex=False)
+    text = text.str.replace(">", "", regex=False).str.strip()
+    text = text.where(series.notna(), None)
+    values = _as_float(text)
+    if values is not None:
+        return values
+    return pd.to_numeric(text, errors="coerce").astype("float64")
+
+
+def clean_coordinates(df, lat_column="LATITUDE", lon_column="LONGITUDE", bounds=MALAYSIA_BOUNDS):
+    """
+    Normalize the latitude / longitude columns of ``df`` to floats and drop
+    rows whose coordinates are missing, unparsable or outside ``bounds``.
+    Pass ``bounds=None`` to keep every parsable coordinate.
+    """
+    if df is None or df.empty or lat_column not in df.columns or lon_column not in df.columns:
+        return df
+    lat = to_coordinate(df[lat_column])
+    lon = to_coordinate(df[lon_column])
+    keep = lat.notna() & lon.notna()
+    if bounds is not None:
+        keep &= lat.between(bounds["min_lat"], bounds["max_lat"])
+        keep &= lon.between(bounds["min_lon"], bounds["max_lon"])
+    df = df.assign(**{lat_column: lat, lon_column: lon})
+    return df[keep.to_numpy()]
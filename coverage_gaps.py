@@ -0,0 +1,98 @@
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+from result_cache import ResultCache
+from spatial_index import get_point_index
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+#  Coverage gaps: distance from each NADI (PEDI) / PUDO site to the nearest
+#  tower structure and fibre site
+# ------------------------------------------------------------------------------
+SITE_LAYERS = ("pedi", "pudo")
+
+# Output column prefix -> layer searched for the nearest point
+TARGET_LAYERS = {
+    "TOWER": "tower_structures",
+    "FIBER": "fiber_optic_site",
+}
+
+SORT_COLUMNS = {
+    "tower": "TOWER_DISTANCE_KM",
+    "fiber": "FIBER_DISTANCE_KM",
+}
+
+# Whole-table results, keyed by the build times of the indexes they came from
+coverage_cache = ResultCache(
+    ttl_seconds=float(os.getenv("COVERAGE_CACHE_TTL_SECONDS", "3600")),
+    max_bytes=int(float(os.getenv("COVERAGE_CACHE_MAX_MB", "64")) * 1024 * 1024),
+)
+
+
+def compute_coverage_gaps(site_layer):
+    """
+    Every site of ``site_layer`` with NEAREST_TOWER_ID / TOWER_DISTANCE_KM
+    and NEAREST_FIBER_ID / FIBER_DISTANCE_KM (km, haversine), ordered by
+    the site's id. Nearest points come from ``PointIndex.nearest_many``, so
+    all sites are matched in a few vectorized passes instead of a cross join.
+    """
+    sites = get_point_index(site_layer).rows_in()
+    for prefix, layer in TARGET_LAYERS.items():
+        index = get_point_index(layer)
+        positions, distances = index.nearest_many(sites["LONGITUDE"].to_numpy(), sites["LATITUDE"].to_numpy())
+        found = positions >= 0
+        ids = np.full(len(sites), None, dtype=object)
+        ids[found] = index.ids[positions[found]]
+        sites[f"NEAREST_{prefix}_ID"] = ids
+        sites[f"{prefix}_DISTANCE_KM"] = np.where(found, np.round(distances, 4), np.nan)
+    return sites
+
+
+def get_coverage_gaps(site_layer):
+    """
+    ``(sites, computed_at)`` for ``site_layer``, computed once per set of
+    index builds and then served from ``coverage_cache``. The cached
+    DataFrame is shared between requests and must not be mutated.
+    """
+    layers = (site_layer, *TARGET_LAYERS.values())
+    key = (site_layer, tuple(get_point_index(layer).loaded_at for layer in layers))
+    hit, value = coverage_cache.get(key)
+    if hit:
+        return value
+
+    started = time.monotonic()
+    sites = compute_coverage_gaps(site_layer)
+    logger.info("%s coverage gaps computed for %s sites in %.2fs", site_layer, len(sites), time.monotonic() - started)
+    value = (sites, time.time())
+    coverage_cache.put(key, value)
+    return value
+
+
+def coverage_page(site_layer, sort="tower", min_km=None, offset=0, limit=100):
+    """
+    One page of ``site_layer``'s coverage gaps, farthest from a ``sort``
+    point first, keeping only sites at least ``min_km`` away when set.
+    Returns ``(page, total, computed_at)``.
+    """
+    sites, computed_at = get_coverage_gaps(site_layer)
+    column = SORT_COLUMNS[sort]
+    if min_km is not None:
+        sites = sites[sites[column] >= min_km]
+    sites = sites.sort_values(column, ascending=False, kind="stable", na_position="first")
+    page = sites.iloc[int(offset):int(offset) + int(limit)].reset_index(drop=True)
+    return page, int(len(sites)), computed_at
+
+
+if __name__ == "__main__":
+    # python coverage_gaps.py [pedi|pudo] [output.csv]
+    layer = sys.argv[1] if len(sys.argv) > 1 else "pedi"
+    output = sys.argv[2] if len(sys.argv) > 2 else f"{layer}_coverage_gaps.csv"
+    result, _ = get_coverage_gaps(layer)
+    result.to_csv(output, index=False)
+    print(f"Wrote {len(result)} {layer} sites to {output}")
+    print(result[list(SORT_COLUMNS.values())].describe())
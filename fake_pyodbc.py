@@ -0,0 +1,133 @@
+"""
+In-memory stand-in for the parts of the pyodbc API the connectors use.
+
+Point the shared pool at it with::
+
+    import fake_pyodbc, synapse_pool
+    driver = fake_pyodbc.FakeDriver(responder=lambda sql, params: (["N"], [(1,)]))
+    synapse_pool.configure_pool(connect=driver.connect)
+
+``responder`` receives every executed statement with its parameters and
+returns ``(columns, rows)``; ``rows`` may be any iterable, including a
+generator for result sets too large to build up front. Tests can then inspect ``driver.connects`` and
+``driver.statements``, or call ``driver.break_connections()`` to simulate the
+server dropping every open session.
+"""
+import itertools
+import threading
+import time
+
+
+class Error(Exception):
+    """Mirror of ``pyodbc.Error``."""
+
+
+class OperationalError(Error):
+    """Mirror of ``pyodbc.OperationalError``."""
+
+
+def _empty_responder(sql, params):
+    return ["VALUE"], [(1,)]
+
+
+class FakeCursor:
+    """Rows are pulled from the responder's iterable lazily, like a server-side cursor."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self._rows = iter(())
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = tuple(params[0])
+        self.connection._check_open()
+        columns, rows = self.connection.driver._run(sql, params)
+        self.description = [(name, None, None, None, None, None, True) for name in columns]
+        self._rows = (tuple(row) for row in rows)
+        return self
+
+    def fetchone(self):
+        return next(self._rows, None)
+
+    def fetchmany(self, size=1):
+        return list(itertools.islice(self._rows, size))
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def cancel(self):
+        self._rows = iter(())
+
+    def close(self):
+        self._rows = iter(())
+
+
+class FakeConnection:
+    def __init__(self, driver, conn_str):
+        self.driver = driver
+        self.conn_str = conn_str
+        self.closed = False
+        self.broken = False
+
+    def _check_open(self):
+        if self.closed:
+            raise Error("Attempt to use a closed connection.")
+        if self.broken:
+            raise OperationalError("Communication link failure")
+
+    def cursor(self):
+        self._check_open()
+        return FakeCursor(self)
+
+    def commit(self):
+        self._check_open()
+
+    def rollback(self):
+        self._check_open()
+
+    def close(self):
+        self.closed = True
+
+
+class FakeDriver:
+    """Connection factory that records what the code under test does with it."""
+
+    def __init__(self, responder=None, connect_delay=0.0, execute_delay=0.0):
+        self.responder = responder or _empty_responder
+        self.connect_delay = connect_delay
+        self.execute_delay = execute_delay
+        self.connects = 0
+        self.statements = []
+        self.connections = []
+        self._lock = threading.Lock()
+
+    def connect(self, conn_str="", **kwargs):
+        if self.connect_delay:
+            time.sleep(self.connect_delay)
+        conn = FakeConnection(self, conn_str)
+        with self._lock:
+            self.connects += 1
+            self.connections.append(conn)
+        return conn
+
+    def break_connections(self):
+        """Make every connection opened so far fail on next use."""
+        with self._lock:
+            for conn in self.connections:
+                conn.broken = True
+
+    def _run(self, sql, params):
+        if self.execute_delay:
+            time.sleep(self.execute_delay)
+        with self._lock:
+            self.statements.append((sql, params))
+        return self.responder(sql, params)
+
+
+_default_driver = FakeDriver()
+
+
+def connect(conn_str="", **kwargs):
+    """Module-level ``connect`` so the module itself can replace ``pyodbc``."""
+    return _default_driver.connect(conn_str, **kwargs)
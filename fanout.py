@@ -0,0 +1,74 @@
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Shared by every request so concurrent fan-outs cannot exceed the DB pool
+MAX_WORKERS = int(os.getenv("FANOUT_MAX_WORKERS", "5"))
+TIMEOUT_SECONDS = float(os.getenv("FANOUT_TIMEOUT_SECONDS", "30"))
+
+_executor = None
+_executor_pid = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process-wide executor, building a new one after a fork."""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="fanout")
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _timed(fetch):
+    started = time.monotonic()
+    result = fetch()
+    return result, time.monotonic() - started
+
+
+def fan_out(tasks, timeout=None):
+    """
+    Run every ``name -> fetch()`` in ``tasks`` concurrently.
+
+    Each fetch gets ``timeout`` seconds from submission. Returns
+    ``(results, report)``: ``results`` maps the names that finished to their
+    return values, and ``report`` maps every name to its status ("ok",
+    "error" or "timeout"), elapsed milliseconds and any error message.
+
+    A timed-out fetch cannot be interrupted; it finishes in the background
+    and its result is discarded.
+    """
+    timeout = TIMEOUT_SECONDS if timeout is None else timeout
+    started = time.monotonic()
+    executor = get_executor()
+    # Each fetch runs in a copy of the caller's context, so a request's CancelScope covers it.
+    futures = {name: executor.submit(contextvars.copy_context().run, _timed, fetch) for name, fetch in tasks.items()}
+    wait(futures.values(), timeout=timeout)
+
+    results = {}
+    report = {}
+    for name, future in futures.items():
+        if not future.done():
+            future.cancel()  # only succeeds if it never started
+            report[name] = {
+                "status": "timeout",
+                "elapsed_ms": round((time.monotonic() - started) * 1000),
+                "error": f"No result within {timeout:g}s",
+            }
+            continue
+        try:
+            result, elapsed = future.result()
+        except Exception as e:
+            report[name] = {
+                "status": "error",
+                "elapsed_ms": round((time.monotonic() - started) * 1000),
+                "error": str(e),
+            }
+            continue
+        results[name] = result
+        report[name] = {"status": "ok", "elapsed_ms": round(elapsed * 1000)}
+    return results, report
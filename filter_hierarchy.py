@@ -0,0 +1,171 @@
+import logging
+import os
+import threading
+import time
+
+from synapse_pool import pooled_connection
+
+logger = logging.getLogger(__name__)
+
+# One grouped scan yields every STATE → DISTRICT → MUKIM/DUN → OPERATOR path
+HIERARCHY_QUERY = """
+SELECT STATE, DISTRICT, MUKIM, DUN, OPERATOR
+FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES
+WHERE STATUS != 'DISCONTINUE'
+GROUP BY STATE, DISTRICT, MUKIM, DUN, OPERATOR
+"""
+
+OPTION_NAMES = ("operators", "states", "districts", "mukims", "duns")
+
+
+def _key(value):
+    """Lookup key that matches the case-insensitive collation used in Synapse."""
+    return str(value).strip().casefold()
+
+
+def _sorted(values):
+    return sorted(values, key=lambda v: (_key(v), v))
+
+
+class FilterHierarchy:
+    """
+    Immutable in-memory view of the filter dropdown values.
+
+    Every answer is precomputed at build time, so lookups are dict accesses.
+    """
+
+    def __init__(self, rows):
+        everything = {name: set() for name in OPTION_NAMES}
+        by_state = {}
+        by_district = {}
+        by_state_district = {}
+
+        for state, district, mukim, dun, operator in rows:
+            for name, value in (("states", state), ("districts", district), ("mukims", mukim),
+                                ("duns", dun), ("operators", operator)):
+                if value is not None:
+                    everything[name].add(value)
+
+            children = (("districts", district), ("mukims", mukim), ("duns", dun), ("operators", operator))
+            if state is not None:
+                self._add(by_state, _key(state), children)
+            if district is not None:
+                self._add(by_district, _key(district), children[1:])
+                if state is not None:
+                    self._add(by_state_district, (_key(state), _key(district)), children[1:])
+
+        self.row_count = len(rows)
+        self._options = {name: _sorted(values) for name, values in everything.items()}
+        self._by_state = self._freeze(by_state)
+        self._by_district = self._freeze(by_district)
+        self._by_state_district = self._freeze(by_state_district)
+
+    @staticmethod
+    def _add(index, key, children):
+        node = index.setdefault(key, {name: set() for name, _ in children})
+        for name, value in children:
+            if value is not None:
+                node[name].add(value)
+
+    @staticmethod
+    def _freeze(index):
+        return {key: {name: _sorted(values) for name, values in node.items()}
+                for key, node in index.items()}
+
+    def filter_options(self):
+        """Distinct operators, states, districts, mukims and duns."""
+        return {name: self._options[name] for name in OPTION_NAMES}
+
+    def dependent_options(self, state=None, district=None):
+        """
+        Options below the selected parents.
+
+        ``state`` yields its districts, mukims and duns; adding ``district``
+        narrows mukims and duns to that district. Unknown values yield empty
+        lists, and no parent at all yields an empty dict.
+        """
+        if state and district:
+            node = self._by_state_district.get((_key(state), _key(district)), {})
+            return {
+                "districts": self._by_state.get(_key(state), {}).get("districts", []),
+                "mukims": node.get("mukims", []),
+                "duns": node.get("duns", []),
+            }
+        if state:
+            node = self._by_state.get(_key(state), {})
+            return {name: node.get(name, []) for name in ("districts", "mukims", "duns")}
+        if district:
+            node = self._by_district.get(_key(district), {})
+            return {name: node.get(name, []) for name in ("mukims", "duns")}
+        return {}
+
+
+# ------------------------------------------------------------------------------
+#  Process-wide hierarchy, loaded once and refreshed in the background
+# ------------------------------------------------------------------------------
+REFRESH_SECONDS = float(os.getenv("FILTER_HIERARCHY_REFRESH_SECONDS", "3600"))
+
+_hierarchy = None
+_loaded_at = None
+_lock = threading.Lock()
+_load_lock = threading.Lock()  # serializes the first, blocking load
+_refresher_pid = None
+
+
+def load_filter_hierarchy():
+    """Run the grouped query against Synapse and build a fresh hierarchy."""
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(HIERARCHY_QUERY)
+        rows = [tuple(row) for row in cursor.fetchall()]
+        cursor.close()
+    return FilterHierarchy(rows)
+
+
+def refresh_filter_hierarchy():
+    """Rebuild the hierarchy and swap it in; the old one keeps serving on failure."""
+    global _hierarchy, _loaded_at
+    hierarchy = load_filter_hierarchy()
+    with _lock:
+        _hierarchy, _loaded_at = hierarchy, time.time()
+    logger.info("Filter hierarchy refreshed (%s paths)", hierarchy.row_count)
+    return hierarchy
+
+
+def _refresh_loop():
+    while True:
+        time.sleep(REFRESH_SECONDS)
+        try:
+            refresh_filter_hierarchy()
+        except Exception as e:
+            logger.error("Error refreshing filter hierarchy: %s", e)
+
+
+def _ensure_refresher():
+    global _refresher_pid
+    if REFRESH_SECONDS <= 0 or _refresher_pid == os.getpid():
+        return
+    with _lock:
+        if _refresher_pid == os.getpid():
+            return
+        _refresher_pid = os.getpid()
+    threading.Thread(target=_refresh_loop, name="filter-hierarchy-refresh", daemon=True).start()
+
+
+def get_filter_hierarchy():
+    """Return the current hierarchy, loading it synchronously on first use."""
+    if _hierarchy is None:
+        with _load_lock:
+            if _hierarchy is None:
+                refresh_filter_hierarchy()
+    _ensure_refresher()
+    return _hierarchy
+
+
+def hierarchy_status():
+    return {
+        "loaded": _hierarchy is not None,
+        "loaded_at": _loaded_at,
+        "paths": _hierarchy.row_count if _hierarchy is not None else 0,
+        "refresh_seconds": REFRESH_SECONDS,
+    }
@@ -0,0 +1,47 @@
+"""
+gunicorn settings for production serving: gunicorn -c gunicorn.conf.py app:app
+
+Requests spend most of their time waiting on Synapse inside pyodbc, which
+releases the GIL, so each worker process runs a pool of threads (gthread)
+rather than one request at a time. Every setting can be overridden with the
+environment variables below.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Processes: enough to use every core for the JSON/Arrow encoding work
+workers = int(os.getenv("WEB_CONCURRENCY", "0") or 0) or min(multiprocessing.cpu_count() * 2 + 1, 8)
+# Threads per process: concurrent Synapse round-trips each worker can wait on
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# Exports and cold aggregate queries can run for minutes
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Recycle workers now and then so pandas/pyarrow heap growth cannot accumulate
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-") or None
+errorlog = "-"
+
+# synapse_pool.default_pool_size() splits DB_POOL_MAX_TOTAL across
+# WEB_CONCURRENCY workers; without either, give each worker one connection
+# per thread so no thread waits on a checkout (under UvicornWorker,
+# asgi.size_pool raises it to the ASGI executor's thread count).
+os.environ["WEB_CONCURRENCY"] = str(workers)
+if not os.getenv("DB_POOL_MAX_TOTAL"):
+    os.environ.setdefault("DB_POOL_SIZE", str(threads))
+
+
+def post_fork(server, worker):
+    """Give each worker its own log listener and Synapse pool, ready before it takes requests."""
+    from app_logging import configure_logging
+    from synapse_pool import init_worker_pool
+
+    configure_logging()
+    init_worker_pool()
@@ -1,67 +1,18 @@
-import os
-import pyodbc
-import pandas as pd
-from dotenv import load_dotenv
+import logging
 
-# Load environment variables
-load_dotenv()
+import pandas as pd
 
-server = os.getenv('DB_SERVER')
-database = os.getenv('DB_DATABASE')
-username = os.getenv('DB_USERNAME')
-password = os.getenv('DB_PASSWORD')
-port = os.getenv('DB_PORT')
-driver = os.getenv('DB_DRIVER')
+from metrics import instrumented, query_phase
+from query_builder import equals, row_window, where
+from result_cache import normalize_filter
+from synapse_pool import pooled_connection
 
-def get_mb_network_data(offset=0, limit=10):
-    """
-    Fetch unique rows from MB_NETWORK using ROW_NUMBER() pagination,
-    ensuring that only one record per MB_NETWORK_ID is retrieved.
-    """
-    try:
-        print("Connecting to Azure Synapse...")
-
-        conn_str = (
-            f"DRIVER={driver};"
-            f"SERVER={server},{port};"
-            f"DATABASE={database};"
-            f"UID={username};"
-            f"PWD={password}"
-        )
+logger = logging.getLogger(__name__)
 
-        conn = pyodbc.connect(conn_str)
-        cursor = conn.cursor()
-        print("✅ Connected to Azure Synapse successfully!")
-
-        # query = f"""
-        # WITH cte AS (
-        #     SELECT 
-        #         MB_NETWORK_ID,
-        #         SERVICE_PROVIDER,
-        #         HOST,
-        #         SHARER,
-        #         BACKHAUL,
-        #         NETWORK_TYPE,
-        #         X AS LONGITUDE,
-        #         Y AS LATITUDE,
-        #         STATE,
-        #         DISTRICT,
-        #         MUKIM,
-        #         DUN,
-        #         PARLIAMENT,
-        #         ROW_NUMBER() OVER (ORDER BY MB_NETWORK_ID) AS rn
-        #     FROM [Dedicated SQL Pool].cims_geo.MB_NETWORK
-        # )
-        # SELECT *
-        # FROM cte
-        # WHERE rn > {offset}
-        # AND rn <= {offset} + {limit}
-        # """
-
-        # # SQL query to remove duplicate MB_NETWORK_ID and paginate results
-        query = f"""
-        WITH cte AS (
-            SELECT 
+# ------------------------------------------------------------------------------
+#  Column lists per cims_geo table (shared by offset and keyset pagination)
+# ------------------------------------------------------------------------------
+MB_NETWORK_COLUMNS = """
                 MB_NETWORK_ID,
                 SERVICE_PROVIDER,
                 HOST,
@@ -74,58 +25,9 @@ def get_mb_network_data(offset=0, limit=10):
                 DISTRICT,
                 MUKIM,
                 DUN,
-                PARLIAMENT,
-                ROW_NUMBER() OVER (PARTITION BY MB_NETWORK_ID ORDER BY MB_NETWORK_ID) AS rn
-            FROM [Dedicated SQL Pool].cims_geo.MB_NETWORK
-        ),
-        filtered AS (
-            SELECT *,
-                ROW_NUMBER() OVER (ORDER BY MB_NETWORK_ID) AS row_num
-            FROM cte
-            WHERE rn = 1
-        )
-        SELECT * 
-        FROM filtered
-        WHERE row_num > {offset} AND row_num <= {offset} + {limit};
-        """
-
-        cursor.execute(query)
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        df = pd.DataFrame.from_records(rows, columns=columns)
-
-        cursor.close()
-        conn.close()
-        print("✅ Data fetched successfully!")
-        return df
-
-    except Exception as e:
-        print(f"❌ Error fetching MB_NETWORK data: {e}")
-        return pd.DataFrame({"error": [str(e)]})
-    
-
-def get_tower_structures_data(offset=0, limit=10):
-    """
-    Fetch rows from TOWER_STRUCTURES using ROW_NUMBER() pagination.
-    """
-    try:
-        print("Connecting to Azure Synapse for TOWER_STRUCTURES...")
-
-        conn_str = (
-            f"DRIVER={driver};"
-            f"SERVER={server},{port};"
-            f"DATABASE={database};"
-            f"UID={username};"
-            f"PWD={password}"
-        )
+                PARLIAMENT"""
 
-        conn = pyodbc.connect(conn_str)
-        cursor = conn.cursor()
-        print("✅ Connected to Azure Synapse successfully!")
-
-        query = f"""
-        WITH cte AS (
-            SELECT 
+TOWER_STRUCTURES_COLUMNS = """
                 STRUCTURE_ID,
                 OPERATOR AS SERVICE_PROVIDER,
                 OWNER,
@@ -137,296 +39,460 @@ def get_tower_structures_data(offset=0, limit=10):
                 DUN,
                 PARLIAMENT,
                 X AS LONGITUDE,
-                Y AS LATITUDE,
-                ROW_NUMBER() OVER (ORDER BY STRUCTURE_ID) AS rn
-            FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES
+                Y AS LATITUDE"""
+
+FIBER_OPTIC_SITE_COLUMNS = """
+                REFID,
+                SERVICE_PROVIDER,
+                CATEGORY,
+                PROJECT,
+                STRUCTURE_TYPE_CODE AS STRUCTURE_TYPE,
+                STATE,
+                DISTRICT,
+                MUKIM,
+                DUN,
+                PARLIAMENT,
+                X AS LONGITUDE,
+                Y AS LATITUDE"""
+
+PUDO_COLUMNS = """
+                REFID,
+                SERVICE_PROVIDER,
+                PUDO_SERVICE_TYPE,
+                -- The table has BUILDING_CATEGORY, so alias it to BUILDING_TYPE:
+                BUILDING_CATEGORY AS BUILDING_TYPE,
+                TYPE_INFRASTRUCTURE,
+                STATE,
+                DISTRICT,
+                MUKIM,
+                DUN,
+                PARLIAMENT,
+                X AS LONGITUDE,
+                Y AS LATITUDE"""
+
+PEDI_COLUMNS = """
+                MASKED_ID,
+                SITE_NAME,
+                STATE,
+                X AS LONGITUDE,
+                Y AS LATITUDE"""
+
+MB_MORAN_MOCN_COLUMNS = """
+                MB_NETWORK_ID,
+                HOST,
+                SHARER,
+                ATN_AZIMUTH"""
+
+# Key column used for keyset (?after=) pagination on each table
+SEEK_KEYS = {
+    "MB_NETWORK": "MB_NETWORK_ID",
+    "TOWER_STRUCTURES": "STRUCTURE_ID",
+    "FIBER_OPTIC_SITE": "REFID",
+    "PUDO": "REFID",
+    "PEDI": "MASKED_ID",
+    "MB_MORAN_MOCN_FULL": "MB_NETWORK_ID",
+}
+
+# ROW_NUMBER() helper columns, dropped so offset and keyset pages have the same columns
+PAGING_COLUMNS = ["rn", "row_num"]
+
+# Tables without a DISTRICT column; a district filter matches none of their rows
+NO_DISTRICT_TABLES = {"PEDI"}
+
+
+def _filter_predicates(table, state=None, district=None, bbox=None):
+    """
+    Parameterized WHERE predicates for the optional state / district / bbox
+    filters. Returns ``(predicates, params)``.
+
+    STATE and DISTRICT compare with ``=`` and rely on the pool's
+    case-insensitive collation. ``bbox`` is (min_lon, min_lat, max_lon,
+    max_lat); X and Y go through TRY_CAST because some rows hold text.
+    """
+    if table in NO_DISTRICT_TABLES and normalize_filter(district) is not None:
+        predicates, params = equals([("STATE", state)])
+        predicates.append("1 = 0")
+    else:
+        predicates, params = equals([("STATE", state), ("DISTRICT", district)])
+    if bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox)
+        predicates.append("TRY_CAST(X AS FLOAT) BETWEEN ? AND ?")
+        predicates.append("TRY_CAST(Y AS FLOAT) BETWEEN ? AND ?")
+        params.extend([min_lon, max_lon, min_lat, max_lat])
+    return predicates, params
+
+
+def _offset_query(table, columns, order_by, offset, limit, state=None, district=None, bbox=None):
+    """ROW_NUMBER() pagination: numbers every matching row up to offset + limit."""
+    predicates, params = _filter_predicates(table, state, district, bbox)
+    window, window_params = row_window(offset, limit)
+    query = f"""
+        WITH cte AS (
+            SELECT {columns},
+                ROW_NUMBER() OVER (ORDER BY {order_by}) AS rn
+            FROM [Dedicated SQL Pool].cims_geo.{table}
+            {where(predicates)}
         )
         SELECT *
         FROM cte
-        WHERE rn > {offset}
-          AND rn <= {offset} + {limit}
+        WHERE {window}
+        """
+    return query, params + window_params
+
+
+def _seek_query(table, columns, after, limit, dedupe=False, state=None, district=None, bbox=None):
+    """
+    Keyset pagination: return the first ``limit`` matching rows whose key
+    sorts after ``after`` (or from the start when ``after`` is None).
+
+    With ``dedupe`` only the first row per key is kept, matching the offset
+    query used for MB_NETWORK.
+    """
+    key = SEEK_KEYS[table]
+    predicates, key_params = _filter_predicates(table, state, district, bbox)
+    if after is not None:
+        predicates.insert(0, f"{key} > ?")
+        key_params.insert(0, after)
+    where_clause = where(predicates)
+    if dedupe:
+        query = f"""
+        WITH cte AS (
+            SELECT {columns},
+                ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY {key}) AS rn
+            FROM [Dedicated SQL Pool].cims_geo.{table}
+            {where_clause}
+        )
+        SELECT TOP (?) *
+        FROM cte
+        WHERE rn = 1
+        ORDER BY {key};
+        """
+        return query, key_params + [int(limit)]
+
+    query = f"""
+        SELECT TOP (?) {columns}
+        FROM [Dedicated SQL Pool].cims_geo.{table}
+        {where_clause}
+        ORDER BY {key};
         """
+    return query, [int(limit)] + key_params
 
-        cursor.execute(query)
+
+def _fetch_dataframe(query, params):
+    """
+    Run a paged query on a pooled connection and return the rows as a
+    DataFrame, without the ROW_NUMBER() helper columns.
+    """
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, *params)
         columns = [desc[0] for desc in cursor.description]
         rows = cursor.fetchall()
-        df = pd.DataFrame.from_records(rows, columns=columns)
-
+        with query_phase("dataframe"):
+            df = pd.DataFrame.from_records(rows, columns=columns)
         cursor.close()
-        conn.close()
-        print("✅ Data fetched successfully!")
+    return df.drop(columns=PAGING_COLUMNS, errors="ignore")
+
+
+@instrumented
+def get_mb_network_data(offset=0, limit=10, after=None, seek=False, state=None, district=None, bbox=None):
+    """
+    Fetch unique rows from MB_NETWORK using ROW_NUMBER() pagination,
+    ensuring that only one record per MB_NETWORK_ID is retrieved.
+
+    With ``seek=True`` rows are paged by MB_NETWORK_ID instead, starting
+    after the key ``after`` (None for the first page); ``offset`` is ignored.
+
+    ``state``, ``district`` and ``bbox`` are applied in SQL before
+    de-duplication and paging (see ``_filter_predicates``).
+    """
+    try:
+
+        if seek:
+            query, params = _seek_query("MB_NETWORK", MB_NETWORK_COLUMNS, after, limit, dedupe=True,
+                                        state=state, district=district, bbox=bbox)
+        else:
+            # SQL query to remove duplicate MB_NETWORK_ID and paginate results
+            predicates, params = _filter_predicates("MB_NETWORK", state, district, bbox)
+            window, window_params = row_window(offset, limit, column="row_num")
+            params += window_params
+            query = f"""
+            WITH cte AS (
+                SELECT {MB_NETWORK_COLUMNS},
+                    ROW_NUMBER() OVER (PARTITION BY MB_NETWORK_ID ORDER BY MB_NETWORK_ID) AS rn
+                FROM [Dedicated SQL Pool].cims_geo.MB_NETWORK
+                {where(predicates)}
+            ),
+            filtered AS (
+                SELECT *,
+                    ROW_NUMBER() OVER (ORDER BY MB_NETWORK_ID) AS row_num
+                FROM cte
+                WHERE rn = 1
+            )
+            SELECT *
+            FROM filtered
+            WHERE {window};
+            """
+
+        df = _fetch_dataframe(query, params)
+        logger.debug("Data fetched successfully!")
         return df
 
     except Exception as e:
-        print(f"❌ Error fetching TOWER_STRUCTURES data: {e}")
+        logger.error("Error fetching MB_NETWORK data: %s", e)
         return pd.DataFrame({"error": [str(e)]})
 
 
-def get_fiber_optic_site_data(offset=0, limit=10):
+@instrumented
+def get_tower_structures_data(offset=0, limit=10, after=None, seek=False, state=None, district=None, bbox=None):
     """
-    Fetch rows from FIBER_OPTIC_SITE using ROW_NUMBER() pagination.
-    Only includes the parameters shown in your image:
-      REFID, SERVICE_PROVIDER, CATEGORY, PROJECT, 
-      STRUCTURE_TYPE_CODE (as STRUCTURE_TYPE), DISTRICT, MUKIM, DUN, 
-      PARLIAMENT, X as LONGITUDE, Y as LATITUDE.
+    Fetch rows from TOWER_STRUCTURES using ROW_NUMBER() pagination,
+    or keyset pagination on STRUCTURE_ID when ``seek=True``.
+    ``state``, ``district`` and ``bbox`` filter in SQL before paging.
     """
     try:
-        print("Connecting to Azure Synapse for FIBER_OPTIC_SITE...")
-
-        conn_str = (
-            f"DRIVER={driver};"
-            f"SERVER={server},{port};"
-            f"DATABASE={database};"
-            f"UID={username};"
-            f"PWD={password}"
-        )
 
-        conn = pyodbc.connect(conn_str)
-        cursor = conn.cursor()
-        print("✅ Connected to Azure Synapse successfully!")
+        if seek:
+            query, params = _seek_query("TOWER_STRUCTURES", TOWER_STRUCTURES_COLUMNS, after, limit,
+                                        state=state, district=district, bbox=bbox)
+        else:
+            query, params = _offset_query("TOWER_STRUCTURES", TOWER_STRUCTURES_COLUMNS,
+                                          "STRUCTURE_ID", offset, limit,
+                                          state=state, district=district, bbox=bbox)
 
-        query = f"""
-        WITH cte AS (
-            SELECT 
-                REFID,
-                SERVICE_PROVIDER,
-                CATEGORY,
-                PROJECT,
-                STRUCTURE_TYPE_CODE AS STRUCTURE_TYPE,
-                STATE,
-                DISTRICT,
-                MUKIM,
-                DUN,
-                PARLIAMENT,
-                X AS LONGITUDE,
-                Y AS LATITUDE,
-                ROW_NUMBER() OVER (ORDER BY ID) AS rn
-            FROM [Dedicated SQL Pool].cims_geo.FIBER_OPTIC_SITE
-        )
-        SELECT *
-        FROM cte
-        WHERE rn > {offset}
-          AND rn <= {offset} + {limit}
-        """
+        df = _fetch_dataframe(query, params)
+        logger.debug("Data fetched successfully!")
+        return df
 
-        cursor.execute(query)
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        df = pd.DataFrame.from_records(rows, columns=columns)
+    except Exception as e:
+        logger.error("Error fetching TOWER_STRUCTURES data: %s", e)
+        return pd.DataFrame({"error": [str(e)]})
 
-        cursor.close()
-        conn.close()
-        print("✅ FIBER_OPTIC_SITE data fetched successfully!")
+
+@instrumented
+def get_fiber_optic_site_data(offset=0, limit=10, after=None, seek=False, state=None, district=None, bbox=None):
+    """
+    Fetch rows from FIBER_OPTIC_SITE ordered by REFID, using ROW_NUMBER()
+    pagination or keyset pagination on REFID when ``seek=True``.
+    Only includes the parameters shown in your image:
+      REFID, SERVICE_PROVIDER, CATEGORY, PROJECT,
+      STRUCTURE_TYPE_CODE (as STRUCTURE_TYPE), DISTRICT, MUKIM, DUN,
+      PARLIAMENT, X as LONGITUDE, Y as LATITUDE.
+    ``state``, ``district`` and ``bbox`` filter in SQL before paging.
+
+    Keyset pages assume REFID is unique in FIBER_OPTIC_SITE; rows sharing a
+    REFID with the last row of a page would be skipped.
+    """
+    try:
+
+        if seek:
+            query, params = _seek_query("FIBER_OPTIC_SITE", FIBER_OPTIC_SITE_COLUMNS, after, limit,
+                                        state=state, district=district, bbox=bbox)
+        else:
+            query, params = _offset_query("FIBER_OPTIC_SITE", FIBER_OPTIC_SITE_COLUMNS,
+                                          "REFID", offset, limit,
+                                          state=state, district=district, bbox=bbox)
+
+        df = _fetch_dataframe(query, params)
+        logger.debug("FIBER_OPTIC_SITE data fetched successfully!")
         return df
 
     except Exception as e:
-        print(f"❌ Error fetching FIBER_OPTIC_SITE data: {e}")
+        logger.error("Error fetching FIBER_OPTIC_SITE data: %s", e)
         return pd.DataFrame({"error": [str(e)]})
-    
 
-def get_pudo_data(offset=0, limit=10):
+
+@instrumented
+def get_pudo_data(offset=0, limit=10, after=None, seek=False, state=None, district=None, bbox=None):
     """
-    Fetch rows from PUDO using ROW_NUMBER() pagination,
-    selecting only the columns from the screenshot:
+    Fetch rows from PUDO using ROW_NUMBER() pagination (or keyset pagination
+    on REFID when ``seek=True``), selecting only the columns from the screenshot:
       REFID, SERVICE_PROVIDER, PUDO_SERVICE_TYPE, BUILDING_TYPE,
       TYPE_INFRASTRUCTURE, DISTRICT, MUKIM, DUN, PARLIAMENT,
       LONGITUDE, LATITUDE.
-    
+
     Note: Because the table actually has BUILDING_CATEGORY (not BUILDING_TYPE),
     we select BUILDING_CATEGORY as BUILDING_TYPE to match the screenshot.
-    """
-    try:
-        print("Connecting to Azure Synapse for PUDO...")
-
-        conn_str = (
-            f"DRIVER={driver};"
-            f"SERVER={server},{port};"
-            f"DATABASE={database};"
-            f"UID={username};"
-            f"PWD={password}"
-        )
 
-        conn = pyodbc.connect(conn_str)
-        cursor = conn.cursor()
-        print("✅ Connected to Azure Synapse successfully!")
+    ``state``, ``district`` and ``bbox`` filter in SQL before paging.
 
-        # Use ROW_NUMBER() for pagination
-        query = f"""
-        WITH cte AS (
-            SELECT
-                REFID,
-                SERVICE_PROVIDER,
-                PUDO_SERVICE_TYPE,
-                -- The table has BUILDING_CATEGORY, so alias it to BUILDING_TYPE:
-                BUILDING_CATEGORY AS BUILDING_TYPE,
-                TYPE_INFRASTRUCTURE,
-                STATE,
-                DISTRICT,
-                MUKIM,
-                DUN,
-                PARLIAMENT,
-                X AS LONGITUDE,
-                Y AS LATITUDE,
-                ROW_NUMBER() OVER (ORDER BY REFID) AS rn
-            FROM [Dedicated SQL Pool].cims_geo.PUDO
-        )
-        SELECT *
-        FROM cte
-        WHERE rn > {offset}
-          AND rn <= {offset} + {limit}
-        """
+    Keyset pages assume REFID is unique in PUDO; rows sharing a REFID with
+    the last row of a page would be skipped.
+    """
+    try:
 
-        cursor.execute(query)
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        df = pd.DataFrame.from_records(rows, columns=columns)
+        if seek:
+            query, params = _seek_query("PUDO", PUDO_COLUMNS, after, limit,
+                                        state=state, district=district, bbox=bbox)
+        else:
+            # Use ROW_NUMBER() for pagination
+            query, params = _offset_query("PUDO", PUDO_COLUMNS, "REFID", offset, limit,
+                                          state=state, district=district, bbox=bbox)
 
-        cursor.close()
-        conn.close()
-        print("✅ PUDO data fetched successfully!")
+        df = _fetch_dataframe(query, params)
+        logger.debug("PUDO data fetched successfully!")
         return df
 
     except Exception as e:
-        print(f"❌ Error fetching PUDO data: {e}")
+        logger.error("Error fetching PUDO data: %s", e)
         return pd.DataFrame({"error": [str(e)]})
-    
 
-def get_pedi_data(offset=0, limit=10):
+
+@instrumented
+def get_pedi_data(offset=0, limit=10, after=None, seek=False, state=None, district=None, bbox=None):
     """
-    Fetch rows from PEDI using ROW_NUMBER() pagination.
+    Fetch rows from PEDI using ROW_NUMBER() pagination,
+    or keyset pagination on MASKED_ID when ``seek=True``.
     Selecting only:
       MASKED_ID,
       SITE_NAME,
       STATE,
       X as LONGITUDE,
       Y as LATITUDE
+
+    ``state`` and ``bbox`` filter in SQL before paging. PEDI has no DISTRICT
+    column, so any ``district`` filter matches no rows.
     """
     try:
-        print("Connecting to Azure Synapse for PEDI...")
-
-        conn_str = (
-            f"DRIVER={driver};"
-            f"SERVER={server},{port};"
-            f"DATABASE={database};"
-            f"UID={username};"
-            f"PWD={password}"
-        )
 
-        conn = pyodbc.connect(conn_str)
-        cursor = conn.cursor()
-        print("✅ Connected to Azure Synapse successfully!")
-
-        query = f"""
-        WITH cte AS (
-            SELECT
-                MASKED_ID,
-                SITE_NAME,
-                STATE,
-                X AS LONGITUDE,
-                Y AS LATITUDE,
-                ROW_NUMBER() OVER (ORDER BY MASKED_ID) AS rn
-            FROM [Dedicated SQL Pool].cims_geo.PEDI
-        )
-        SELECT *
-        FROM cte
-        WHERE rn > {offset}
-          AND rn <= {offset} + {limit}
-        """
-        cursor.execute(query)
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        df = pd.DataFrame.from_records(rows, columns=columns)
+        if seek:
+            query, params = _seek_query("PEDI", PEDI_COLUMNS, after, limit,
+                                        state=state, district=district, bbox=bbox)
+        else:
+            query, params = _offset_query("PEDI", PEDI_COLUMNS, "MASKED_ID", offset, limit,
+                                          state=state, district=district, bbox=bbox)
 
-        cursor.close()
-        conn.close()
-        print("✅ PEDI data fetched successfully!")
+        df = _fetch_dataframe(query, params)
+        logger.debug("PEDI data fetched successfully!")
         return df
 
     except Exception as e:
-        print(f"❌ Error fetching PEDI data: {e}")
+        logger.error("Error fetching PEDI data: %s", e)
         return pd.DataFrame({"error": [str(e)]})
 
 
-def get_mb_moran_mocn_data(offset=0, limit=10):
+@instrumented
+def get_mb_moran_mocn_data(offset=0, limit=10, after=None, seek=False):
     """
-    Fetch rows from MB_MORAN_MOCN_FULL using ROW_NUMBER() pagination,
-    selecting only:
-      MB_NETWORK_ID, HOST, SHARER, ATN_AZIMUTH, DATE_CREATED, UPDATED.
-      
-    The date fields are converted to VARCHAR(10) (format 'yyyy-mm-dd')
-    directly in the SQL query.
+    Fetch rows from MB_MORAN_MOCN_FULL using ROW_NUMBER() pagination
+    (or keyset pagination on MB_NETWORK_ID when ``seek=True``), selecting only:
+      MB_NETWORK_ID, HOST, SHARER, ATN_AZIMUTH.
+
+    Keyset pages assume MB_NETWORK_ID is unique in MB_MORAN_MOCN_FULL; rows
+    sharing an ID with the last row of a page would be skipped.
     """
     try:
-        print("Connecting to Azure Synapse for MB_MORAN_MOCN_FULL...")
-
-        conn_str = (
-            f"DRIVER={driver};"
-            f"SERVER={server},{port};"
-            f"DATABASE={database};"
-            f"UID={username};"
-            f"PWD={password}"
-        )
 
-        conn = pyodbc.connect(conn_str)
-        cursor = conn.cursor()
-        print("✅ Connected to Azure Synapse successfully!")
+        if seek:
+            query, params = _seek_query("MB_MORAN_MOCN_FULL", MB_MORAN_MOCN_COLUMNS, after, limit)
+        else:
+            query, params = _offset_query("MB_MORAN_MOCN_FULL", MB_MORAN_MOCN_COLUMNS,
+                                          "MB_NETWORK_ID", offset, limit)
+
+        df = _fetch_dataframe(query, params)
+        logger.debug("MB_MORAN_MOCN_FULL data fetched successfully!")
+        return df
+
+    except Exception as e:
+        logger.error("Error fetching MB_MORAN_MOCN data: %s", e)
+        return pd.DataFrame({"error": [str(e)]})
 
+
+# ------------------------------------------------------------------------------
+#  Whole-table exports, streamed in fetchmany() batches
+# ------------------------------------------------------------------------------
+# Export name -> table and its column list; MB_MORAN_MOCN_FULL has no STATE / DISTRICT / X / Y
+EXPORT_TABLES = {
+    "mb_network": ("MB_NETWORK", MB_NETWORK_COLUMNS),
+    "tower_structures": ("TOWER_STRUCTURES", TOWER_STRUCTURES_COLUMNS),
+    "fiber_optic_site": ("FIBER_OPTIC_SITE", FIBER_OPTIC_SITE_COLUMNS),
+    "pudo": ("PUDO", PUDO_COLUMNS),
+    "pedi": ("PEDI", PEDI_COLUMNS),
+    "mb_moran_mocn": ("MB_MORAN_MOCN_FULL", MB_MORAN_MOCN_COLUMNS),
+}
+UNFILTERED_EXPORTS = {"mb_moran_mocn"}
+
+
+def _export_query(name, state=None, district=None, bbox=None):
+    """
+    Every matching row of export ``name`` ordered by its key. MB_NETWORK
+    keeps one row per MB_NETWORK_ID, like /api/mb_network.
+    """
+    table, columns = EXPORT_TABLES[name]
+    key = SEEK_KEYS[table]
+    predicates, params = _filter_predicates(table, state, district, bbox)
+    if table == "MB_NETWORK":
         query = f"""
         WITH cte AS (
-            SELECT 
-                MB_NETWORK_ID,
-                HOST,
-                SHARER,
-                ATN_AZIMUTH,
-                ROW_NUMBER() OVER (ORDER BY MB_NETWORK_ID) AS rn
-            FROM [Dedicated SQL Pool].cims_geo.MB_MORAN_MOCN_FULL
+            SELECT {columns},
+                ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY {key}) AS rn
+            FROM [Dedicated SQL Pool].cims_geo.{table}
+            {where(predicates)}
         )
-        SELECT * FROM cte WHERE rn > {offset} AND rn <= {offset} + {limit};
+        SELECT MB_NETWORK_ID, SERVICE_PROVIDER, HOST, SHARER, BACKHAUL, NETWORK_TYPE,
+               LONGITUDE, LATITUDE, STATE, DISTRICT, MUKIM, DUN, PARLIAMENT
+        FROM cte
+        WHERE rn = 1
+        ORDER BY {key};
         """
-        cursor.execute(query)
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        df = pd.DataFrame.from_records(rows, columns=columns)
+        return query, params
+    query = f"""
+        SELECT {columns}
+        FROM [Dedicated SQL Pool].cims_geo.{table}
+        {where(predicates)}
+        ORDER BY {key};
+        """
+    return query, params
 
-        cursor.close()
-        conn.close()
-        print("✅ MB_MORAN_MOCN_FULL data fetched successfully!")
-        return df
 
-    except Exception as e:
-        print(f"❌ Error fetching MB_MORAN_MOCN data: {e}")
-        return pd.DataFrame({"error": [str(e)]})
+def stream_table(name, state=None, district=None, bbox=None, batch_size=10000):
+    """
+    Yield ``(description, rows)`` batches of every row of export ``name``
+    (see EXPORT_TABLES), with the same columns as its data route and the
+    optional state / district / bbox filters. An empty result yields one
+    empty batch.
+
+    Rows are pulled with ``fetchmany(batch_size)``, so memory use does not
+    grow with the table. The pooled connection is held until the generator
+    is exhausted or closed. Errors are raised, not returned as a DataFrame.
+    """
+    query, params = _export_query(name, state, district, bbox)
+    logger.debug("Streaming %s export from Azure Synapse...", EXPORT_TABLES[name][0])
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, *params)
+            rows = cursor.fetchmany(batch_size)
+            yield cursor.description, rows
+            while rows:
+                rows = cursor.fetchmany(batch_size)
+                if rows:
+                    yield cursor.description, rows
+        finally:
+            cursor.close()
 
 
 # Add this function to index_AzureSynapse_connector.py
+@instrumented
 def get_mb_network_count():
     """Get total count of MB_NETWORK records."""
     try:
-        conn_str = (
-            f"DRIVER={driver};"
-            f"SERVER={server},{port};"
-            f"DATABASE={database};"
-            f"UID={username};"
-            f"PWD={password}"
-        )
-        
-        conn = pyodbc.connect(conn_str)
-        cursor = conn.cursor()
-        
-        query = """
-        SELECT COUNT(*) as total 
-        FROM [Dedicated SQL Pool].cims_geo.MB_NETWORK
-        """
-        
-        cursor.execute(query)
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
-        
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+
+            query = """
+            SELECT COUNT(*) as total
+            FROM [Dedicated SQL Pool].cims_geo.MB_NETWORK
+            """
+
+            cursor.execute(query)
+            result = cursor.fetchone()
+
+            cursor.close()
+
         return result[0] if result else 0
     except Exception as e:
-        print(f"Error getting count: {e}")
+        logger.error("Error getting count: %s", e)
         return 0
 
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+import dataclasses
+import decimal
+import uuid
+from datetime import date
+
+import orjson
+import pandas as pd
+from flask.json.provider import JSONProvider
+from werkzeug.http import http_date
+
+from metrics import encoding
+
+
+def _column_values(series):
+    """
+    One column as a list of JSON-ready Python values.
+
+    Float NaN is left in place (orjson writes it as null); datetime columns
+    get NaT replaced by None.
+    """
+    if series.dtype.kind == "M":
+        return series.astype(object).where(series.notna(), None).tolist()
+    return series.tolist()
+
+
+def dataframe_records(df):
+    """
+    ``df`` as a list of row dicts, built column by column.
+
+    Equivalent to ``clean_dataframe(df).to_dict(orient="records")`` but
+    without first copying the whole frame into an object-dtype DataFrame.
+    """
+    columns = [str(column) for column in df.columns]
+    values = [_column_values(df.iloc[:, i]) for i in range(df.shape[1])]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def _default(obj):
+    """Types orjson does not handle natively, encoded the way Flask's default provider does."""
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, pd.DataFrame):
+        return dataframe_records(obj)
+    if isinstance(obj, pd.Series):
+        return obj.tolist()
+    if isinstance(obj, date):
+        return http_date(obj)
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, "cursor_description"):  # pyodbc.Row
+        return dict(zip((desc[0] for desc in obj.cursor_description), obj))
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def encode(obj, sort_keys=True):
+    """``obj`` as UTF-8 JSON bytes, with the same type handling as ``jsonify``."""
+    option = OPTIONS | orjson.OPT_SORT_KEYS if sort_keys else OPTIONS
+    return orjson.dumps(obj, default=_default, option=option)
+
+
+def ndjson_lines(columns, rows):
+    """Encode a batch of cursor rows as newline-delimited JSON objects."""
+    return b"".join(encode(dict(zip(columns, row))) + b"\n" for row in rows)
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    Flask JSON provider backed by orjson.
+
+    ``jsonify`` accepts DataFrames (and pyodbc rows) anywhere in the payload
+    and writes them as lists of records, with NaN / NaT / NA as null and
+    numpy scalars, Decimals and datetimes handled. Output matches Flask's
+    default provider: sorted keys, Decimal as a string, dates as HTTP dates.
+    """
+
+    sort_keys = True
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        return encode(obj, self.sort_keys).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        with encoding("json") as sizes:
+            body = encode(obj, self.sort_keys) + b"\n"
+            sizes.append(len(body))
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,233 @@
+import functools
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# ------------------------------------------------------------------------------
+#  In-process metrics, rendered in the Prometheus text format at /metrics
+# ------------------------------------------------------------------------------
+# Each server worker process keeps its own counts; Prometheus should scrape
+# every worker (or sum over the instance label) to see the whole deployment.
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.labelnames, labels)} {value}" for labels, value in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts (last is +Inf), sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][slot] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+def render_metrics():
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+HTTP_DURATION = Histogram("cims_http_request_duration_seconds",
+                          "Time from request start until the response body was fully sent.", ("endpoint", "method"))
+HTTP_REQUESTS = Counter("cims_http_requests_total", "Requests handled.", ("endpoint", "method", "status"))
+HTTP_RESPONSE_BYTES = Counter("cims_http_response_bytes_total", "Response body bytes sent.", ("endpoint",))
+ENCODE_DURATION = Histogram("cims_encode_duration_seconds", "Time spent serializing response bodies.", ("format",))
+ENCODE_BYTES = Counter("cims_encode_bytes_total", "Bytes produced by response serialization.", ("format",))
+CONNECTOR_DURATION = Histogram("cims_connector_duration_seconds",
+                               "Time spent in connector get_* functions, cache hits included.", ("function",))
+CONNECTOR_ROWS = Counter("cims_connector_rows_total", "Rows returned by connector get_* functions.", ("function",))
+QUERY_PHASE_DURATION = Histogram("cims_query_phase_duration_seconds",
+                                 "Synapse query time by phase: connect (pool checkout), execute, fetch, dataframe.",
+                                 ("table", "phase"))
+QUERY_ROWS = Counter("cims_query_rows_fetched_total", "Rows fetched from Synapse.", ("table",))
+
+
+# ------------------------------------------------------------------------------
+#  Instrumentation helpers
+# ------------------------------------------------------------------------------
+_TABLE = re.compile(r"cims_geo\.\[?(\w+)", re.IGNORECASE)
+_current = threading.local()  # table of the last statement executed on this thread
+
+
+def statement_table(sql):
+    """The first cims_geo table a statement reads, used as the ``table`` label."""
+    match = _TABLE.search(sql)
+    return match.group(1).upper() if match else "other"
+
+
+def current_table():
+    return getattr(_current, "table", "other")
+
+
+@contextmanager
+def query_phase(phase, table=None):
+    """Time a block as ``phase`` of the query last executed on this thread (or ``table``)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        QUERY_PHASE_DURATION.observe(time.perf_counter() - started, table or current_table(), phase)
+
+
+@contextmanager
+def encoding(body_format):
+    """Time a response serialization; the block may set ``sizes.append(len(body))``."""
+    sizes = []
+    started = time.perf_counter()
+    try:
+        yield sizes
+    finally:
+        ENCODE_DURATION.observe(time.perf_counter() - started, body_format)
+        if sizes:
+            ENCODE_BYTES.inc(sum(sizes), body_format)
+
+
+def timed_body(chunks, endpoint, method, started):
+    """Pass a streamed response body through, recording its size and the request duration at the end."""
+    sent = 0
+    try:
+        for chunk in chunks:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        HTTP_RESPONSE_BYTES.inc(sent, endpoint)
+        HTTP_DURATION.observe(time.perf_counter() - started, endpoint, method)
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def instrumented(func):
+    """Record the duration and returned row count of a connector function."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            CONNECTOR_DURATION.observe(time.perf_counter() - started, name)
+        if hasattr(result, "columns") and "error" not in result.columns:
+            CONNECTOR_ROWS.inc(len(result), name)
+        elif isinstance(result, (list, tuple)):
+            CONNECTOR_ROWS.inc(len(result), name)
+        return result
+
+    return wrapper
+
+
+class InstrumentedCursor:
+    """
+    DB-API cursor wrapper that times execute() and fetch*() calls and counts
+    fetched rows, labelled by the cims_geo table the statement reads.
+    ``connect_seconds`` (the pool checkout) is recorded with the first statement.
+    """
+
+    def __init__(self, cursor, connect_seconds=None):
+        self._cursor = cursor
+        self._connect_seconds = connect_seconds
+        self._table = "other"
+
+    def execute(self, sql, *params):
+        self._table = _current.table = statement_table(sql)
+        if self._connect_seconds is not None:
+            QUERY_PHASE_DURATION.observe(self._connect_seconds, self._table, "connect")
+            self._connect_seconds = None
+        started = time.perf_counter()
+        try:
+            self._cursor.execute(sql, *params)
+        finally:
+            QUERY_PHASE_DURATION.observe(time.perf_counter() - started, self._table, "execute")
+        return self
+
+    def _fetch(self, fetch, *args):
+        started = time.perf_counter()
+        try:
+            result = fetch(*args)
+        finally:
+            QUERY_PHASE_DURATION.observe(time.perf_counter() - started, self._table, "fetch")
+        return result
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        if row is not None:
+            QUERY_ROWS.inc(1, self._table)
+        return row
+
+    def fetchmany(self, size=1):
+        rows = self._fetch(self._cursor.fetchmany, size)
+        QUERY_ROWS.inc(len(rows), self._table)
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        QUERY_ROWS.inc(len(rows), self._table)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
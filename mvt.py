@@ -0,0 +1,92 @@
+"""
+Minimal Mapbox Vector Tile (spec v2.1) encoder for point layers.
+
+Only what the tile endpoint needs: one layer of POINT features with
+string / integer / float properties, written straight to protobuf wire
+format so no protobuf runtime is required.
+"""
+import math
+import struct
+
+EXTENT = 4096
+
+_POINT = 1
+_MOVE_TO_ONE = (1 & 0x7) | (1 << 3)  # MoveTo command, count 1
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(bits | 0x80)
+        else:
+            out.append(bits)
+            return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes_field(field, payload):
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _packed(field, values):
+    return _bytes_field(field, b"".join(_varint(v) for v in values))
+
+
+def _value(value):
+    """Encode one property value as a Tile.Value message."""
+    if isinstance(value, bool):
+        return _key(7, 0) + _varint(int(value))
+    if isinstance(value, int):
+        if value >= 0:
+            return _key(5, 0) + _varint(value)
+        return _key(6, 0) + _varint(_zigzag(value) & 0xFFFFFFFFFFFFFFFF)
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack("<d", value)
+    return _bytes_field(1, str(value).encode("utf-8"))
+
+
+def encode_point_layer(name, features, extent=EXTENT):
+    """
+    Encode a tile holding one layer of point features.
+
+    ``features`` yields ``(x, y, properties)`` with ``x`` / ``y`` in tile
+    coordinates (0..extent) and ``properties`` a dict; None and NaN values
+    are left out. An empty layer still yields a valid tile.
+    """
+    keys = {}
+    values = {}
+    body = bytearray()
+    for x, y, properties in features:
+        tags = []
+        for key, value in properties.items():
+            if hasattr(value, "item"):  # numpy scalar
+                value = value.item()
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            key_index = keys.setdefault(key, len(keys))
+            value_index = values.setdefault((type(value).__name__, value), len(values))
+            tags.extend((key_index, value_index))
+        feature = _packed(2, tags) if tags else b""
+        feature += _key(3, 0) + _varint(_POINT)
+        feature += _packed(4, (_MOVE_TO_ONE, _zigzag(int(x)), _zigzag(int(y))))
+        body += _bytes_field(2, feature)
+
+    layer = _key(15, 0) + _varint(2)
+    layer += _bytes_field(1, name.encode("utf-8"))
+    layer += bytes(body)
+    for key in keys:
+        layer += _bytes_field(3, key.encode("utf-8"))
+    for _, value in values:
+        layer += _bytes_field(4, _value(value))
+    layer += _key(5, 0) + _varint(extent)
+    return _bytes_field(3, layer)
@@ -0,0 +1,43 @@
+import base64
+import json
+from decimal import Decimal
+
+
+class InvalidCursor(ValueError):
+    """Raised when an ?after= token was not produced by ``encode_cursor``."""
+
+
+def encode_cursor(key):
+    """Wrap the last key of a page in an opaque, URL-safe token."""
+    if hasattr(key, "item"):  # numpy scalar
+        key = key.item()
+    if isinstance(key, Decimal):
+        key = int(key) if key == key.to_integral_value() else float(key)
+    elif not isinstance(key, (str, int, float)):
+        key = str(key)
+    raw = json.dumps({"k": key}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """
+    Turn a token from ``encode_cursor`` back into the key it wraps.
+
+    An empty token means "start from the first row" and decodes to None.
+    Raises InvalidCursor for anything that was not produced by ``encode_cursor``.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return payload["k"]
+    except Exception:
+        raise InvalidCursor("Invalid pagination cursor")
+
+
+def next_cursor(df, key_column, limit):
+    """Cursor for the page after ``df``, or None when ``df`` was the last page."""
+    if df is None or df.empty or key_column not in df.columns or len(df) < limit:
+        return None
+    return encode_cursor(df[key_column].iloc[-1])
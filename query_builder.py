@@ -0,0 +1,62 @@
+from result_cache import normalize_filter
+
+# ------------------------------------------------------------------------------
+#  Parameterized SQL fragments
+# ------------------------------------------------------------------------------
+# Filter values and paging bounds are always bound as ``?`` parameters, so
+# the statement text depends only on *which* filters are set. Synapse can
+# then reuse one cached plan per filter combination instead of compiling a
+# new statement for every value, and no value is ever spliced into SQL.
+
+# Request filter name -> TOWER_STRUCTURES column, in the order predicates are emitted
+TOWER_FILTERS = (
+    ("operator", "OPERATOR"),
+    ("state", "STATE"),
+    ("district", "DISTRICT"),
+    ("mukim", "MUKIM"),
+    ("dun", "DUN"),
+)
+
+LIVE_TOWERS = "STATUS != 'DISCONTINUE'"
+
+
+def equals(filters):
+    """
+    ``COLUMN = ?`` predicates for every ``(column, value)`` in ``filters``
+    whose value is set (see ``normalize_filter``). Returns
+    ``(predicates, params)``; the predicates keep the order of ``filters``.
+    """
+    predicates = []
+    params = []
+    for column, value in filters:
+        value = normalize_filter(value)
+        if value is not None:
+            predicates.append(f"{column} = ?")
+            params.append(value)
+    return predicates, params
+
+
+def tower_filters(operator=None, state=None, district=None, mukim=None, dun=None, live=True):
+    """
+    Predicates for the RCI filters on TOWER_STRUCTURES, led by the
+    non-DISCONTINUE condition unless ``live`` is False.
+    """
+    values = {"operator": operator, "state": state, "district": district, "mukim": mukim, "dun": dun}
+    predicates, params = equals((column, values[name]) for name, column in TOWER_FILTERS)
+    if live:
+        predicates.insert(0, LIVE_TOWERS)
+    return predicates, params
+
+
+def where(predicates):
+    """``WHERE a AND b ...``, or an empty string when there are no predicates."""
+    return "WHERE " + " AND ".join(predicates) if predicates else ""
+
+
+def row_window(offset, limit, column="rn"):
+    """
+    ``column > ? AND column <= ?`` selecting rows ``offset + 1`` to
+    ``offset + limit`` of a ROW_NUMBER() column. Returns ``(sql, params)``.
+    """
+    offset = int(offset)
+    return f"{column} > ? AND {column} <= ?", [offset, offset + int(limit)]
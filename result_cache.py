@@ -0,0 +1,163 @@
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def normalize_filter(value):
+    """
+    Collapse the many ways the frontend says "no filter" into None.
+
+    '', 'none', 'null', 'undefined', 'All' and 'All ...' placeholders all mean the
+    filter is unset; anything else is stripped of surrounding whitespace.
+    """
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        return value
+    cleaned = value.strip()
+    lowered = cleaned.lower()
+    if lowered in ("", "none", "null", "undefined", "all") or lowered.startswith("all "):
+        return None
+    return cleaned
+
+
+def estimate_size(value):
+    """Rough number of bytes held by a cached result."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def is_error_result(value):
+    """Connector functions report failures in-band; never cache those."""
+    if isinstance(value, pd.DataFrame):
+        return "error" in value.columns
+    if isinstance(value, dict):
+        return "error" in value
+    return False
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache with a per-entry TTL and a total memory budget.
+
+    Entries are evicted least-recently-used first once the estimated size of
+    everything cached exceeds ``max_bytes``.
+    """
+
+    def __init__(self, ttl_seconds=900, max_bytes=64 * 1024 * 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.ttl_seconds > 0 and self.max_bytes > 0
+
+    def get(self, key):
+        """Return ``(True, value)`` on a fresh hit, ``(False, None)`` otherwise."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, size, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                self._drop_locked(key)
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop_locked(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl_seconds)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._drop_locked(oldest)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Drop every entry; returns how many were removed."""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            return count
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+    def _drop_locked(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+# Process-wide cache for RCI aggregate results
+result_cache = ResultCache(
+    ttl_seconds=float(os.getenv("RESULT_CACHE_TTL_SECONDS", "900")),
+    max_bytes=int(float(os.getenv("RESULT_CACHE_MAX_MB", "64")) * 1024 * 1024),
+)
+
+
+def cached_result(func):
+    """
+    Cache a connector function's result keyed by its name and normalized args.
+
+    Filter arguments are normalized with ``normalize_filter`` before both the
+    cache lookup and the call, so 'None', '' and 'All States' share one entry.
+    Cached DataFrames are shared between requests and must not be mutated.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = {name: normalize_filter(value) for name, value in bound.arguments.items()}
+        key = (func.__name__, tuple(sorted(arguments.items())))
+
+        hit, value = result_cache.get(key)
+        if hit:
+            return value
+
+        value = func(**arguments)
+        if not is_error_result(value):
+            result_cache.put(key, value)
+        return value
+
+    wrapper.uncached = func
+    return wrapper
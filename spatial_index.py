@@ -0,0 +1,612 @@
+import logging
+import math
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from coordinates import MALAYSIA_BOUNDS, to_coordinate
+from result_cache import normalize_filter
+from synapse_pool import pooled_connection
+from tower_snapshot import SNAPSHOT_COLUMNS, get_tower_snapshot
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+#  cims_geo point layers held in memory for clustering and tiles
+# ------------------------------------------------------------------------------
+# ``id``: key column, ``category``: column broken down in clusters and
+# tiles (None for none), ``label``: its name in API output, ``columns``:
+# everything loaded besides X / Y, ``renames``: column names in row output
+# (matching the data routes), ``where``: optional row filter.
+POINT_LAYERS = {
+    "tower_structures": {
+        "table": "TOWER_STRUCTURES",
+        "id": "STRUCTURE_ID",
+        "category": "OPERATOR",
+        "label": "operator",
+        "columns": [c for c in SNAPSHOT_COLUMNS if c not in ("X", "Y")],
+        "renames": {"OPERATOR": "SERVICE_PROVIDER"},
+        "tile_attributes": ["OWNER", "STRUCTURE_CATEGORY"],
+        "where": "STATUS != 'DISCONTINUE'",
+    },
+    "mb_network": {
+        "table": "MB_NETWORK",
+        "id": "MB_NETWORK_ID",
+        "category": "SERVICE_PROVIDER",
+        "label": "service_provider",
+        "columns": ["MB_NETWORK_ID", "SERVICE_PROVIDER", "HOST", "SHARER", "BACKHAUL", "NETWORK_TYPE",
+                    "STATE", "DISTRICT", "MUKIM", "DUN", "PARLIAMENT"],
+        "renames": {},
+        "tile_attributes": ["NETWORK_TYPE"],
+        "where": None,
+    },
+    "fiber_optic_site": {
+        "table": "FIBER_OPTIC_SITE",
+        "id": "REFID",
+        "category": "SERVICE_PROVIDER",
+        "label": "service_provider",
+        "columns": ["REFID", "SERVICE_PROVIDER", "CATEGORY", "PROJECT", "STRUCTURE_TYPE_CODE",
+                    "STATE", "DISTRICT", "MUKIM", "DUN", "PARLIAMENT"],
+        "renames": {"STRUCTURE_TYPE_CODE": "STRUCTURE_TYPE"},
+        "tile_attributes": ["CATEGORY"],
+        "where": None,
+    },
+    "pudo": {
+        "table": "PUDO",
+        "id": "REFID",
+        "category": "SERVICE_PROVIDER",
+        "label": "service_provider",
+        "columns": ["REFID", "SERVICE_PROVIDER", "PUDO_SERVICE_TYPE", "BUILDING_CATEGORY",
+                    "TYPE_INFRASTRUCTURE", "STATE", "DISTRICT", "MUKIM", "DUN", "PARLIAMENT"],
+        "renames": {"BUILDING_CATEGORY": "BUILDING_TYPE"},
+        "tile_attributes": ["PUDO_SERVICE_TYPE"],
+        "where": None,
+    },
+    "pedi": {
+        "table": "PEDI",
+        "id": "MASKED_ID",
+        "category": None,
+        "label": None,
+        "columns": ["MASKED_ID", "SITE_NAME", "STATE"],
+        "renames": {},
+        "tile_attributes": ["SITE_NAME"],
+        "where": None,
+    },
+}
+
+TILE_SIZE = 256
+CLUSTER_CELL_PX = float(os.getenv("TOWER_CLUSTER_CELL_PX", "60"))
+# Above this zoom every point is returned on its own
+MAX_CLUSTER_ZOOM = int(os.getenv("TOWER_CLUSTER_MAX_ZOOM", "16"))
+MAX_ZOOM = 22
+EARTH_RADIUS_KM = 6371.0088
+# No two points on the earth are further apart than this
+HALF_CIRCUMFERENCE_KM = math.pi * EARTH_RADIUS_KM
+# Upper bounds for /api/nearby
+MAX_NEARBY_KM = float(os.getenv("NEARBY_MAX_RADIUS_KM", "100"))
+MAX_NEARBY_K = int(os.getenv("NEARBY_MAX_K", "1000"))
+# /api/nearby refuses locations further than this outside the indexed extent
+NEARBY_MARGIN_DEGREES = float(os.getenv("NEARBY_MARGIN_DEGREES", "5"))
+# Side of the square cells the bbox lookup buckets points into
+GRID_CELL_DEGREES = float(os.getenv("SPATIAL_INDEX_CELL_DEGREES", "0.05"))
+
+DEFAULT_BBOX = (
+    MALAYSIA_BOUNDS["min_lon"], MALAYSIA_BOUNDS["min_lat"],
+    MALAYSIA_BOUNDS["max_lon"], MALAYSIA_BOUNDS["max_lat"],
+)
+
+
+def mercator(lon, lat):
+    """Web Mercator position of each point, scaled to [0, 1] on both axes."""
+    x = (np.asarray(lon, dtype="float64") + 180.0) / 360.0
+    sin_lat = np.clip(np.sin(np.radians(np.asarray(lat, dtype="float64"))), -0.9999, 0.9999)
+    y = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+def haversine_km(lon1, lat1, lon2, lat2):
+    """Great-circle distance in km between points given in degrees (broadcasts)."""
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(v, dtype="float64")) for v in (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def radius_bbox(lon, lat, radius_km):
+    """A bbox that contains every point within ``radius_km`` of (lon, lat)."""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 89.0)))
+    dlon = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)), 180.0)
+    return lon - dlon, lat - dlat, lon + dlon, lat + dlat
+
+
+def near_extent(lon, lat, margin=None):
+    """Whether (lon, lat) lies within ``margin`` degrees (NEARBY_MARGIN_DEGREES) of the indexed extent."""
+    margin = NEARBY_MARGIN_DEGREES if margin is None else margin
+    return (DEFAULT_BBOX[0] - margin <= lon <= DEFAULT_BBOX[2] + margin
+            and DEFAULT_BBOX[1] - margin <= lat <= DEFAULT_BBOX[3] + margin)
+
+
+def tile_bbox(z, x, y):
+    """(min_lon, min_lat, max_lon, max_lat) covered by web map tile z/x/y."""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+class PointIndex:
+    """
+    Immutable point index over one cims_geo layer.
+
+    Points with a valid coordinate inside Malaysia are bucketed into a
+    uniform grid of GRID_CELL_DEGREES cells and kept in arrays sorted by
+    cell, column by column. A bbox lookup slices out the run of cells it
+    covers in each grid column and masks the points on its edges. Web
+    Mercator positions are precomputed for grid clustering and tiles.
+    """
+
+    def __init__(self, layer, df, source=None, loaded_at=None):
+        spec = POINT_LAYERS[layer]
+        df = df.drop_duplicates(spec["id"]) if spec["id"] in df.columns else df
+        lon = to_coordinate(df["X"]).to_numpy()
+        lat = to_coordinate(df["Y"]).to_numpy()
+        keep = (
+            ~np.isnan(lon) & ~np.isnan(lat)
+            & (lat >= MALAYSIA_BOUNDS["min_lat"]) & (lat <= MALAYSIA_BOUNDS["max_lat"])
+            & (lon >= MALAYSIA_BOUNDS["min_lon"]) & (lon <= MALAYSIA_BOUNDS["max_lon"])
+        )
+
+        self.grid_columns = int(math.ceil((DEFAULT_BBOX[2] - DEFAULT_BBOX[0]) / GRID_CELL_DEGREES)) + 1
+        self.grid_rows = int(math.ceil((DEFAULT_BBOX[3] - DEFAULT_BBOX[1]) / GRID_CELL_DEGREES)) + 1
+        cells = self._cell(lon[keep], lat[keep])
+        order = np.argsort(cells, kind="stable")
+
+        self.layer = layer
+        self.spec = spec
+        self.rows = df[keep].iloc[order].reset_index(drop=True)
+        self.lon = lon[keep][order]
+        self.lat = lat[keep][order]
+        self.mx, self.my = mercator(self.lon, self.lat)
+        self.ids = self.rows[spec["id"]].to_numpy()
+        # cell_start[c]:cell_start[c + 1] are the positions of the points in cell c
+        self.cell_start = np.searchsorted(cells[order], np.arange(self.grid_columns * self.grid_rows + 1))
+
+        if spec["category"] is not None:
+            categories = pd.Categorical(self.rows[spec["category"]].fillna("UNKNOWN"))
+            self.category_codes = categories.codes.astype("int64")
+            self.categories = list(categories.categories)
+        else:
+            self.category_codes = np.zeros(len(self.lon), dtype="int64")
+            self.categories = [None]
+
+        self.source = source
+        self.loaded_at = loaded_at or time.time()
+        self.skipped = int((~keep).sum())
+
+    def __len__(self):
+        return len(self.lon)
+
+    def _grid_position(self, lon, lat):
+        gx = np.clip(np.floor((np.asarray(lon) - DEFAULT_BBOX[0]) / GRID_CELL_DEGREES), 0, self.grid_columns - 1)
+        gy = np.clip(np.floor((np.asarray(lat) - DEFAULT_BBOX[1]) / GRID_CELL_DEGREES), 0, self.grid_rows - 1)
+        return gx.astype("int64"), gy.astype("int64")
+
+    def _cell(self, lon, lat):
+        gx, gy = self._grid_position(lon, lat)
+        return gx * self.grid_rows + gy
+
+    def bbox_positions(self, bbox=None):
+        """Positions (into the sorted arrays) of the points inside ``bbox``."""
+        if bbox is None:
+            return np.arange(len(self.lon))
+        min_lon, min_lat, max_lon, max_lat = bbox
+        if (max_lon < DEFAULT_BBOX[0] or min_lon > DEFAULT_BBOX[2]
+                or max_lat < DEFAULT_BBOX[1] or min_lat > DEFAULT_BBOX[3]):
+            return np.empty(0, dtype="int64")
+
+        (x0, x1), (y0, y1) = self._grid_position([min_lon, max_lon], [min_lat, max_lat])
+        columns = np.arange(x0, x1 + 1) * self.grid_rows
+        starts = self.cell_start[columns + y0]
+        ends = self.cell_start[columns + y1 + 1]
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype="int64")
+        # Concatenate the ranges starts[i]:ends[i] without a Python loop
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+
+        lon = self.lon[positions]
+        lat = self.lat[positions]
+        inside = (lon >= min_lon) & (lon <= max_lon) & (lat >= min_lat) & (lat <= max_lat)
+        return positions[inside]
+
+    def rows_in(self, bbox=None, filters=None, offset=0, limit=None):
+        """
+        Rows inside ``bbox`` shaped like the layer's data route output:
+        renamed columns plus float LONGITUDE / LATITUDE, ordered by id and
+        paged with ``offset`` / ``limit`` (all rows when None).
+
+        ``filters`` maps source column names (STATE, OPERATOR, ...) to
+        values compared case-insensitively, like the pool's collation; a
+        filter on a column the layer does not have matches no rows.
+        """
+        positions = self.bbox_positions(bbox)
+        for column, value in (filters or {}).items():
+            value = normalize_filter(value)
+            if value is None:
+                continue
+            if column not in self.rows.columns:
+                positions = positions[:0]
+                break
+            keys = self.rows[column].iloc[positions].astype("string").str.strip().str.casefold()
+            positions = positions[(keys == str(value).strip().casefold()).fillna(False).to_numpy()]
+
+        positions = positions[np.argsort(self.ids[positions], kind="stable")]
+        positions = positions[int(offset):None if limit is None else int(offset) + int(limit)]
+
+        spec = self.spec
+        rows = self.rows[spec["columns"]].iloc[positions].rename(columns=spec["renames"])
+        return rows.assign(LONGITUDE=self.lon[positions], LATITUDE=self.lat[positions]).reset_index(drop=True)
+
+    def within(self, lon, lat, radius_km):
+        """Positions of the points within ``radius_km`` of (lon, lat) and their distances, nearest first."""
+        positions = self.bbox_positions(radius_bbox(lon, lat, radius_km))
+        distances = haversine_km(lon, lat, self.lon[positions], self.lat[positions])
+        inside = distances <= radius_km
+        positions, distances = positions[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")
+        return positions[order], distances[order]
+
+    def nearest(self, lon, lat, k=1, max_km=None):
+        """
+        The ``k`` points nearest to (lon, lat), optionally no further than
+        ``max_km``, as ``(positions, distances)`` nearest first.
+
+        Searches a radius of one grid cell and doubles it until ``k``
+        points fall inside it; a point outside that radius can never be
+        closer than one inside, so the first ``k`` found are exact. Once the
+        search area misses the grid, spans all of it or reaches half the
+        earth's circumference, every point is ranked instead.
+        """
+        if len(self) == 0 or k <= 0:
+            return np.empty(0, dtype="int64"), np.empty(0)
+        radius = GRID_CELL_DEGREES * 111.0
+        if max_km is not None:
+            radius = min(radius, max_km)
+        while True:
+            min_lon, min_lat, max_lon, max_lat = radius_bbox(lon, lat, radius)
+            outside = (max_lon < DEFAULT_BBOX[0] or min_lon > DEFAULT_BBOX[2]
+                       or max_lat < DEFAULT_BBOX[1] or min_lat > DEFAULT_BBOX[3])
+            spans = (min_lon <= DEFAULT_BBOX[0] and min_lat <= DEFAULT_BBOX[1]
+                     and max_lon >= DEFAULT_BBOX[2] and max_lat >= DEFAULT_BBOX[3])
+            if outside or spans or radius >= HALF_CIRCUMFERENCE_KM:
+                distances = haversine_km(lon, lat, self.lon, self.lat)
+                order = np.argsort(distances, kind="stable")[:k]
+                if max_km is not None:
+                    order = order[distances[order] <= max_km]
+                return order, distances[order]
+            positions, distances = self.within(lon, lat, radius)
+            if len(positions) >= k or (max_km is not None and radius >= max_km):
+                return positions[:k], distances[:k]
+            radius = min(radius * 2, HALF_CIRCUMFERENCE_KM if max_km is None else max_km)
+
+    def nearest_many(self, lon, lat, max_rings=8):
+        """
+        The nearest point to each of many (lon, lat) locations, as
+        ``(positions, distances)`` arrays (-1 / inf when the layer is empty).
+
+        All locations are searched together, ring by ring of grid cells
+        around their own cell. A location is settled once its best distance
+        is shorter than the width of the rings already searched; any left
+        after ``max_rings`` (or outside the grid) are compared with every
+        point, a chunk of locations at a time.
+        """
+        lon = np.asarray(lon, dtype="float64")
+        lat = np.asarray(lat, dtype="float64")
+        best_positions = np.full(len(lon), -1, dtype="int64")
+        best_distances = np.full(len(lon), np.inf)
+        if len(self) == 0 or len(lon) == 0:
+            return best_positions, best_distances
+
+        gx, gy = self._grid_position(lon, lat)
+        in_grid = ((lon >= DEFAULT_BBOX[0]) & (lon <= DEFAULT_BBOX[2])
+                   & (lat >= DEFAULT_BBOX[1]) & (lat <= DEFAULT_BBOX[3]))
+        # Shortest distance across one ring of cells anywhere in the grid
+        ring_km = GRID_CELL_DEGREES * math.radians(EARTH_RADIUS_KM) * math.cos(math.radians(DEFAULT_BBOX[3])) * 0.99
+        pending = np.flatnonzero(in_grid)
+
+        for ring in range(max_rings + 1):
+            if len(pending) == 0:
+                break
+            side = np.arange(-ring, ring + 1)
+            inner = side[1:-1]
+            dx = np.concatenate([side, side, np.full(len(inner), -ring), np.full(len(inner), ring)]) if ring else np.zeros(1, "int64")
+            dy = np.concatenate([np.full(len(side), -ring), np.full(len(side), ring), inner, inner]) if ring else np.zeros(1, "int64")
+
+            cx = gx[pending][:, None] + dx
+            cy = gy[pending][:, None] + dy
+            valid = (cx >= 0) & (cx < self.grid_columns) & (cy >= 0) & (cy < self.grid_rows)
+            owners = np.broadcast_to(pending[:, None], cx.shape)[valid]
+            cells = (cx * self.grid_rows + cy)[valid]
+            starts = self.cell_start[cells]
+            lengths = self.cell_start[cells + 1] - starts
+            total = int(lengths.sum())
+            if total:
+                positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+                owners = np.repeat(owners, lengths)
+                distances = haversine_km(lon[owners], lat[owners], self.lon[positions], self.lat[positions])
+                order = np.lexsort((distances, owners))
+                owners, positions, distances = owners[order], positions[order], distances[order]
+                first = np.r_[True, owners[1:] != owners[:-1]]
+                owners, positions, distances = owners[first], positions[first], distances[first]
+                better = distances < best_distances[owners]
+                best_positions[owners[better]] = positions[better]
+                best_distances[owners[better]] = distances[better]
+            pending = pending[best_distances[pending] > ring * ring_km]
+
+        remaining = np.concatenate([pending, np.flatnonzero(~in_grid)])
+        chunk = max(1, 2_000_000 // len(self))
+        for start in range(0, len(remaining), chunk):
+            queries = remaining[start:start + chunk]
+            distances = haversine_km(lon[queries][:, None], lat[queries][:, None], self.lon, self.lat)
+            nearest = distances.argmin(axis=1)
+            best_positions[queries] = nearest
+            best_distances[queries] = distances[np.arange(len(queries)), nearest]
+        return best_positions, best_distances
+
+    def located_rows(self, positions, distances):
+        """``rows_in``-shaped rows for ``positions`` with a DISTANCE_KM column."""
+        spec = self.spec
+        rows = self.rows[spec["columns"]].iloc[positions].rename(columns=spec["renames"])
+        return rows.assign(
+            LONGITUDE=self.lon[positions],
+            LATITUDE=self.lat[positions],
+            DISTANCE_KM=np.round(distances, 4),
+        ).reset_index(drop=True)
+
+    def _grid(self, positions, cells):
+        """
+        Bucket ``positions`` into a ``cells`` x ``cells`` Mercator grid.
+        Returns the first member of each cell, each point's cell number,
+        and the member count per cell.
+        """
+        cx = np.floor(self.mx[positions] * cells).astype("int64")
+        cy = np.floor(self.my[positions] * cells).astype("int64")
+        keys = cx * (int(cells) + 1) + cy
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        return first, inverse, np.bincount(inverse)
+
+    def _category_counts(self, positions, inverse, n_cells):
+        n_categories = len(self.categories)
+        return np.bincount(
+            inverse * n_categories + self.category_codes[positions],
+            minlength=n_cells * n_categories,
+        ).reshape(n_cells, n_categories)
+
+    def clusters(self, bbox=None, zoom=0):
+        """
+        Grid clusters of the points inside ``bbox`` at ``zoom``.
+
+        Points are bucketed into square cells of CLUSTER_CELL_PX screen
+        pixels. Each cluster carries its member count, centroid and
+        per-category counts; single-point cells come back as the point
+        itself with its id.
+        """
+        positions = self.bbox_positions(bbox)
+        if len(positions) == 0:
+            return []
+        zoom = min(max(int(zoom), 0), MAX_ZOOM)
+        if zoom > MAX_CLUSTER_ZOOM:
+            return [self._point(p) for p in positions]
+
+        first, inverse, counts = self._grid(positions, (2 ** zoom) * TILE_SIZE / CLUSTER_CELL_PX)
+        lon = np.bincount(inverse, weights=self.lon[positions]) / counts
+        lat = np.bincount(inverse, weights=self.lat[positions]) / counts
+        by_category = self._category_counts(positions, inverse, len(counts))
+
+        label = self.spec["label"]
+        clusters = []
+        for i, count in enumerate(counts.tolist()):
+            if count == 1:
+                clusters.append(self._point(positions[first[i]]))
+                continue
+            cluster = {"count": count, "longitude": float(lon[i]), "latitude": float(lat[i])}
+            if label is not None:
+                members = by_category[i]
+                cluster[f"{label}s"] = {self.categories[j]: int(members[j]) for j in np.flatnonzero(members)}
+            clusters.append(cluster)
+        return clusters
+
+    def _point(self, position):
+        point = {
+            "count": 1,
+            "longitude": float(self.lon[position]),
+            "latitude": float(self.lat[position]),
+            self.spec["id"].lower(): self.ids[position],
+        }
+        if self.spec["label"] is not None:
+            point[self.spec["label"]] = self.categories[self.category_codes[position]]
+        return point
+
+    def tile_features(self, z, x, y, extent=4096, buffer=64, max_points=4096):
+        """
+        ``(tile_x, tile_y, properties)`` for every point in tile z/x/y.
+
+        A tile with more than ``max_points`` points is thinned to one
+        feature per 64 x 64 tile-unit cell (at most 4096) carrying the cell's ``count``;
+        otherwise each point carries its id, category and tile attributes.
+        """
+        min_lon, min_lat, max_lon, max_lat = tile_bbox(z, x, y)
+        pad_lon = (max_lon - min_lon) * buffer / extent
+        pad_lat = (max_lat - min_lat) * buffer / extent
+        positions = self.bbox_positions((min_lon - pad_lon, min_lat - pad_lat,
+                                         max_lon + pad_lon, max_lat + pad_lat))
+        if len(positions) == 0:
+            return []
+
+        scale = (2 ** z) * extent
+        tx = np.round(self.mx[positions] * scale - x * extent).astype("int64")
+        ty = np.round(self.my[positions] * scale - y * extent).astype("int64")
+        spec = self.spec
+
+        if len(positions) > max_points:
+            first, inverse, counts = self._grid(positions, scale / 64)
+            features = []
+            for i, count in enumerate(counts.tolist()):
+                p = first[i]
+                properties = {"count": count}
+                if count == 1:
+                    properties.update(self._tile_properties(positions[p]))
+                features.append((tx[p], ty[p], properties))
+            return features
+
+        return [(tx[i], ty[i], {"count": 1, **self._tile_properties(p)}) for i, p in enumerate(positions)]
+
+    def _tile_properties(self, position):
+        spec = self.spec
+        properties = {spec["id"].lower(): self.ids[position]}
+        if spec["label"] is not None:
+            properties[spec["label"]] = self.categories[self.category_codes[position]]
+        for column in spec["tile_attributes"]:
+            properties[column.lower()] = self.rows[column].iat[position]
+        return properties
+
+
+# ------------------------------------------------------------------------------
+#  Process-wide indexes, rebuilt in the background and whenever the snapshot changes
+# ------------------------------------------------------------------------------
+REFRESH_SECONDS = float(os.getenv("SPATIAL_INDEX_REFRESH_SECONDS", "3600"))
+
+_indexes = {}
+_lock = threading.Lock()
+_load_locks = {layer: threading.Lock() for layer in POINT_LAYERS}  # serialize the first, blocking load
+_refresher_pid = None
+
+
+def layer_query(layer):
+    spec = POINT_LAYERS[layer]
+    where = f"WHERE {spec['where']}" if spec["where"] else ""
+    return f"""
+    SELECT {", ".join(spec["columns"])}, X, Y
+    FROM [Dedicated SQL Pool].cims_geo.{spec["table"]}
+    {where}
+    """
+
+
+def load_point_index(layer):
+    """
+    Build an index for ``layer``; TOWER_STRUCTURES comes from the Parquet
+    snapshot when there is one, everything else from Synapse.
+    """
+    if layer == "tower_structures":
+        snapshot = get_tower_snapshot()
+        if snapshot is not None:
+            return PointIndex(layer, snapshot.df, source=snapshot)
+
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(layer_query(layer))
+        columns = [desc[0] for desc in cursor.description]
+        df = pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+        cursor.close()
+    return PointIndex(layer, df)
+
+
+def refresh_point_index(layer):
+    """Rebuild one layer's index and swap it in; the old one keeps serving on failure."""
+    index = load_point_index(layer)
+    with _lock:
+        _indexes[layer] = index
+    logger.info("%s spatial index rebuilt (%s points, %s without valid coordinates)", layer, len(index), index.skipped)
+    return index
+
+
+def refresh_loaded_indexes():
+    """Rebuild every layer that has been loaded so far."""
+    for layer in list(_indexes):
+        try:
+            refresh_point_index(layer)
+        except Exception as e:
+            logger.error("Error rebuilding %s spatial index: %s", layer, e)
+
+
+def _refresh_loop():
+    while True:
+        time.sleep(REFRESH_SECONDS)
+        refresh_loaded_indexes()
+
+
+def _ensure_refresher():
+    global _refresher_pid
+    if REFRESH_SECONDS <= 0 or _refresher_pid == os.getpid():
+        return
+    with _lock:
+        if _refresher_pid == os.getpid():
+            return
+        _refresher_pid = os.getpid()
+    threading.Thread(target=_refresh_loop, name="spatial-index-refresh", daemon=True).start()
+
+
+def _stale(index):
+    """A TOWER_STRUCTURES index built from a snapshot that has since been replaced."""
+    if index.layer != "tower_structures":
+        return False
+    snapshot = get_tower_snapshot()
+    return snapshot is not None and index.source is not snapshot
+
+
+def get_point_index(layer="tower_structures"):
+    """Return ``layer``'s current index, building it synchronously on first use."""
+    index = _indexes.get(layer)
+    if index is None or _stale(index):
+        with _load_locks[layer]:
+            index = _indexes.get(layer)
+            if index is None or _stale(index):
+                index = refresh_point_index(layer)
+    _ensure_refresher()
+    return index
+
+
+def layer_rows(layer, bbox=None, filters=None, offset=0, limit=None):
+    """A page of ``layer``'s rows inside ``bbox``, answered from its index (see ``PointIndex.rows_in``)."""
+    return get_point_index(layer).rows_in(bbox, filters, offset=offset, limit=limit)
+
+
+def nearby(lon, lat, layers=None, radius_km=None, k=None):
+    """
+    Points of ``layers`` (every point layer when None) near (lon, lat),
+    nearest first, with LAYER and DISTANCE_KM columns.
+
+    With ``k`` only the ``k`` nearest points over all layers are returned,
+    limited to ``radius_km`` when that is also given; otherwise every point
+    within ``radius_km``.
+    """
+    frames = []
+    for layer in layers or POINT_LAYERS:
+        index = get_point_index(layer)
+        if k is not None:
+            positions, distances = index.nearest(lon, lat, k, max_km=radius_km)
+        else:
+            positions, distances = index.within(lon, lat, radius_km)
+        frames.append(index.located_rows(positions, distances).assign(LAYER=layer))
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return pd.DataFrame(columns=["LAYER", "LONGITUDE", "LATITUDE", "DISTANCE_KM"])
+    df = pd.concat(frames, ignore_index=True).sort_values("DISTANCE_KM", kind="stable")
+    return (df.iloc[:k] if k is not None else df).reset_index(drop=True)
+
+
+def index_status():
+    return {
+        "refresh_seconds": REFRESH_SECONDS,
+        "cell_degrees": GRID_CELL_DEGREES,
+        "layers": {
+            layer: {"loaded_at": index.loaded_at, "points": len(index)}
+            for layer, index in list(_indexes.items())
+        },
+    }
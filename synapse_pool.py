@@ -0,0 +1,384 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from metrics import InstrumentedCursor
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Get Azure Synapse connection details from environment variables
+server = os.getenv('DB_SERVER')
+database = os.getenv('DB_DATABASE')
+username = os.getenv('DB_USERNAME')
+password = os.getenv('DB_PASSWORD')
+port = os.getenv('DB_PORT')
+driver = os.getenv('DB_DRIVER')
+
+
+def build_conn_str():
+    """Build the ODBC connection string for the dedicated SQL pool."""
+    return (
+        f"DRIVER={driver};"
+        f"SERVER={server},{port};"
+        f"DATABASE={database};"
+        f"UID={username};"
+        f"PWD={password}"
+    )
+
+
+def default_pool_size():
+    """
+    Size of the pool for this worker process.
+
+    DB_POOL_SIZE wins when set. Otherwise DB_POOL_MAX_TOTAL (the number of
+    connections the whole deployment may hold against Synapse) is split
+    evenly across WEB_CONCURRENCY worker processes.
+    """
+    explicit = int(os.getenv('DB_POOL_SIZE', '0') or 0)
+    if explicit > 0:
+        return explicit
+    max_total = int(os.getenv('DB_POOL_MAX_TOTAL', '0') or 0)
+    if max_total > 0:
+        workers = max(1, int(os.getenv('WEB_CONCURRENCY', '1') or 1))
+        return max(1, max_total // workers)
+    return 4
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of DB-API connections.
+
+    Idle connections are handed out most-recently-used first, closed once they
+    have sat idle for longer than ``max_idle_seconds``, and pinged before being
+    handed out when idle for at least ``ping_after_seconds``, so a connection
+    dropped by the server is replaced transparently without a round trip on
+    every checkout of a busy pool.
+    """
+
+    def __init__(self, connect, max_size=4, max_idle_seconds=300,
+                 checkout_timeout=30, ping_query="SELECT 1", ping_after_seconds=30):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._connect = connect
+        self.max_size = max_size
+        self.max_idle_seconds = max_idle_seconds
+        self.checkout_timeout = checkout_timeout
+        self.ping_query = ping_query
+        self.ping_after_seconds = ping_after_seconds
+        self._idle = deque()  # (connection, returned_at), newest on the right
+        self._open = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+    # -- introspection --------------------------------------------------------
+    def stats(self):
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._open - len(self._idle),
+            }
+
+    # -- checkout / return ----------------------------------------------------
+    def checkout(self):
+        """Return a live connection, opening a new one if the pool has room."""
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            conn, returned_at, create = None, None, False
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolTimeout("Connection pool is closed")
+                    self._evict_idle_locked()
+                    if self._idle:
+                        conn, returned_at = self._idle.pop()
+                        break
+                    if self._open < self.max_size:
+                        self._open += 1
+                        create = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(
+                            f"No database connection available within {self.checkout_timeout}s "
+                            f"(pool size {self.max_size})"
+                        )
+                    self._cond.wait(remaining)
+
+            if create:
+                try:
+                    return self._connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+
+            if self._is_alive(conn, returned_at):
+                return conn
+            # Dead connection: drop it and go round again for another one.
+            self._close_quietly(conn)
+            self._release_slot()
+
+    def checkin(self, conn, discard=False):
+        """Return a connection to the pool, or close it when ``discard`` is set."""
+        if not discard:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        if discard or self._closed:
+            self._close_quietly(conn)
+            self._release_slot()
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Check a connection out for the duration of a ``with`` block."""
+        conn = self.checkout()
+        try:
+            yield conn
+        except BaseException:
+            self.checkin(conn, discard=not self._is_alive(conn, None))
+            raise
+        else:
+            self.checkin(conn)
+
+    def warm(self, count):
+        """
+        Open up to ``count`` connections ahead of the first request and leave
+        them idle in the pool. Returns how many are idle afterwards.
+        """
+        opened = []
+        try:
+            for _ in range(min(count, self.max_size)):
+                opened.append(self.checkout())
+        finally:
+            for conn in opened:
+                self.checkin(conn)
+        return len(opened)
+
+    def close(self):
+        """Close every idle connection and refuse further checkouts."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    # -- internals ------------------------------------------------------------
+    def _evict_idle_locked(self):
+        if self.max_idle_seconds is None:
+            return
+        cutoff = time.monotonic() - self.max_idle_seconds
+        # Oldest connections sit on the left.
+        while self._idle and self._idle[0][1] < cutoff:
+            conn, _ = self._idle.popleft()
+            self._open -= 1
+            self._close_quietly(conn)
+
+    def _is_alive(self, conn, returned_at):
+        if returned_at is not None and time.monotonic() - returned_at < self.ping_after_seconds:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.ping_query)
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _release_slot(self):
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+# ------------------------------------------------------------------------------
+#  Process-wide pool shared by every connector function
+# ------------------------------------------------------------------------------
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _default_connect():
+    import pyodbc
+    return pyodbc.connect(build_conn_str())
+
+
+def _pool_from_env(connect=None):
+    return ConnectionPool(
+        connect=connect or _default_connect,
+        max_size=default_pool_size(),
+        max_idle_seconds=float(os.getenv('DB_POOL_MAX_IDLE_SECONDS', '300')),
+        checkout_timeout=float(os.getenv('DB_POOL_CHECKOUT_TIMEOUT', '30')),
+        ping_after_seconds=float(os.getenv('DB_POOL_PING_AFTER_SECONDS', '30')),
+    )
+
+
+def get_pool():
+    """
+    Return the pool for the current process, creating it on first use.
+
+    A pool inherited across ``fork()`` is never reused: its sockets belong to
+    the parent, so the child builds its own.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            _pool = _pool_from_env()
+            _pool_pid = pid
+        return _pool
+
+
+def configure_pool(connect=None, **kwargs):
+    """
+    Replace the process-wide pool.
+
+    ``connect`` is a zero-argument callable returning a new connection, which
+    lets callers point the pool at another driver such as ``fake_pyodbc``.
+    Remaining keyword arguments override ``ConnectionPool`` settings.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        old = _pool if _pool_pid == os.getpid() else None
+        pool = _pool_from_env(connect)
+        for key, value in kwargs.items():
+            setattr(pool, key, value)
+        _pool, _pool_pid = pool, os.getpid()
+    if old is not None:
+        old.close()
+    return pool
+
+
+# ------------------------------------------------------------------------------
+#  Cancelling a request's queries from another thread
+# ------------------------------------------------------------------------------
+class QueryCancelled(Exception):
+    """Raised when a query is started in a scope that has been cancelled."""
+
+
+class CancelScope:
+    """
+    Cursors opened on pooled connections while the scope is active (see
+    ``run_in_scope``). ``cancel()`` may be called from any thread: it calls
+    ``cursor.cancel()`` on each, which aborts a running statement server-side,
+    and makes further checkouts in the scope raise QueryCancelled.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._cursors = []
+        self._lock = threading.Lock()
+
+    def track(self, cursor):
+        with self._lock:
+            if self.cancelled:
+                raise QueryCancelled("Request was cancelled")
+            self._cursors.append(cursor)
+        return cursor
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            cursors, self._cursors = self._cursors, []
+        for cursor in cursors:
+            try:
+                cursor.cancel()
+            except Exception:
+                pass
+
+
+_cancel_scope = contextvars.ContextVar("synapse_cancel_scope", default=None)
+
+
+def run_in_scope(scope, func, *args):
+    """Call ``func(*args)`` with every query it makes tracked by ``scope``."""
+    token = _cancel_scope.set(scope)
+    try:
+        return func(*args)
+    finally:
+        _cancel_scope.reset(token)
+
+
+class _PooledConnection:
+    """
+    Connection proxy handed out by ``pooled_connection``: its cursors are
+    instrumented (see ``metrics.InstrumentedCursor``) and, inside a
+    CancelScope, registered with it.
+    """
+
+    def __init__(self, conn, scope, connect_seconds):
+        self._conn = conn
+        self._scope = scope
+        self._connect_seconds = connect_seconds
+
+    def cursor(self):
+        cursor = self._conn.cursor()
+        if self._scope is not None:
+            self._scope.track(cursor)
+        connect_seconds, self._connect_seconds = self._connect_seconds, None
+        return InstrumentedCursor(cursor, connect_seconds)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+@contextmanager
+def pooled_connection():
+    """Borrow a connection from the process-wide pool."""
+    scope = _cancel_scope.get()
+    if scope is not None and scope.cancelled:
+        raise QueryCancelled("Request was cancelled")
+    started = time.perf_counter()
+    with get_pool().connection() as conn:
+        yield _PooledConnection(conn, scope, time.perf_counter() - started)
+
+
+def init_worker_pool():
+    """
+    Build this process's pool and pre-open DB_POOL_WARM_CONNECTIONS of its
+    connections (default 1), so a freshly forked server worker does not pay
+    the ODBC login on its first request. Called from gunicorn's ``post_fork``;
+    a failed warm-up is logged and left to the first checkout to retry.
+    """
+    pool = get_pool()
+    warm = int(os.getenv('DB_POOL_WARM_CONNECTIONS', '1') or 0)
+    if warm <= 0:
+        return pool
+    try:
+        opened = pool.warm(warm)
+        logger.info("Worker %s: %s Synapse connection(s) ready (pool size %s)", os.getpid(), opened, pool.max_size)
+    except Exception as e:
+        logger.error("Worker %s: could not pre-open Synapse connections: %s", os.getpid(), e)
+    return pool
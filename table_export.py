@@ -0,0 +1,71 @@
+import csv
+import io
+import os
+import zlib
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from arrow_encoder import ChunkSink, rows_to_batch, schema_from_description
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+GZIP_MIMETYPE = "application/gzip"
+# Rows fetched, encoded and sent per batch (one Parquet row group each)
+BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "10000"))
+
+
+def csv_chunks(batches):
+    """
+    Yield CSV text (header first) for ``(description, rows)`` batches, one
+    chunk per batch. NULL is written as an empty field.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    header = False
+    for description, rows in batches:
+        if not header:
+            writer.writerow([desc[0] for desc in description])
+            header = True
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def parquet_chunks(batches, compression="snappy"):
+    """
+    Yield a Parquet file for ``(description, rows)`` batches, one row group
+    per batch. The schema is fixed by the first batch, as in ``ipc_stream``;
+    only the current batch and the footer metadata are held in memory.
+
+    An empty result still makes a readable file: with one empty batch (as
+    ``stream_table`` yields) it has the cursor's columns and no rows, and
+    with no batch at all it has no columns either.
+    """
+    sink = ChunkSink()
+    writer = None
+    schema = None
+    for description, rows in batches:
+        if writer is None:
+            schema = schema_from_description(description, rows)
+            writer = pq.ParquetWriter(sink, schema, compression=compression)
+        if rows:
+            writer.write_batch(rows_to_batch(schema, rows))
+            yield sink.take()
+    if writer is None:
+        writer = pq.ParquetWriter(sink, pa.schema([]), compression=compression)
+    writer.close()
+    yield sink.take()
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a stream of byte chunks into one gzip member, chunk by chunk."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,100 @@
+"""
+Every connector function converted to bound parameters must send the same
+SQL text whatever the filter values and paging bounds, with one ``?`` per
+parameter, so Synapse reuses one cached plan per filter combination.
+
+The connectors run against ``fake_pyodbc``; the statements it records are
+compared between two calls that differ only in their values. The aggregate
+cube, snapshot and result cache are off so every call reaches SQL.
+"""
+import os
+import sys
+
+os.environ["AGGREGATE_CUBE_ENABLED"] = "false"
+os.environ["TOWER_SNAPSHOT_ENABLED"] = "false"
+os.environ["RESULT_CACHE_TTL_SECONDS"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import fake_pyodbc
+import index_AzureSynapse_connector as index
+import RCI_AzureSynapse_connector as rci
+import synapse_pool
+from query_builder import equals, row_window, tower_filters, where
+
+FILTERS_A = dict(operator="Maxis", state="Selangor", district="Petaling", mukim="Damansara", dun="N.37 Bukit Lanjan")
+FILTERS_B = dict(operator="Celcom", state="Johor", district="Kluang", mukim="Renggam", dun="O'Brien's")
+REGION_A = dict(state="Selangor", district="Petaling", bbox=(101.5, 3.0, 101.7, 3.2))
+REGION_B = dict(state="Sabah", district="Kota Kinabalu", bbox=(116.0, 5.8, 116.2, 6.0))
+
+CASES = [
+    (rci.get_operator_structure_data, dict(limit=10, offset=0), dict(limit=50, offset=100)),
+    (rci.get_owner_structure_data, FILTERS_A, FILTERS_B),
+    (rci.get_structure_category_data, FILTERS_A, FILTERS_B),
+    (rci.get_structure_project_data, FILTERS_A, FILTERS_B),
+    (rci.get_structure_state_data, FILTERS_A, FILTERS_B),
+    (rci.get_structure_summary_data, FILTERS_A, FILTERS_B),
+    (rci.get_rci_dashboard_data, FILTERS_A, FILTERS_B),
+    (rci.get_tower_structures_data_map, dict(offset=0, limit=10), dict(offset=500, limit=1000)),
+    (rci.get_tower_structures_filtered, dict(FILTERS_A, offset=0, limit=10), dict(FILTERS_B, offset=20, limit=5)),
+    (rci.stream_tower_structures_map, dict(FILTERS_A, after="S1", limit=10), dict(FILTERS_B, after="S9", limit=99)),
+    (index.get_mb_network_data, dict(REGION_A, offset=0, limit=10), dict(REGION_B, offset=30, limit=100)),
+    (index.get_mb_network_data, dict(REGION_A, after="MB1", limit=10, seek=True),
+     dict(REGION_B, after="MB9", limit=100, seek=True)),
+    (index.get_tower_structures_data, dict(REGION_A, offset=0, limit=10), dict(REGION_B, offset=30, limit=100)),
+    (index.get_tower_structures_data, dict(REGION_A, after="S1", limit=10, seek=True),
+     dict(REGION_B, after="S9", limit=100, seek=True)),
+    (index.get_fiber_optic_site_data, dict(REGION_A, offset=0, limit=10), dict(REGION_B, offset=30, limit=100)),
+    (index.get_pudo_data, dict(REGION_A, after="P1", limit=10, seek=True), dict(REGION_B, after="P9", limit=100, seek=True)),
+    (index.get_pedi_data, dict(REGION_A, offset=0, limit=10), dict(REGION_B, offset=30, limit=100)),
+    (index.get_mb_moran_mocn_data, dict(offset=0, limit=10), dict(offset=30, limit=100)),
+    (index.stream_table, dict(REGION_A, name="pudo"), dict(REGION_B, name="pudo")),
+]
+
+
+@pytest.fixture
+def driver():
+    driver = fake_pyodbc.FakeDriver(responder=lambda sql, params: (["VALUE"], []))
+    # No liveness ping between calls, so only the connectors' statements are recorded
+    synapse_pool.configure_pool(connect=driver.connect, ping_after_seconds=3600)
+    yield driver
+    synapse_pool.configure_pool()
+
+
+def statements(driver, func, kwargs):
+    """The (sql, params) pairs one call sends."""
+    del driver.statements[:]
+    result = func(**kwargs)
+    if hasattr(result, "__next__"):
+        list(result)
+    return list(driver.statements)
+
+
+@pytest.mark.parametrize("func, values_a, values_b", CASES,
+                         ids=[f"{func.__name__}-{i}" for i, (func, _, _) in enumerate(CASES)])
+def test_sql_text_does_not_depend_on_values(driver, func, values_a, values_b):
+    sent_a = statements(driver, func, values_a)
+    sent_b = statements(driver, func, values_b)
+
+    assert sent_a, "no statement reached the driver"
+    assert [sql for sql, _ in sent_a] == [sql for sql, _ in sent_b]
+    for sql, params in sent_a + sent_b:
+        assert sql.count("?") == len(params)
+    assert [params for _, params in sent_a] != [params for _, params in sent_b]
+
+
+def test_equals_skips_unset_filters():
+    predicates, params = equals([("OPERATOR", "Maxis"), ("STATE", None), ("DISTRICT", ""), ("MUKIM", "All Mukims")])
+    assert predicates == ["OPERATOR = ?"]
+    assert params == ["Maxis"]
+
+
+def test_tower_filters_lead_with_live_condition():
+    predicates, params = tower_filters(operator="Maxis", dun="N.01")
+    assert where(predicates) == "WHERE STATUS != 'DISCONTINUE' AND OPERATOR = ? AND DUN = ?"
+    assert params == ["Maxis", "N.01"]
+
+
+def test_row_window_binds_bounds():
+    assert row_window(20, 10) == ("rn > ? AND rn <= ?", [20, 30])
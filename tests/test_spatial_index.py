@@ -0,0 +1,41 @@
+"""
+PointIndex.nearest must answer for any location on the globe, including
+ones so far from Malaysia that the doubling search box never reaches it.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from spatial_index import PointIndex, haversine_km
+
+PEDI = pd.DataFrame({
+    "MASKED_ID": ["P1", "P2", "P3"],
+    "SITE_NAME": ["Kuala Lumpur", "Kota Kinabalu", "Kuching"],
+    "STATE": ["WP Kuala Lumpur", "Sabah", "Sarawak"],
+    "X": [101.69, 116.07, 110.35],
+    "Y": [3.14, 5.98, 1.55],
+})
+
+
+@pytest.fixture(scope="module")
+def index():
+    return PointIndex("pedi", PEDI)
+
+
+@pytest.mark.parametrize("lon, lat", [(-100.0, 0.0), (-79.9, 40.4), (-170.0, -80.0), (101.7, 3.1)])
+def test_nearest_ranks_every_point_from_anywhere(index, lon, lat):
+    positions, distances = index.nearest(lon, lat, k=2)
+
+    expected = np.sort(haversine_km(lon, lat, PEDI["X"], PEDI["Y"]))[:2]
+    assert np.allclose(distances, expected)
+    assert len(positions) == 2
+
+
+def test_nearest_respects_max_km_far_away(index):
+    positions, distances = index.nearest(-100.0, 0.0, k=1, max_km=100)
+    assert len(positions) == 0 and len(distances) == 0
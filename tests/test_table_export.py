@@ -0,0 +1,37 @@
+"""
+parquet_chunks must always produce a readable Parquet file, even for an
+export with no rows.
+"""
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyarrow.parquet as pq
+
+from table_export import parquet_chunks
+
+# (name, type_code, display_size, internal_size, precision, scale, null_ok), as pyodbc describes columns
+DESCRIPTION = [("REFID", str, None, 20, 20, 0, False), ("LATITUDE", float, None, 53, 53, 0, True)]
+
+
+def read(chunks):
+    return pq.read_table(io.BytesIO(b"".join(chunks)))
+
+
+def test_rows_become_row_groups():
+    table = read(parquet_chunks(iter([(DESCRIPTION, [("P1", 3.1)]), (DESCRIPTION, [("P2", 5.9)])])))
+    assert table.column_names == ["REFID", "LATITUDE"]
+    assert table.column("REFID").to_pylist() == ["P1", "P2"]
+
+
+def test_empty_batch_keeps_the_columns():
+    table = read(parquet_chunks(iter([(DESCRIPTION, [])])))
+    assert table.column_names == ["REFID", "LATITUDE"]
+    assert table.num_rows == 0
+
+
+def test_no_batches_is_still_a_parquet_file():
+    table = read(parquet_chunks(iter([])))
+    assert table.num_rows == 0
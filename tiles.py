@@ -0,0 +1,34 @@
+import hashlib
+import os
+
+from mvt import encode_point_layer
+from result_cache import ResultCache
+from spatial_index import get_point_index
+
+MVT_MIMETYPE = "application/vnd.mapbox-vector-tile"
+
+# Encoded tiles, keyed by layer, index build time and z/x/y
+tile_cache = ResultCache(
+    ttl_seconds=float(os.getenv("TILE_CACHE_TTL_SECONDS", "3600")),
+    max_bytes=int(float(os.getenv("TILE_CACHE_MAX_MB", "64")) * 1024 * 1024),
+)
+
+
+def render_tile(layer, z, x, y):
+    """
+    Return ``(tile_bytes, etag)`` for tile z/x/y of ``layer``.
+
+    Tiles come from the layer's in-memory index and are cached until the
+    index is rebuilt (the key includes its build time). The ETag is a hash
+    of the tile bytes, so it only changes when the tile does.
+    """
+    index = get_point_index(layer)
+    key = (layer, index.loaded_at, z, x, y)
+    hit, value = tile_cache.get(key)
+    if hit:
+        return value
+
+    tile = encode_point_layer(layer, index.tile_features(z, x, y))
+    etag = hashlib.blake2b(tile, digest_size=16).hexdigest()
+    tile_cache.put(key, (tile, etag))
+    return tile, etag
@@ -0,0 +1,297 @@
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from arrow_encoder import arrow_safe
+from result_cache import normalize_filter, result_cache
+from synapse_pool import pooled_connection
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+#  Local columnar snapshot of the live (non-DISCONTINUE) TOWER_STRUCTURES rows
+# ------------------------------------------------------------------------------
+SNAPSHOT_ENABLED = os.getenv("TOWER_SNAPSHOT_ENABLED", "").lower() in ("1", "true", "yes")
+SNAPSHOT_PATH = os.getenv("TOWER_SNAPSHOT_PATH", os.path.join("data", "tower_structures.parquet"))
+REFRESH_SECONDS = float(os.getenv("TOWER_SNAPSHOT_REFRESH_SECONDS", "3600"))
+RETRY_SECONDS = 60
+
+SNAPSHOT_COLUMNS = [
+    "STRUCTURE_ID", "OPERATOR", "OWNER", "STRUCTURE_CATEGORY", "PROJECTS", "STATE",
+    "DISTRICT", "MUKIM", "DUN", "PARLIAMENT", "X", "Y",
+]
+
+SNAPSHOT_QUERY = f"""
+SELECT {", ".join(SNAPSHOT_COLUMNS)}
+FROM [Dedicated SQL Pool].cims_geo.TOWER_STRUCTURES
+WHERE STATUS != 'DISCONTINUE'
+"""
+
+FILTER_COLUMNS = {
+    "operator": "OPERATOR",
+    "state": "STATE",
+    "district": "DISTRICT",
+    "mukim": "MUKIM",
+    "dun": "DUN",
+}
+
+GROUP_COLUMNS = ["STATE", "STRUCTURE_CATEGORY", "PROJECTS", "OWNER", "OPERATOR"]
+
+# Column names returned by the map / filtered endpoints
+MAP_RENAMES = {"OPERATOR": "SERVICE_PROVIDER", "X": "LONGITUDE", "Y": "LATITUDE"}
+MAP_COLUMNS = [
+    "STRUCTURE_ID", "SERVICE_PROVIDER", "OWNER", "STRUCTURE_CATEGORY", "PROJECTS",
+    "STATE", "DISTRICT", "MUKIM", "DUN", "PARLIAMENT", "LONGITUDE", "LATITUDE",
+]
+
+
+def _python_type(series):
+    """The Python type pyodbc would report for a column with ``series``'s dtype."""
+    if pd.api.types.is_bool_dtype(series):
+        return bool
+    if pd.api.types.is_integer_dtype(series):
+        return int
+    if pd.api.types.is_float_dtype(series):
+        return float
+    if pd.api.types.is_string_dtype(series) and pd.api.types.infer_dtype(series, skipna=True) == "string":
+        return str
+    return None
+
+
+def _filter_key(value):
+    """Match Synapse's case-insensitive, trailing-space-insensitive comparison."""
+    return str(value).strip().casefold()
+
+
+class TowerSnapshot:
+    """
+    Read-only TOWER_STRUCTURES rows held in memory, sorted by STRUCTURE_ID.
+
+    Filter columns get a normalized categorical twin so equality filters are
+    a vectorized code comparison rather than a string scan.
+    """
+
+    def __init__(self, df, source=None, loaded_at=None):
+        df = df.sort_values("STRUCTURE_ID", kind="stable").reset_index(drop=True)
+        self.df = df
+        self.source = source
+        self.loaded_at = loaded_at or time.time()
+        self._keys = {
+            column: df[column].map(_filter_key, na_action="ignore").astype("category")
+            for column in FILTER_COLUMNS.values()
+        }
+
+    def __len__(self):
+        return len(self.df)
+
+    def mask(self, operator=None, state=None, district=None, mukim=None, dun=None):
+        """Boolean mask for the rows matching every filter that is set."""
+        mask = pd.Series(True, index=self.df.index)
+        for name, value in (("operator", operator), ("state", state), ("district", district),
+                            ("mukim", mukim), ("dun", dun)):
+            value = normalize_filter(value)
+            if value is not None:
+                mask &= self._keys[FILTER_COLUMNS[name]] == _filter_key(value)
+        return mask
+
+    def select(self, operator=None, state=None, district=None, mukim=None, dun=None):
+        return self.df[self.mask(operator, state, district, mukim, dun)]
+
+    def groups(self, operator=None, state=None, district=None, mukim=None, dun=None):
+        """
+        Same shape as the grouped dashboard query: one row per (STATE,
+        STRUCTURE_CATEGORY, PROJECTS, OWNER, OPERATOR) with TOTAL_STRUCTURE
+        and TOTAL_RCI. TOTAL_RCI is exact per combination only; a structure
+        listed under two combinations is in both, so use ``distinct_counts``
+        to count STRUCTURE_IDs per dimension.
+        """
+        rows = self.select(operator, state, district, mukim, dun)
+        grouped = rows.groupby(GROUP_COLUMNS, dropna=False, sort=False)["STRUCTURE_ID"]
+        return pd.DataFrame({
+            "TOTAL_STRUCTURE": grouped.size(),
+            "TOTAL_RCI": grouped.nunique(),
+        }).reset_index()
+
+    def distinct_counts(self, dimension, operator=None, state=None, district=None, mukim=None, dun=None):
+        """Distinct STRUCTURE_IDs per ``dimension`` value, as columns ``dimension`` and TOTAL_RCI."""
+        rows = self.select(operator, state, district, mukim, dun)
+        counts = rows.groupby(dimension, dropna=False, sort=False)["STRUCTURE_ID"].nunique()
+        return counts.rename("TOTAL_RCI").reset_index()
+
+    def map_rows(self, operator=None, state=None, district=None, mukim=None, dun=None, offset=0, limit=1000):
+        """A page of rows shaped like the map / filtered endpoint output."""
+        rows = self.select(operator, state, district, mukim, dun)
+        page = rows.iloc[int(offset):int(offset) + int(limit)]
+        return page.rename(columns=MAP_RENAMES)[MAP_COLUMNS].reset_index(drop=True)
+
+    def map_batches(self, operator=None, state=None, district=None, mukim=None, dun=None,
+                    after=None, limit=None, batch_size=5000):
+        """
+        Yield ``(description, rows)`` batches of map rows whose STRUCTURE_ID
+        sorts after ``after``, up to ``limit`` rows in total (all when None),
+        shaped like ``stream_tower_structures_map`` output.
+        """
+        rows = self.select(operator, state, district, mukim, dun)
+        if after is not None:
+            rows = rows[rows["STRUCTURE_ID"] > after]
+        if limit is not None:
+            rows = rows.iloc[:int(limit)]
+        rows = rows.rename(columns=MAP_RENAMES)[MAP_COLUMNS]
+        description = [(column, _python_type(rows[column]), None, None, None, None, True)
+                       for column in MAP_COLUMNS]
+        if rows.empty:
+            yield description, []
+        for start in range(0, len(rows), batch_size):
+            batch = rows.iloc[start:start + batch_size]
+            yield description, list(batch.itertuples(index=False, name=None))
+
+
+def write_snapshot(df, path=None):
+    """
+    Write ``df`` to ``path`` atomically: readers see either the old file or
+    the complete new one, never a partial write.
+    """
+    path = path or SNAPSHOT_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    arrow_safe(df).to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def export_snapshot(path=None, batch_size=50000):
+    """Pull the live TOWER_STRUCTURES rows from Synapse into the Parquet snapshot."""
+    logger.debug("Exporting TOWER_STRUCTURES snapshot from Azure Synapse...")
+    frames = []
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(SNAPSHOT_QUERY)
+        columns = [desc[0] for desc in cursor.description]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            frames.append(pd.DataFrame.from_records(rows, columns=columns))
+        cursor.close()
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SNAPSHOT_COLUMNS)
+    path = write_snapshot(df, path)
+    logger.info("TOWER_STRUCTURES snapshot written to %s (%s rows)", path, len(df))
+    return path
+
+
+# ------------------------------------------------------------------------------
+#  Process-wide snapshot, swapped atomically on refresh
+# ------------------------------------------------------------------------------
+_snapshot = None
+_snapshot_mtime = None
+_last_failure = 0.0
+_lock = threading.Lock()
+_load_lock = threading.Lock()  # serializes the first load of an existing file
+_refresher_pid = None
+
+
+def load_snapshot(path=None):
+    """
+    Read a Parquet snapshot (for example a synthetic test fixture) and make it
+    the one every request is answered from.
+    """
+    global _snapshot, _snapshot_mtime
+    path = path or SNAPSHOT_PATH
+    mtime = os.path.getmtime(path)
+    snapshot = TowerSnapshot(pd.read_parquet(path), source=path, loaded_at=time.time())
+    with _lock:
+        _snapshot, _snapshot_mtime = snapshot, mtime
+    # Aggregates cached from the previous snapshot are now stale.
+    result_cache.invalidate()
+    return snapshot
+
+
+def refresh_snapshot(force=False):
+    """
+    Re-export the snapshot when it is older than REFRESH_SECONDS (or when
+    ``force`` is set), then load it if the file changed. Several worker
+    processes may share one file; whichever exports first wins.
+    """
+    path = SNAPSHOT_PATH
+    stale = not os.path.exists(path) or time.time() - os.path.getmtime(path) >= REFRESH_SECONDS
+    if force or stale:
+        export_snapshot(path)
+    if _snapshot is None or os.path.getmtime(path) != _snapshot_mtime:
+        load_snapshot(path)
+    return _snapshot
+
+
+def _refresh_loop():
+    """
+    Export and load the first snapshot straight away when there is none
+    (retrying every RETRY_SECONDS), then keep it fresh unless refreshing is off.
+    """
+    global _last_failure
+    while True:
+        if _snapshot is None:
+            try:
+                refresh_snapshot(force=not os.path.exists(SNAPSHOT_PATH))
+            except Exception as e:
+                _last_failure = time.time()
+                logger.warning("TOWER_STRUCTURES snapshot unavailable, using live SQL: %s", e)
+            if _snapshot is None:
+                time.sleep(RETRY_SECONDS)
+                continue
+        if REFRESH_SECONDS <= 0:
+            return
+        time.sleep(max(REFRESH_SECONDS / 4, 30))
+        try:
+            refresh_snapshot()
+        except Exception as e:
+            logger.error("Error refreshing TOWER_STRUCTURES snapshot: %s", e)
+
+
+def _ensure_refresher():
+    global _refresher_pid
+    if _refresher_pid == os.getpid():
+        return
+    with _lock:
+        if _refresher_pid == os.getpid():
+            return
+        _refresher_pid = os.getpid()
+    threading.Thread(target=_refresh_loop, name="tower-snapshot-refresh", daemon=True).start()
+
+
+def get_tower_snapshot():
+    """
+    Return the current snapshot, or None when snapshot mode is off or no
+    snapshot is available yet (callers then fall back to live SQL).
+
+    An existing Parquet file is loaded on first use. Without one, the full
+    TOWER_STRUCTURES export runs in the refresher thread and requests keep
+    using live SQL until it has loaded.
+    """
+    global _last_failure
+    if not SNAPSHOT_ENABLED:
+        return _snapshot  # only set when a caller used load_snapshot() directly
+    if _snapshot is None and os.path.exists(SNAPSHOT_PATH) and time.time() - _last_failure >= RETRY_SECONDS:
+        with _load_lock:
+            if _snapshot is None:
+                try:
+                    load_snapshot(SNAPSHOT_PATH)
+                except Exception as e:
+                    _last_failure = time.time()
+                    logger.warning("TOWER_STRUCTURES snapshot unavailable, using live SQL: %s", e)
+    _ensure_refresher()
+    return _snapshot
+
+
+def snapshot_status():
+    return {
+        "enabled": SNAPSHOT_ENABLED,
+        "path": SNAPSHOT_PATH,
+        "rows": len(_snapshot) if _snapshot is not None else 0,
+        "loaded_at": _snapshot.loaded_at if _snapshot is not None else None,
+        "refresh_seconds": REFRESH_SECONDS,
+    }
+